@@ -0,0 +1,145 @@
+"""Minimum-cost assignment for batch dispatching
+
+min_cost_assignment matches people to objects, such as waiting passengers to
+idle drivers. It is the shortest augmenting path form of the Hungarian
+algorithm, run on a sparse set of candidate pairs: people are added one at a
+time, each along the cheapest chain of reassignments found by Dijkstra's
+algorithm, so each person only needs a handful of candidates.
+"""
+
+import heapq
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def min_cost_assignment(candidates: Sequence[Sequence[Tuple[Hashable, int]]],
+                        unmatched_cost: int) -> List[Optional[Hashable]]:
+    """Return the object assigned to each person, or None if the person is
+    left unmatched, such that the total cost is as small as possible.
+
+    No object is assigned to more than one person. A person left unmatched
+    costs <unmatched_cost>, so to match as many people as possible, make
+    <unmatched_cost> larger than the sum of any possible assignment's costs.
+
+    candidates: For each person, the (object, cost) pairs that person may be
+        assigned, where each cost is a non-negative integer.
+    unmatched_cost: The cost of leaving a person unmatched.
+
+    >>> min_cost_assignment([[('a', 1), ('b', 2)], [('a', 1), ('b', 5)]], 100)
+    ['b', 'a']
+    >>> min_cost_assignment([[('a', 3)], [('a', 1)], []], 100)
+    [None, 'a', None]
+    """
+    objects, arcs = _number_objects(candidates, unmatched_cost)
+
+    # Dual potentials: cost - person_potential - object_potential is never
+    # negative, and is zero for every assigned pair.
+    person_potential = [0] * len(arcs)
+    object_potential = [0] * (len(objects) + len(arcs))
+    owner = [-1] * len(object_potential)
+    assigned = [-1] * len(arcs)
+
+    for start in range(len(arcs)):
+        number, scanned, previous = _shortest_path(
+            start, arcs, person_potential, object_potential, owner)
+        # Keep the potentials feasible, then reassign along the path. Every
+        # scanned object but the last is owned by a scanned person.
+        reached = scanned[number]
+        person_potential[start] += reached
+        for scanned_object, scanned_cost in scanned.items():
+            object_potential[scanned_object] -= reached - scanned_cost
+            if scanned_object != number:
+                person_potential[owner[scanned_object]] += \
+                    reached - scanned_cost
+        _reassign(start, number, previous, owner, assigned)
+
+    return [objects[index] if index < len(objects) else None
+            for index in assigned]
+
+
+def _number_objects(candidates: Sequence[Sequence[Tuple[Hashable, int]]],
+                    unmatched_cost: int) \
+        -> Tuple[List[Hashable], List[List[Tuple[int, int]]]]:
+    """Return the objects in <candidates>, in the order they first appear,
+    and for each person, their (object number, cost) arcs, where an object's
+    number is its index.
+
+    Objects are numbered, with one private object per person standing for
+    leaving that person unmatched, numbered after every real object. Every
+    person can always reach their private object, so a cheapest chain of
+    reassignments always exists.
+
+    >>> _number_objects([[('a', 1), ('b', 2)], [('b', 5)]], 9)
+    (['a', 'b'], [[(0, 1), (1, 2), (2, 9)], [(1, 5), (3, 9)]])
+    """
+    numbers = {}
+    objects = []
+    arcs = []
+    for pairs in candidates:
+        person_arcs = []
+        for obj, cost in pairs:
+            number = numbers.get(obj)
+            if number is None:
+                number = numbers[obj] = len(objects)
+                objects.append(obj)
+            person_arcs.append((number, cost))
+        arcs.append(person_arcs)
+    for person, person_arcs in enumerate(arcs):
+        person_arcs.append((len(objects) + person, unmatched_cost))
+    return objects, arcs
+
+
+def _shortest_path(start: int, arcs: List[List[Tuple[int, int]]],
+                   person_potential: List[int], object_potential: List[int],
+                   owner: List[int]) \
+        -> Tuple[int, Dict[int, int], Dict[int, int]]:
+    """Return the cheapest chain of reassignments that matches the person
+    <start>, found by Dijkstra's algorithm over objects, where leaving an
+    owned object means continuing from its owner.
+
+    The chain is returned as the unowned object it ends at, the reduced cost
+    of the path to every object scanned, and the person each reached object
+    was reached from.
+    """
+    path_cost = {}
+    previous = {}
+    scanned = {}
+    queue = []
+    person = start
+    reached = 0
+    number = -1
+    while person != -1:
+        base = reached - person_potential[person]
+        for number, cost in arcs[person]:
+            if number in scanned:
+                continue
+            reduced = base + cost - object_potential[number]
+            if reduced < path_cost.get(number, reduced + 1):
+                path_cost[number] = reduced
+                previous[number] = person
+                heapq.heappush(queue, (reduced, number))
+        reached, number = heapq.heappop(queue)
+        while number in scanned or reached != path_cost[number]:
+            reached, number = heapq.heappop(queue)
+        scanned[number] = reached
+        person = owner[number]
+    return number, scanned, previous
+
+
+def _reassign(start: int, number: int, previous: Dict[int, int],
+              owner: List[int], assigned: List[int]) -> None:
+    """Assign the object <number> to the person it was reached from in
+    <previous>, and so on back along the chain of reassignments, up to the
+    person <start>.
+
+    """
+    person = -1
+    while person != start:
+        person = previous[number]
+        owner[number] = person
+        assigned[person], number = number, assigned[person]
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={'extra-imports': ['heapq', 'typing']})
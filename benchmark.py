@@ -0,0 +1,568 @@
+"""Benchmarks for each layer of the simulation
+
+Each benchmark times one layer on its own, at one or more sizes, so scaling
+curves can be plotted from the results:
+    queue/SCHEDULER/SIZE: Adds, removes and discards in a PriorityQueue
+        (heap) or a CalendarQueue (calendar), holding SIZE pending events,
+        the way a simulation does.
+    dispatch/BACKEND/SIZE: Dispatcher.request_driver with a fleet of SIZE
+        idle drivers, for each available backend.
+    parse/READER/SIZE: Reading an event file of SIZE lines, with
+        create_event_list, with parse_events, and with load_events through
+        a memory map.
+    monitor/SIZE and monitor-recorded/SIZE: SIZE calls to Monitor.notify,
+        then Monitor.report, without and with recorded activities. Each
+        call records one activity, so the bytes per operation of
+        monitor-recorded are its memory per activity.
+    simulation/SCHEDULER/SIZE: Simulation.run on a trace of SIZE requests,
+        with each scheduler.
+    profiled/N/SIZE: simulation/heap/SIZE with a Profiler timing every Nth
+        event, for each N in PROFILE_SAMPLES. Its speed against
+        simulation/heap/SIZE is the profiler's overhead.
+    memory/location/SIZE and memory/make_location/SIZE: Making a Location
+        for every point in an event file of SIZE lines, each one new, and
+        shared through make_location. memory/events/SIZE: Reading the
+        (slotted) events of the same file with parse_events. Their
+        peak_bytes compare what each way keeps alive.
+The inputs are made by trace_generator, or drawn with fixed seeds, so every
+run measures the same work.
+
+Each benchmark is run <repeats> times, and the fastest run is kept. The peak
+memory allocated while it runs is measured in one more run, with tracemalloc,
+as tracing slows it down.
+
+The results are written as JSON:
+    {"meta": {...about the machine...},
+     "results": {NAME: {"size": ..., "operations": ..., "seconds": ...,
+                        "per_second": ..., "peak_bytes": ...,
+                        "bytes_per_operation": ...}}}
+When a baseline file of results exists, each benchmark is compared with it.
+A benchmark that is slower, or allocates more, than the baseline by more than
+<tolerance> is a regression: they are all printed, and the exit status is 1.
+A baseline is only meaningful on the machine that made it.
+
+Usage:
+    python tools.py benchmark results.json [--baseline FILE]
+        [--tolerance F] [--repeats N] [--scale F] [--only PREFIX ...]
+        [--update-baseline]
+
+=== Constants ===
+BASELINE: The default name of the baseline file.
+TOLERANCE: The default fraction by which a benchmark may fall behind the
+    baseline.
+QUEUE_SIZES, FLEET_SIZES, PARSE_SIZES, MONITOR_SIZES, SIMULATION_SIZES,
+MEMORY_SIZES:
+    The sizes each benchmark is run at, before scaling.
+PROFILE_SAMPLES: The values of sample_every the profiler is run with.
+DISPATCH_REQUESTS: The number of passengers requesting drivers in each
+    dispatch benchmark.
+QUEUE_REMOVES: The number of events removed in each queue benchmark.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+import driver_table
+import trace_generator
+from container import CALENDAR, HEAP, CalendarQueue, PriorityQueue
+from dispatcher import Dispatcher, NUMPY, PYTHON
+from driver import Driver
+from event import Event, create_event_list
+from event_parser import load_events, parse_events
+from location import Location, forget_locations, make_location
+from monitor import Monitor, DRIVER, PASSENGER, REQUEST, PICKUP, DROPOFF
+from passenger import Passenger
+from profiler import Profiler
+from simulation import Simulation
+
+BASELINE = "benchmark_baseline.json"
+TOLERANCE = 0.25
+QUEUE_SIZES = [1000, 10000, 100000]
+FLEET_SIZES = [100, 1000, 10000]
+PARSE_SIZES = [64000, 100000]
+MONITOR_SIZES = [200000]
+SIMULATION_SIZES = [10000, 30000]
+MEMORY_SIZES = [100000]
+PROFILE_SAMPLES = [1, 100]
+DISPATCH_REQUESTS = 2000
+QUEUE_REMOVES = 50000
+
+_Run = Callable[[], int]
+#     A prepared benchmark, which does its work and returns the number of
+#     operations done.
+_Case = Tuple[str, int, Callable[[int], _Run]]
+#     A benchmark: its name, its size, and a function preparing a run of it
+#     at that size.
+_TraceFiles = Dict[Tuple[int, int], str]
+#     The generated event files, by number of drivers and of requests.
+
+
+def cases(trace_files: _TraceFiles, scale: float = 1.0) -> List[_Case]:
+    """Return every benchmark, with sizes multiplied by <scale>.
+
+    trace_files: The event files generated for the benchmarks so far, which
+        those reading one add to.
+
+    >>> [name for name, _, _ in cases({})][:3]
+    ['queue/heap/1000', 'queue/heap/10000', 'queue/heap/100000']
+    """
+    backends = [PYTHON] if driver_table.NP is None else [PYTHON, NUMPY]
+    found = []
+    for scheduler in (HEAP, CALENDAR):
+        for size in _scaled(QUEUE_SIZES, scale):
+            found.append((f"queue/{scheduler}/{size}", size,
+                          _queue(scheduler)))
+    for backend in backends:
+        for size in _scaled(FLEET_SIZES, scale):
+            found.append((f"dispatch/{backend}/{size}", size,
+                          _dispatch(backend)))
+    for size in _scaled(PARSE_SIZES, scale):
+        found.append((f"parse/create_event_list/{size}", size,
+                      _parse(create_event_list, trace_files)))
+        found.append((f"parse/parse_events/{size}", size,
+                      _parse(lambda filename: list(parse_events(filename)),
+                             trace_files)))
+        found.append((f"parse/load_events_mmap/{size}", size,
+                      _parse(lambda filename: load_events(filename, True),
+                             trace_files)))
+    for size in _scaled(MONITOR_SIZES, scale):
+        found.append((f"monitor/{size}", size, _monitor(False)))
+        found.append((f"monitor-recorded/{size}", size, _monitor(True)))
+    for scheduler in (HEAP, CALENDAR):
+        for size in _scaled(SIMULATION_SIZES, scale):
+            found.append((f"simulation/{scheduler}/{size}", size,
+                          _simulation(scheduler, trace_files)))
+    for sample_every in PROFILE_SAMPLES:
+        for size in _scaled(SIMULATION_SIZES, scale):
+            found.append((f"profiled/{sample_every}/{size}", size,
+                          _simulation(HEAP, trace_files, sample_every)))
+    for size in _scaled(MEMORY_SIZES, scale):
+        found.append((f"memory/location/{size}", size,
+                      _points(Location, trace_files)))
+        found.append((f"memory/make_location/{size}", size,
+                      _points(make_location, trace_files)))
+        found.append((f"memory/events/{size}", size, _events(trace_files)))
+    return found
+
+
+def measure(prepare: Callable[[int], _Run], size: int,
+            repeats: int) -> Dict[str, float]:
+    """Return the measurements of the benchmark prepared by <prepare> at
+    <size>, keeping the fastest of <repeats> runs.
+
+    >>> result = measure(_monitor(False), 100, 2)
+    >>> result["operations"] > 0 and result["peak_bytes"] > 0
+    True
+    """
+    best = math.inf
+    operations = 0
+    for _ in range(repeats):
+        run = prepare(size)
+        start = time.perf_counter()
+        operations = run()
+        best = min(best, time.perf_counter() - start)
+
+    run = prepare(size)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"size": size, "operations": operations, "seconds": best,
+            "per_second": operations / best if 0 < best < math.inf else 0.0,
+            "peak_bytes": peak,
+            "bytes_per_operation": peak / operations if operations else 0.0}
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            tolerance: float = TOLERANCE) -> List[str]:
+    """Return a description of every benchmark in <results> that is slower,
+    or allocates more, than in <baseline> by more than <tolerance>.
+
+    >>> compare({"a": {"per_second": 70.0, "peak_bytes": 100}},
+    ...         {"a": {"per_second": 100.0, "peak_bytes": 100}})
+    ['a: 70 operations per second, 30% slower than the baseline 100']
+    >>> compare({"a": {"per_second": 90.0, "peak_bytes": 200}},
+    ...         {"a": {"per_second": 100.0, "peak_bytes": 100}})
+    ['a: 200 peak bytes, 100% more than the baseline 100']
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        speed, base_speed = result["per_second"], base["per_second"]
+        if speed < base_speed * (1 - tolerance):
+            regressions.append(
+                f"{name}: {speed:.0f} operations per second, "
+                f"{1 - speed / base_speed:.0%} slower than the baseline "
+                f"{base_speed:.0f}")
+        peak, base_peak = result["peak_bytes"], base["peak_bytes"]
+        if peak > base_peak * (1 + tolerance):
+            regressions.append(
+                f"{name}: {peak} peak bytes, {peak / base_peak - 1:.0%} more "
+                f"than the baseline {base_peak}")
+    return regressions
+
+
+def run_benchmarks(repeats: int = 3, scale: float = 1.0,
+                   only: Optional[List[str]] = None,
+                   progress: Optional[Callable[[str, dict], None]] = None) \
+        -> dict:
+    """Run every benchmark whose name starts with one of <only>, or every
+    benchmark if <only> is None, and return the results. The event files
+    generated for them are deleted afterwards.
+
+    progress: If given, called with the name and measurements of each
+        benchmark as it finishes.
+    """
+    results = {}
+    trace_files: _TraceFiles = {}
+    try:
+        for name, size, prepare in cases(trace_files, scale):
+            if only is not None and not any(name.startswith(prefix)
+                                            for prefix in only):
+                continue
+            results[name] = measure(prepare, size, repeats)
+            if progress is not None:
+                progress(name, results[name])
+    finally:
+        for filename in trace_files.values():
+            os.remove(filename)
+    return {"meta": {"python": platform.python_version(),
+                     "implementation": platform.python_implementation(),
+                     "machine": platform.machine(),
+                     "processor": platform.processor(),
+                     "cpus": os.cpu_count(),
+                     "numpy": driver_table.NP is not None,
+                     "repeats": repeats, "scale": scale,
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": results}
+
+
+def _scaled(sizes: List[int], scale: float) -> List[int]:
+    """Return <sizes> multiplied by <scale>, each at least 1.
+
+    """
+    return [max(1, int(size * scale)) for size in sizes]
+
+
+def _queue(scheduler: str) -> Callable[[int], _Run]:
+    """Return a function preparing runs of the event queue selected by
+    <scheduler>, for a given number of pending events.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare a run of QUEUE_REMOVES removes from a queue of about
+        <size> pending events. Each removed event is replaced by one later
+        event on average, and one in four removes also schedules and then
+        discards a cancellation.
+
+        """
+        rng = random.Random(size)
+        initial = [Event(rng.randrange(size)) for _ in range(size)]
+        spawned = [[Event(0) for _ in range(rng.choice((0, 1, 1, 2)))]
+                   for _ in range(QUEUE_REMOVES)]
+        delays = [[rng.randrange(1, 100) for _ in events]
+                  for events in spawned]
+        cancels = [Event(0) if rng.random() < 0.25 else None
+                   for _ in range(QUEUE_REMOVES)]
+
+        def run() -> int:
+            """Run the benchmark.
+
+            """
+            if scheduler == CALENDAR:
+                queue = CalendarQueue()
+            else:
+                queue = PriorityQueue()
+            queue.add_many(initial)
+            operations = 1
+            for events, waits, cancel in zip(spawned, delays, cancels):
+                if queue.is_empty():
+                    break
+                now = queue.remove().timestamp
+                for event, wait in zip(events, waits):
+                    event.timestamp = now + wait
+                    queue.add(event)
+                operations += 1 + len(events)
+                if cancel is not None:
+                    cancel.timestamp = now + 100
+                    queue.add(cancel)
+                    queue.discard(cancel)
+                    operations += 2
+            return operations
+        return run
+    return prepare
+
+
+def _dispatch(backend: str) -> Callable[[int], _Run]:
+    """Return a function preparing runs of Dispatcher.request_driver with
+    <backend>, for a given fleet size.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare DISPATCH_REQUESTS requests for a fleet of <size> idle
+        drivers, each of which is idle again at its passenger's destination
+        afterwards.
+
+        """
+        rng = random.Random(size)
+        side = max(10, int((size * 10) ** 0.5))
+        dispatcher = Dispatcher(backend=backend)
+        for i in range(size):
+            dispatcher.request_passenger(Driver(
+                f"D{i}", Location(rng.randrange(side), rng.randrange(side)),
+                rng.randint(1, 3)))
+        passengers = [Passenger(f"P{n}", 10, Location(rng.randrange(side),
+                                                      rng.randrange(side)),
+                                Location(rng.randrange(side),
+                                         rng.randrange(side)))
+                      for n in range(DISPATCH_REQUESTS)]
+
+        def run() -> int:
+            """Run the benchmark.
+
+            """
+            for passenger in passengers:
+                driver = dispatcher.request_driver(passenger)
+                driver.start_drive(passenger.destination)
+                driver.end_drive()
+            return len(passengers)
+        return run
+    return prepare
+
+
+def _trace_file(trace_files: _TraceFiles, drivers: int, size: int) -> str:
+    """Return the name of a generated event file with <drivers> drivers and
+    about <size> requests in all, generating it and adding it to
+    <trace_files> if it is not there yet.
+
+    """
+    filename = trace_files.get((drivers, size))
+    if filename is None:
+        handle, filename = tempfile.mkstemp(suffix=".txt")
+        os.close(handle)
+        trace_files[(drivers, size)] = filename
+        trace_generator.write_trace(filename, trace_generator.generate_lines(
+            seed=size, drivers=drivers, driver_window=100,
+            duration=max(1, (size - drivers) // 5), demand=5.0))
+    return filename
+
+
+def _parse(reader: Callable[[str], List[Event]],
+           trace_files: _TraceFiles) -> Callable[[int], _Run]:
+    """Return a function preparing runs of <reader> on an event file of a
+    given size, generated into <trace_files>.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare a run reading an event file of <size> lines.
+
+        """
+        filename = _trace_file(trace_files, 1000, size)
+        return lambda: len(reader(filename))
+    return prepare
+
+
+def _monitor(record_activities: bool) -> Callable[[int], _Run]:
+    """Return a function preparing runs of Monitor.notify and report, with
+    or without <record_activities>.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare <size> notifications of trips by a fleet of 1000 drivers.
+
+        """
+        rng = random.Random(size)
+        notices = []
+        descriptions = [REQUEST, PICKUP, DROPOFF]
+        for i in range(size):
+            description = descriptions[i % 3]
+            location = Location(rng.randrange(50), rng.randrange(50))
+            notices.append((i, DRIVER, description, f"D{i % 1000}",
+                            location))
+            if description != DROPOFF:
+                notices.append((i, PASSENGER, description, f"P{i // 3}",
+                                location))
+        del notices[size:]
+
+        def run() -> int:
+            """Run the benchmark.
+
+            """
+            monitor = Monitor(record_activities=record_activities)
+            for notice in notices:
+                monitor.notify(*notice)
+            monitor.report()
+            return len(notices)
+        return run
+    return prepare
+
+
+def _points(build: Callable[[int, int], Location],
+            trace_files: _TraceFiles) -> Callable[[int], _Run]:
+    """Return a function preparing runs making, with <build>, a Location for
+    every point in an event file of a given size, generated into
+    <trace_files>.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare a run making a Location for every point in an event file
+        of <size> lines, and keeping them all. No Location is shared when
+        the run starts.
+
+        """
+        points = []
+        with open(_trace_file(trace_files, 1000, size)) as file:
+            for line in file:
+                for token in line.split()[3:5]:
+                    if "," in token:
+                        row, col = token.split(",")
+                        points.append((int(row), int(col)))
+
+        def run() -> int:
+            """Run the benchmark.
+
+            """
+            forget_locations()
+            locations = [build(row, col) for row, col in points]
+            return len(locations)
+        return run
+    return prepare
+
+
+def _events(trace_files: _TraceFiles) -> Callable[[int], _Run]:
+    """Return a function preparing runs reading the events in an event file
+    of a given size, generated into <trace_files>.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare a run reading the events in an event file of <size>
+        lines, and keeping them all. No Location is shared when the run
+        starts.
+
+        """
+        filename = _trace_file(trace_files, 1000, size)
+
+        def run() -> int:
+            """Run the benchmark.
+
+            """
+            forget_locations()
+            return len(list(parse_events(filename)))
+        return run
+    return prepare
+
+
+class _CountingSimulation(Simulation):
+    """A simulation that tells how many events it has done.
+
+    """
+
+    @property
+    def done(self) -> int:
+        """The number of events done.
+
+        """
+        return self._done
+
+
+def _simulation(scheduler: str, trace_files: _TraceFiles,
+                sample_every: Optional[int] = None) -> Callable[[int], _Run]:
+    """Return a function preparing runs of simulations with <scheduler>, for
+    a given number of requests, on event files generated into
+    <trace_files>. If <sample_every> is given, each simulation is profiled,
+    timing every <sample_every>th event.
+
+    """
+    def prepare(size: int) -> _Run:
+        """Prepare a run of a simulation of about <size> requests, of which
+        a tenth are drivers. The number of operations is the number of
+        events done.
+
+        """
+        events = list(parse_events(
+            _trace_file(trace_files, max(1, size // 10), size)))
+
+        def run() -> int:
+            """Run the benchmark.
+
+            """
+            profiler = None
+            if sample_every is not None:
+                profiler = Profiler(sample_every=sample_every)
+            simulation = _CountingSimulation(scheduler=scheduler,
+                                             profiler=profiler)
+            simulation.run(events)
+            return simulation.done
+        return run
+    return prepare
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmarks from the command line, and exit with status 1 if
+    any has regressed.
+
+    """
+    parser = argparse.ArgumentParser(description="Run the benchmarks.")
+    parser.add_argument("results")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--only", nargs="+", default=None)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    def progress(name: str, result: dict) -> None:
+        """Print the measurements of one benchmark.
+
+        """
+        print(f"{name:40} {result['per_second']:14,.0f}/s "
+              f"{result['peak_bytes']:14,} bytes "
+              f"{result['bytes_per_operation']:10,.1f} bytes/operation")
+
+    report = run_benchmarks(args.repeats, args.scale, args.only, progress)
+    with open(args.results, "w") as file:
+        json.dump(report, file, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved the baseline in {args.baseline}")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(report["results"], baseline["results"],
+                          args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} REGRESSIONS against {args.baseline}:",
+              file=sys.stderr)
+        for regression in regressions:
+            print(f"  REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(
+        config={'allowed-io': ['main', 'progress'],
+                'extra-imports': ['argparse', 'json', 'math', 'os',
+                                  'platform', 'random', 'sys', 'tempfile',
+                                  'time', 'tracemalloc', 'typing',
+                                  'driver_table', 'trace_generator',
+                                  'container', 'dispatcher', 'driver', 'event',
+                                  'event_parser', 'location', 'monitor',
+                                  'passenger', 'profiler', 'simulation']})
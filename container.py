@@ -1,4 +1,16 @@
-"""Containers of objects"""
+"""Containers of objects
+
+=== Constants ===
+HEAP: A constant used to select a PriorityQueue as the event queue.
+CALENDAR: A constant used to select a CalendarQueue as the event queue.
+"""
+
+import heapq
+from collections import deque
+from typing import Callable, ClassVar, Iterable, List, Optional
+
+HEAP = "heap"
+CALENDAR = "calendar"
 
 
 class Container:
@@ -40,31 +52,67 @@ class PriorityQueue(Container):
     If x < y, then x has a *HIGHER* priority than y.
 
     All objects in the container must be of the same type.
+
+    An item that is no longer needed can be discarded without searching for
+    it. Its entry is left in place as a tombstone and skipped when it reaches
+    the front; once tombstones make up more than COMPACT_RATIO of the stored
+    entries the queue is rebuilt without them. Adding an item costs nothing
+    extra for this.
     """
 
+    COMPACT_RATIO: ClassVar[float] = 0.5
+    #     The fraction of stored entries that may be tombstones before the
+    #     queue compacts itself.
+    COMPACT_MINIMUM: ClassVar[int] = 64
+    #     Queues storing fewer entries than this are never compacted.
+
     # === Private Attributes ===
     _items: list
-
-    #     The items stored in the priority queue.
+    #     The entries stored in the priority queue, as (item, sequence)
+    #     tuples.
+    _count: int
+    #     The number of items ever added to the priority queue. Used as the
+    #     sequence number of the next entry, so that ties are broken in
+    #     insertion order.
+    _dead: set
+    #     The ids of the discarded items, whose entries in _items are
+    #     tombstones.
     #
     # === Representation Invariants ===
-    # _items is a sorted list, where the first item in the queue is the
-    # item with the highest priority.
+    # _items is a binary min-heap of entries, so _items[0] holds the item
+    # with the highest priority.
+    # Every entry has a distinct sequence number.
+    # Every id in _dead is that of the item of exactly one entry in _items.
 
     def __init__(self) -> None:
         """Initialize an empty PriorityQueue.
 
         """
         self._items = []
+        self._count = 0
+        self._dead = set()
 
     # Added for debugging
     def __str__(self) -> str:
         events = []
-        for e in self._items:
-            events.append(f"{e}")
+        for entry in sorted(self._items):
+            if id(entry[0]) not in self._dead:
+                events.append(f"{entry[0]}")
 
         return f"{events}"
 
+    def __len__(self) -> int:
+        """Return the number of items in this PriorityQueue.
+
+        >>> pq = PriorityQueue()
+        >>> len(pq)
+        0
+        >>> pq.add_many([3, 1, 2])
+        >>> len(pq)
+        3
+        """
+        return len(self._items) - len(self._dead)
+
     def remove(self) -> object:
         """Remove and return the next item from this PriorityQueue.
 
@@ -84,7 +132,24 @@ class PriorityQueue(Container):
         >>> pq.remove()
         'yellow'
         """
-        return self._items.pop(0)
+        self._drop_tombstones()
+        return heapq.heappop(self._items)[0]
+
+    def peek(self) -> object:
+        """Return the next item from this PriorityQueue without removing it.
+
+        Precondition: <self> should not be empty.
+
+        >>> pq = PriorityQueue()
+        >>> pq.add(4)
+        >>> pq.add(2)
+        >>> pq.peek()
+        2
+        >>> len(pq)
+        2
+        """
+        self._drop_tombstones()
+        return self._items[0][0]
 
     def is_empty(self) -> bool:
         """
@@ -97,7 +162,7 @@ class PriorityQueue(Container):
         >>> pq.is_empty()
         False
         """
-        return len(self._items) == 0
+        return len(self._items) == len(self._dead)
 
     def add(self, item: object) -> None:
         """Add <item> to this PriorityQueue.
@@ -107,47 +172,400 @@ class PriorityQueue(Container):
         >>> pq.add("blue")
         >>> pq.add("red")
         >>> pq.add("green")
-        >>> pq._items
+        >>> [pq.remove() for _ in range(4)]
         ['blue', 'green', 'red', 'yellow']
         >>> pq = PriorityQueue()
-        >>> pq.add(1)
-        >>> pq.add(10)
-        >>> pq.add(5)
-        >>> pq.add(5)
-        >>> pq._items
-        [1, 5, 5, 10]
-        >>> pq = PriorityQueue()
-        >>>
-        >>> pq.add(2)
-        >>> pq.add(1)
-        >>> pq.add(6)
-        >>> pq.add(4)
-        >>> pq.add(6)
-        >>> pq._items
-        [1, 2, 4, 6, 6]
-        >>> pq = PriorityQueue()
-        >>>
         >>> pq.add(2)
         >>> pq.add(1)
         >>> pq.add(4)
         >>> pq.add(1)
         >>> pq.add(6)
-        >>> pq._items
+        >>> [pq.remove() for _ in range(5)]
         [1, 1, 2, 4, 6]
+        >>> pq = PriorityQueue()
+        >>> pq.add((1, 'first'))
+        >>> pq.add((0, 'zero'))
+        >>> pq.add((1, 'second'))
+        >>> [pq.remove() for _ in range(3)]
+        [(0, 'zero'), (1, 'first'), (1, 'second')]
+        """
+        heapq.heappush(self._items, (item, self._count))
+        self._count += 1
+
+    def add_many(self, items: Iterable) -> None:
+        """Add every item in <items> to this PriorityQueue.
+
+        Items that compare equal are removed in the order they appear in
+        <items>. This rebuilds the heap in linear time, so it is cheaper than
+        calling add on each item when loading many items at once.
+
+        >>> pq = PriorityQueue()
+        >>> pq.add(5)
+        >>> pq.add_many([3, 8, 5, 1])
+        >>> [pq.remove() for _ in range(5)]
+        [1, 3, 5, 5, 8]
+        """
+        for item in items:
+            self._items.append((item, self._count))
+            self._count += 1
+        heapq.heapify(self._items)
+
+    def discard(self, item: object) -> None:
+        """Discard <item> from this PriorityQueue.
+
+        The item is matched by identity, not by equality.
+
+        Precondition: <item> was added to this PriorityQueue once, and has
+            been neither removed nor discarded since.
+
+        >>> pq = PriorityQueue()
+        >>> first, second = ['first'], ['second']
+        >>> pq.add(first)
+        >>> pq.add(second)
+        >>> pq.discard(first)
+        >>> len(pq)
+        1
+        >>> pq.remove()
+        ['second']
+        >>> pq.is_empty()
+        True
+        """
+        self._dead.add(id(item))
+        if len(self._items) >= self.COMPACT_MINIMUM and \
+                len(self._dead) > len(self._items) * self.COMPACT_RATIO:
+            self._compact()
+
+    def _drop_tombstones(self) -> None:
+        """Pop any tombstones from the front of this PriorityQueue.
+
+        """
+        items, dead = self._items, self._dead
+        while dead and items and id(items[0][0]) in dead:
+            dead.remove(id(heapq.heappop(items)[0]))
+
+    def _compact(self) -> None:
+        """Rebuild this PriorityQueue without its tombstones.
+
+        >>> pq = PriorityQueue()
+        >>> items = [[n] for n in range(100)]
+        >>> pq.add_many(items)
+        >>> for item in items[:60]:
+        ...     pq.discard(item)
+        >>> len(pq._items) < 100
+        True
+        >>> pq.remove()
+        [60]
+        """
+        self._items = [entry for entry in self._items
+                       if id(entry[0]) not in self._dead]
+        heapq.heapify(self._items)
+        self._dead.clear()
+
+
+class CalendarQueue(Container):
+    """A queue of items with integer priorities, that operates in priority
+    order.
+
+    Items are removed in the same order as from a PriorityQueue of items
+    that compare by their keys: the item with the smallest key is removed
+    first, and ties are resolved in FIFO order. If an <order> is given,
+    ties are instead resolved by the smallest order first, and only then in
+    FIFO order.
+
+    The queue is a timing wheel of WIDTH slots, one for each of the next WIDTH
+    keys from the current key, each holding its items in the order they were
+    added. Items further ahead wait in a heap until the wheel reaches them.
+    When most items are added a short way ahead of the current key, as events
+    are in a simulation, adding and removing an item takes constant time on
+    average.
+
+    Discarded items are left in place as tombstones, as in a PriorityQueue.
+    """
+
+    WIDTH: ClassVar[int] = 256
+    #     The number of slots in the wheel. It must be a power of two.
+    COMPACT_RATIO: ClassVar[float] = 0.5
+    #     The fraction of stored entries that may be tombstones before the
+    #     queue compacts itself.
+    COMPACT_MINIMUM: ClassVar[int] = 64
+    #     Queues storing fewer entries than this are never compacted.
+
+    # === Private Attributes ===
+    _key: Callable[[object], int]
+    #     The function giving the priority of an item.
+    _order: Optional[Callable[[object], object]]
+    #     The function giving the order of items with equal keys, or None
+    #     for FIFO order.
+    _slots: List[deque]
+    #     The wheel. The entries with key k, for k from _cursor to
+    #     _cursor + WIDTH - 1, are in the slot k % WIDTH, in the order they
+    #     are removed. Each entry is an [item, rank, live, key] list, where
+    #     the rank is the entry's sequence number, or a tuple of its item's
+    #     order and sequence number if there is an order. Entries with
+    #     equal keys are removed by smallest rank first.
+    _cursor: int
+    #     The smallest key any live entry can have.
+    _in_wheel: int
+    #     The number of entries in the wheel, including tombstones.
+    _overflow: list
+    #     A heap of (key, sequence, entry) tuples, for the entries with keys
+    #     from _cursor + WIDTH on.
+    _count: int
+    #     The number of items ever added, used as the sequence number of the
+    #     next entry.
+    _entries: dict
+    #     A dictionary whose key is id(item), and value is the live entry
+    #     holding that item.
+    _dead: int
+    #     The number of tombstones stored.
+
+    def __init__(self, key: Optional[Callable[[object], int]] = None,
+                 order: Optional[Callable[[object], object]] = None) -> None:
+        """Initialize an empty CalendarQueue, ordering items by <key>, or by
+        their timestamp if <key> is None, and items with equal keys by
+        <order>, if it is given.
+
+        >>> cq = CalendarQueue(key=lambda pair: pair[0],
+        ...                    order=lambda pair: pair[1])
+        >>> cq.add_many([(4, 2), (9, 0), (4, 1)])
+        >>> cq.remove()
+        (4, 1)
+        >>> cq.add((4, 0))
+        >>> [cq.remove() for _ in range(3)]
+        [(4, 0), (4, 2), (9, 0)]
+        """
+        self._key = _timestamp if key is None else key
+        self._order = order
+        self._slots = [deque() for _ in range(self.WIDTH)]
+        self._cursor = 0
+        self._in_wheel = 0
+        self._overflow = []
+        self._count = 0
+        self._entries = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        """Return the number of items in this CalendarQueue.
+
+        >>> cq = CalendarQueue(key=int)
+        >>> cq.add_many([3, 1000, 2])
+        >>> len(cq)
+        3
+        """
+        return self._in_wheel + len(self._overflow) - self._dead
+
+    def remove(self) -> object:
+        """Remove and return the next item from this CalendarQueue.
+
+        Precondition: <self> should not be empty.
+
+        >>> cq = CalendarQueue(key=lambda pair: pair[0])
+        >>> for pair in [(5, 'a'), (1, 'b'), (5, 'c'), (900, 'd'), (1, 'e')]:
+        ...     cq.add(pair)
+        >>> [cq.remove()[1] for _ in range(5)]
+        ['b', 'e', 'a', 'c', 'd']
+        """
+        self._advance()
+        entry = self._slots[self._cursor & (self.WIDTH - 1)].popleft()
+        self._in_wheel -= 1
+        if self._entries.get(id(entry[0])) is entry:
+            del self._entries[id(entry[0])]
+        return entry[0]
+
+    def peek(self) -> object:
+        """Return the next item from this CalendarQueue without removing it.
+
+        Precondition: <self> should not be empty.
+
+        >>> cq = CalendarQueue(key=int)
+        >>> cq.add_many([4, 2])
+        >>> cq.peek()
+        2
+        >>> len(cq)
+        2
+        """
+        self._advance()
+        return self._slots[self._cursor & (self.WIDTH - 1)][0][0]
+
+    def is_empty(self) -> bool:
+        """Return true iff this CalendarQueue is empty.
+
+        >>> cq = CalendarQueue(key=int)
+        >>> cq.is_empty()
+        True
+        >>> cq.add(7)
+        >>> cq.is_empty()
+        False
+        """
+        return len(self) == 0
+
+    def add(self, item: object) -> None:
+        """Add <item> to this CalendarQueue.
+
+        An item may have a smaller key than items already removed, but that
+        rebuilds the queue.
+
+        >>> cq = CalendarQueue(key=int)
+        >>> cq.add(10)
+        >>> cq.remove()
+        10
+        >>> for n in [12, 3, 5000, 3]:
+        ...     cq.add(n)
+        >>> [cq.remove() for _ in range(4)]
+        [3, 3, 12, 5000]
         """
-        if self.is_empty():
-            self._items.append(item)
+        key = self._key(item)
+        if self._in_wheel + len(self._overflow) == 0:
+            self._cursor = key
+        elif key < self._cursor:
+            self._rebuild(key)
+        if self._order is None:
+            entry = [item, self._count, True, key]
         else:
-            added = False
-            for index in range(len(self._items)):
-                if self._items[index] > item and not added:
-                    self._items.insert(index, item)
-                    added = True
-            if not added:
-                self._items.append(item)
+            entry = [item, (self._order(item), self._count), True, key]
+        self._count += 1
+        self._entries[id(item)] = entry
+        self._store(entry)
+
+    def add_many(self, items: Iterable) -> None:
+        """Add every item in <items> to this CalendarQueue.
+
+        Items with equal keys are removed in the order they appear in
+        <items>.
+
+        >>> cq = CalendarQueue(key=int)
+        >>> cq.add(5)
+        >>> cq.add_many([3, 8, 5, 1])
+        >>> [cq.remove() for _ in range(5)]
+        [1, 3, 5, 5, 8]
+        """
+        for item in items:
+            self.add(item)
+
+    def discard(self, item: object) -> None:
+        """Discard <item> from this CalendarQueue, if it is in the queue.
+
+        The item is matched by identity, not by equality. If the same object
+        was added more than once, only its most recent entry is discarded.
+
+        >>> cq = CalendarQueue(key=lambda pair: pair[0])
+        >>> first, second = (1, 'first'), (2, 'second')
+        >>> cq.add(first)
+        >>> cq.add(second)
+        >>> cq.discard(first)
+        >>> len(cq)
+        1
+        >>> cq.remove()
+        (2, 'second')
+        >>> cq.is_empty()
+        True
+        """
+        entry = self._entries.pop(id(item), None)
+        if entry is None:
+            return
+        entry[2] = False
+        self._dead += 1
+        stored = self._in_wheel + len(self._overflow)
+        if stored >= self.COMPACT_MINIMUM and \
+                self._dead > stored * self.COMPACT_RATIO:
+            self._rebuild(self._cursor)
+
+    def _store(self, entry: list) -> None:
+        """Put <entry> in the wheel, or in the overflow heap if its key is
+        too far ahead.
+
+        Precondition: entry[3] >= self._cursor.
+        """
+        key = entry[3]
+        if key < self._cursor + self.WIDTH:
+            _insert(self._slots[key & (self.WIDTH - 1)], entry)
+            self._in_wheel += 1
+        else:
+            heapq.heappush(self._overflow, (key, entry[1], entry))
+
+    def _advance(self) -> None:
+        """Move the cursor to the key of the next live entry, dropping any
+        tombstones before it.
+
+        Precondition: <self> should not be empty.
+        """
+        mask = self.WIDTH - 1
+        overflow = self._overflow
+        while True:
+            if self._in_wheel == 0:
+                # Jump straight to the first entry still waiting.
+                self._cursor = overflow[0][0]
+            slot = self._slots[self._cursor & mask]
+            while slot and not slot[0][2]:
+                slot.popleft()
+                self._in_wheel -= 1
+                self._dead -= 1
+            if slot:
+                return
+            if self._in_wheel:
+                self._cursor += 1
+            # Entries waiting in the heap move into the wheel as soon as
+            # their key is in range, before any later entry with that key
+            # can be added straight to the wheel.
+            while overflow and overflow[0][0] < self._cursor + self.WIDTH:
+                entry = heapq.heappop(overflow)[2]
+                _insert(self._slots[entry[3] & mask], entry)
+                self._in_wheel += 1
+
+    def _rebuild(self, cursor: int) -> None:
+        """Rebuild this CalendarQueue without its tombstones, with the
+        cursor at <cursor>.
+
+        Precondition: <cursor> is no larger than the key of any live entry.
+
+        >>> cq = CalendarQueue(key=lambda item: item[0])
+        >>> items = [[n] for n in range(100)]
+        >>> cq.add_many(items)
+        >>> for item in items[:60]:
+        ...     cq.discard(item)
+        >>> cq._dead < 60
+        True
+        >>> cq.remove()
+        [60]
+        """
+        live = [stored for wheel_slot in self._slots for stored in wheel_slot
+                if stored[2]]
+        live.extend(stored for _, _, stored in self._overflow if stored[2])
+        live.sort(key=lambda stored: stored[1])
+        for slot in self._slots:
+            slot.clear()
+        self._in_wheel = 0
+        self._overflow = []
+        self._dead = 0
+        self._cursor = cursor
+        for entry in live:
+            self._store(entry)
+
+
+def _insert(slot: deque, entry: list) -> None:
+    """Insert <entry> into <slot> after every entry of a smaller rank.
+
+    Entries are almost always added in increasing rank, so this starts from
+    the back of the slot.
+    """
+    position = len(slot)
+    while position and slot[position - 1][1] > entry[1]:
+        position -= 1
+    if position == len(slot):
+        slot.append(entry)
+    else:
+        slot.insert(position, entry)
+
+
+def _timestamp(item: object) -> int:
+    """Return the timestamp of <item>.
+
+    """
+    return item.timestamp
 
 
 if __name__ == '__main__':
     import python_ta
 
-    python_ta.check_all()
+    python_ta.check_all(
+        config={'extra-imports': ['collections', 'heapq', 'typing']})
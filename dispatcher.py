@@ -1,8 +1,21 @@
 """Dispatcher for the simulation"""
 
-from typing import Optional
+import math
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+from assignment import min_cost_assignment
 from driver import Driver
+from driver_table import DriverTable
+from grid import Grid
+from location import Location
 from passenger import Passenger
+from travel_time import TravelTimes
+
+PYTHON = "python"
+NUMPY = "numpy"
+
+OLDEST = "oldest"
+NEAREST = "nearest"
 
 
 class Dispatcher:
@@ -20,78 +33,391 @@ class Dispatcher:
     is registered with the dispatcher, and will be used to fulfill future
     passenger requests.
 
+    By default a driver is assigned the passenger who has waited longest. A
+    dispatcher may instead assign the nearest waiting passenger, unless the
+    passenger who has waited longest has already been passed over too many
+    times.
+
+    A dispatcher may instead dispatch in batches. Then requests only place
+    passengers on the waiting list and register drivers, and dispatch_batch
+    later matches the waiting passengers with the idle drivers all at once,
+    so that the total time spent driving to passengers is as small as
+    possible.
+
     === Private Attributes ===
     _drivers:
         A dictionary whose key is driver.id, and value is the driver
     _waiting_passengers:
-        A list of passengers waiting to be assigned a driver.
+        An ordered dictionary whose key is passenger.id, and value is a
+        passenger waiting to be assigned a driver, oldest request first.
+    _backend:
+        How the fastest idle driver is found: PYTHON searches a grid of the
+        idle drivers, and NUMPY scans a DriverTable of all registered drivers.
+        Both pick the same driver.
+    _idle_drivers:
+        With the PYTHON backend, a grid of the registered drivers that are
+        idle, ranked by the order in which they registered. With the NUMPY
+        backend, a table of every registered driver.
+    _ranks:
+        A dictionary whose key is driver.id, and value is the order in which
+        the driver first registered. Ranks are kept after a driver is
+        removed.
+    _max_speed:
+        The highest speed of any registered driver.
+    _batch_window:
+        The time from the first request of a batch until it is dispatched, or
+        None if every request is dispatched as it arrives.
+    _batch_candidates:
+        The number of fastest idle drivers considered for each passenger in a
+        batch.
+    _batch_due:
+        The time the next batch is due to be dispatched, or None if no batch
+        is scheduled.
+    _passenger_policy:
+        OLDEST to assign drivers the passenger who has waited longest, or
+        NEAREST to assign them the nearest waiting passenger.
+    _waiting_grid:
+        A grid of the waiting passengers by origin, ranked by the order in
+        which they started waiting, or None with the OLDEST policy.
+    _waiting_count:
+        The number of passengers that have ever started waiting.
+    _max_skips:
+        The number of times the passenger who has waited longest may be
+        passed over for a nearer one, with the NEAREST policy.
+    _skipped:
+        The id of the passenger who has waited longest and the number of
+        times they have been passed over, or None.
+    _travel_times:
+        The travel-time model of every registered driver, or None if they
+        keep their own.
     """
 
     _drivers: dict[str, Driver]
-    _waiting_passengers: list[Passenger]
+    _waiting_passengers: OrderedDict[str, Passenger]
+    _backend: str
+    _idle_drivers: Union[Grid, DriverTable]
+    _ranks: dict[str, int]
+    _max_speed: int
+    _batch_window: Optional[int]
+    _batch_candidates: int
+    _batch_due: Optional[int]
+    _passenger_policy: str
+    _waiting_grid: Optional[Grid]
+    _waiting_count: int
+    _max_skips: int
+    _skipped: Optional[Tuple[str, int]]
+    _travel_times: Optional[TravelTimes]
 
-    def __init__(self) -> None:
+    def __init__(self, cell_size: int = 8, backend: str = PYTHON,
+                 batch_window: Optional[int] = None,
+                 batch_candidates: int = 8,
+                 passenger_policy: str = OLDEST, max_skips: int = 10,
+                 travel_times: Optional[TravelTimes] = None) -> None:
         """Initialize a Dispatcher.
 
+        cell_size: The side length of the cells used to index idle drivers.
+        backend: PYTHON or NUMPY. The NUMPY backend requires NumPy.
+        batch_window: If given, dispatch in batches, each one this long after
+            the first request it holds.
+        batch_candidates: The number of fastest idle drivers considered for
+            each passenger in a batch.
+        passenger_policy: OLDEST or NEAREST.
+        max_skips: With the NEAREST policy, the number of times the passenger
+            who has waited longest may be passed over for a nearer one.
+        travel_times: If given, every driver registered with this dispatcher
+            computes its travel times with this model, instead of with
+            Driver.travel_times.
         """
+        if backend not in (PYTHON, NUMPY):
+            raise ValueError(f"Unknown dispatcher backend: {backend}")
+        if passenger_policy not in (OLDEST, NEAREST):
+            raise ValueError(f"Unknown passenger policy: {passenger_policy}")
         self._drivers = {}
-        self._waiting_passengers = []
+        self._waiting_passengers = OrderedDict()
+        self._backend = backend
+        if backend == NUMPY:
+            self._idle_drivers = DriverTable(travel_times=travel_times)
+        else:
+            self._idle_drivers = Grid(cell_size)
+        self._ranks = {}
+        self._max_speed = 0
+        self._batch_window = batch_window
+        self._batch_candidates = batch_candidates
+        self._batch_due = None
+        self._passenger_policy = passenger_policy
+        self._waiting_grid = Grid(cell_size) if passenger_policy == NEAREST \
+            else None
+        self._waiting_count = 0
+        self._max_skips = max_skips
+        self._skipped = None
+        self._travel_times = travel_times
 
     def __str__(self) -> str:  # represntation of what
         """Return a string representation.
 
         """
         return f"Drivers: {self._drivers},/n Waiting Passengers: " \
-               f"{self._waiting_passengers} "
+               f"{list(self._waiting_passengers.values())} "
 
     def request_driver(self, passenger: Passenger) -> Optional[Driver]:
         """Return a driver for the passenger, or None if no driver is available.
 
-        Add the passenger to the waiting list if there is no available driver.
+        Add the passenger to the waiting list if there is no available driver,
+        or if this dispatcher dispatches in batches. A driver with no route to
+        the passenger is not available.
 
+        >>> from distance import RoadGrid
+        >>> from travel_time import DirectTravelTimes
+        >>> roads = RoadGrid(3, 3, blocked=[Location(0, 1), Location(1, 0)])
+        >>> dispatcher = Dispatcher(travel_times=DirectTravelTimes(roads))
+        >>> dispatcher.request_passenger(Driver('Ann', Location(0, 0), 1))
+        >>> dispatcher.request_driver(Passenger('Bo', 5, Location(2, 2),
+        ...                                     Location(2, 0))) is None
+        True
+        >>> dispatcher.request_passenger(Driver('Cy', Location(2, 1), 1)).id
+        'Bo'
+        >>> Driver.travel_times.distance_model is None
+        True
         """
-        idle_drivers = []
-        for driver in self._drivers.values():
-            if driver.is_idle:
-                idle_drivers.append(driver)
-
-        if not idle_drivers:
-            self._waiting_passengers.append(passenger)
+        if self._batch_window is not None or self._idle_drivers.is_empty():
+            self._wait(passenger)
             return None
-        elif len(idle_drivers) == 1:
-            idle_drivers[0].is_idle = False
-            return idle_drivers[0]
+
+        if self._backend == NUMPY:
+            fastest_driver = self._idle_drivers.fastest(passenger.origin)
         else:
-            fastest_driver = idle_drivers.pop(0)
-            fastest_time = fastest_driver.get_travel_time(passenger.origin)
-            for driver in idle_drivers:
-                time = driver.get_travel_time(passenger.origin)
-                if time < fastest_time:
-                    fastest_time = time
-                    fastest_driver = driver
-            fastest_driver.is_idle = False
-            return fastest_driver
+            # A driver at least <distance> away takes at least as long as the
+            # fastest driver would to cover it.
+            fastest_driver = self._idle_drivers.nearest(
+                passenger.origin,
+                lambda driver, _: driver.get_reach_time(passenger.origin),
+                lambda distance: round(distance / self._max_speed))
+        if fastest_driver is None:
+            self._wait(passenger)
+            return None
+        fastest_driver.is_idle = False
+        return fastest_driver
 
     def request_passenger(self, driver: Driver) -> Optional[Passenger]:
         """Return a passenger for the driver, or None if no passenger is
         available.
 
         If this is a new driver, register the driver for future passenger
-        requests.
+        requests. If this dispatcher dispatches in batches, the driver waits
+        for the next batch instead, and None is returned.
+
+        With the NEAREST policy, return the waiting passenger the driver can
+        reach soonest, breaking ties in favour of whoever has waited longest.
+        The passenger who has waited longest is returned instead once they
+        have been passed over max_skips times.
+
+        Passengers the driver has no route to are left waiting.
         """
         if driver.id not in self._drivers:
             self._drivers[driver.id] = driver
+            # A driver registered again keeps its first rank, so no two
+            # drivers ever share one.
+            self._ranks.setdefault(driver.id, len(self._ranks))
+            self._max_speed = max(self._max_speed, driver.speed)
+            if self._travel_times is not None:
+                driver.use_travel_times(self._travel_times)
+            driver.watch(self._update_idle_driver)
+            if self._backend == NUMPY:
+                self._idle_drivers.register(driver)
+            else:
+                self._update_idle_driver(driver)
+
+        if not self._waiting_passengers or self._batch_window is not None:
+            return None
+        oldest = self._oldest_reachable(driver)
+        if oldest is None:
+            return None
+        if self._waiting_grid is None:
+            passenger = oldest
+        else:
+            passenger = self._nearest_passenger(driver, oldest)
+        self._stop_waiting(passenger)
+        return passenger
 
-        if self._waiting_passengers:
-            passenger = self._waiting_passengers.pop(0)
-            return passenger
+    def _oldest_reachable(self, driver: Driver) -> Optional[Passenger]:
+        """Return the passenger who has waited longest among those <driver>
+        has a route to, or None if there is no such passenger.
+
+        """
+        for passenger in self._waiting_passengers.values():
+            if driver.get_reach_time(passenger.origin) < math.inf:
+                return passenger
         return None
 
+    def _nearest_passenger(self, driver: Driver,
+                           oldest: Passenger) -> Passenger:
+        """Return the waiting passenger <driver> can reach soonest, or
+        <oldest> if they have been passed over max_skips times already, or
+        waiting passengers are not kept in a grid.
+
+        """
+        waiting_grid = self._waiting_grid
+        skips = 0
+        if self._skipped is not None and self._skipped[0] == oldest.id:
+            skips = self._skipped[1]
+        if waiting_grid is None or skips >= self._max_skips:
+            return oldest
+
+        # A passenger at least <distance> away takes at least this long to
+        # reach.
+        passenger = waiting_grid.nearest(
+            driver.location,
+            lambda _, origin: driver.get_reach_time(origin),
+            lambda distance: round(distance / driver.speed))
+        if passenger is not oldest:
+            self._skipped = (oldest.id, skips + 1)
+        return passenger
+
+    def _wait(self, passenger: Passenger) -> None:
+        """Add <passenger> to the end of the waiting list.
+
+        """
+        self._waiting_passengers[passenger.id] = passenger
+        if self._waiting_grid is not None:
+            self._waiting_grid.insert(passenger.id, passenger.origin,
+                                      self._waiting_count, passenger)
+        self._waiting_count += 1
+
+    def _stop_waiting(self, passenger: Passenger) -> None:
+        """Remove <passenger> from the waiting list, if they are on it.
+
+        """
+        self._waiting_passengers.pop(passenger.id, None)
+        if self._waiting_grid is not None:
+            self._waiting_grid.delete(passenger.id)
+
+    def remove_driver(self, driver: Driver) -> None:
+        """Unregister <driver>, so it is no longer used to fulfill passenger
+        requests. It is registered again if it requests a passenger.
+
+        """
+        if self._drivers.pop(driver.id, None) is None:
+            return
+        driver.watch(None)
+        driver.use_travel_times(None)
+        if self._backend == NUMPY:
+            self._idle_drivers.remove(driver)
+        else:
+            self._idle_drivers.delete(driver.id)
+
+    def counts(self) -> Tuple[int, int]:
+        """Return the number of idle drivers, and the number of passengers
+        waiting for a driver to be assigned.
+
+        """
+        if self._backend == NUMPY:
+            idle = self._idle_drivers.idle_count()
+        else:
+            idle = len(self._idle_drivers)
+        return idle, len(self._waiting_passengers)
+
+    def examined(self) -> int:
+        """Return the number of drivers and passengers examined by searches
+        for the fastest driver or nearest passenger so far.
+
+        >>> dispatcher = Dispatcher()
+        >>> for name, col in [('a', 1), ('b', 30)]:
+        ...     _ = dispatcher.request_passenger(Driver(name, Location(0, col),
+        ...                                             1))
+        >>> _ = dispatcher.request_driver(Passenger('p', 5, Location(0, 0),
+        ...                                         Location(0, 9)))
+        >>> dispatcher.examined()
+        1
+        """
+        examined = self._idle_drivers.examined
+        if self._waiting_grid is not None:
+            examined += self._waiting_grid.examined
+        return examined
+
+    def schedule_batch(self, timestamp: int) -> Optional[int]:
+        """Return the time a new batch should be dispatched, for a request
+        made at <timestamp>, or None if no new batch is needed.
+
+        A batch is needed when this dispatcher dispatches in batches, no batch
+        is already scheduled, and there are both waiting passengers and idle
+        drivers.
+        """
+        if self._batch_window is None or self._batch_due is not None or \
+                not self._waiting_passengers or self._idle_drivers.is_empty():
+            return None
+        self._batch_due = timestamp + self._batch_window
+        return self._batch_due
+
+    def dispatch_batch(self) -> List[Tuple[Passenger, Driver]]:
+        """Match waiting passengers with idle drivers, and return the
+        (passenger, driver) pairs that were matched.
+
+        The matching makes the total time drivers take to reach their
+        passengers as small as possible among the batch_candidates fastest
+        drivers for each passenger, while leaving as few passengers unmatched
+        as it can. Matched passengers leave the waiting list and matched
+        drivers are no longer idle.
+        """
+        self._batch_due = None
+        passengers = list(self._waiting_passengers.values())
+        if not passengers or self._idle_drivers.is_empty():
+            return []
+
+        candidates = []
+        total = 0
+        for passenger in passengers:
+            pairs = []
+            for driver in self._fastest_drivers(passenger.origin,
+                                                self._batch_candidates):
+                pairs.append((driver.id, driver.get_travel_time(
+                    passenger.origin)))
+            if pairs:
+                total += pairs[-1][1]
+            candidates.append(pairs)
+
+        matches = []
+        # Leaving a passenger unmatched costs more than every pickup of any
+        # assignment put together, so matching one more passenger is always
+        # cheaper.
+        for passenger, driver_id in zip(
+                passengers, min_cost_assignment(candidates, total + 1)):
+            if driver_id is not None:
+                driver = self._drivers[driver_id]
+                driver.is_idle = False
+                self._stop_waiting(passenger)
+                matches.append((passenger, driver))
+        return matches
+
+    def _fastest_drivers(self, origin: Location, count: int) -> List[Driver]:
+        """Return up to <count> idle drivers with the shortest travel times
+        to <origin>, fastest first, leaving out any with no route to it.
+        Ties are broken by registration order.
+
+        """
+        if self._backend == NUMPY:
+            return self._idle_drivers.fastest_many(origin, count)
+        return self._idle_drivers.nearest_many(
+            origin, count,
+            lambda driver, _: driver.get_reach_time(origin),
+            lambda distance: round(distance / self._max_speed))
+
+    def _update_idle_driver(self, driver: Driver) -> None:
+        """Add or remove <driver> from the idle drivers to match its idle
+        status and location.
+
+        """
+        if self._backend == NUMPY:
+            self._idle_drivers.update(driver)
+        elif driver.is_idle:
+            self._idle_drivers.insert(driver.id, driver.location,
+                                      self._ranks[driver.id], driver)
+        else:
+            self._idle_drivers.delete(driver.id)
+
     def cancel_ride(self, passenger: Passenger) -> None:
         """Cancel the ride for passenger.
         """
-        if passenger in self._waiting_passengers:
-            self._waiting_passengers.remove(passenger)
+        self._stop_waiting(passenger)
         return None
 
 
@@ -99,4 +425,7 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(
-        config={'extra-imports': ['typing', 'driver', 'passenger']})
+        config={'extra-imports': ['collections', 'math', 'typing',
+                                  'assignment', 'driver', 'driver_table',
+                                  'grid', 'location', 'passenger',
+                                  'travel_time']})
@@ -0,0 +1,197 @@
+"""Distance models for the simulation
+
+A distance model gives the distance a driver covers going from one location
+to another. ManhattanDistance is the model the simulation has always used.
+RoadGrid models a grid of streets with blocked cells and one-way streets.
+
+Every model must give a distance no smaller than the Manhattan distance, as
+the dispatcher relies on Manhattan distance as a lower bound when searching
+for drivers.
+"""
+
+from collections import OrderedDict, deque
+from array import array
+from typing import Iterable, List, Tuple
+from location import Location, manhattan_distance
+
+UNREACHABLE = -1
+
+
+class DistanceModel:
+    """A model of distances between locations.
+
+    This is an abstract class.  Only child classes should be instantiated.
+    """
+
+    def distance(self, origin: Location, destination: Location) -> int:
+        """Return the distance from <origin> to <destination>.
+
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
+
+class ManhattanDistance(DistanceModel):
+    """Distances on an open grid, where every block can be crossed in any
+    direction.
+
+    """
+
+    def distance(self, origin: Location, destination: Location) -> int:
+        """Return the Manhattan distance from <origin> to <destination>.
+
+        >>> ManhattanDistance().distance(Location(0, 0), Location(3, 4))
+        7
+        """
+        return manhattan_distance(origin, destination)
+
+
+class RoadGrid(DistanceModel):
+    """Distances along the streets of a grid with blocked cells and one-way
+    streets.
+
+    Drivers move one cell at a time to a neighbouring cell in the same row or
+    column, and cannot enter a blocked cell. The shortest path from each cell
+    is found with a breadth-first search. If the grid has at most
+    <matrix_limit> pairs of cells, every path is found up front and kept in
+    one distance matrix. Otherwise the distances from the <source_limit> most
+    recently used cells are kept.
+
+    === Attributes ===
+    rows: The number of rows in the grid.
+    cols: The number of columns in the grid.
+
+    === Private Attributes ===
+    _neighbours: The cells that can be reached in one step from each cell,
+        by cell index, where a cell's index is row * cols + col.
+    _matrix: The distance matrix, indexed by
+        (origin index * rows * cols + destination index), or None if
+        distances are found per source.
+    _sources: An ordered dictionary whose key is a cell index, and value is
+        the array of distances from that cell, least recently used first.
+    _source_limit: The most sources kept in _sources.
+    """
+
+    rows: int
+    cols: int
+    _neighbours: List[List[int]]
+    _matrix: 'array | None'
+    _sources: 'OrderedDict[int, array]'
+    _source_limit: int
+
+    def __init__(self, rows: int, cols: int,
+                 blocked: Iterable[Location] = (),
+                 one_way: Iterable[Tuple[Location, Location]] = (),
+                 matrix_limit: int = 1 << 22,
+                 source_limit: int = 1024) -> None:
+        """Initialize a RoadGrid of the points (0, 0) up to
+        (rows - 1, cols - 1).
+
+        blocked: The cells that cannot be entered.
+        one_way: Pairs of neighbouring cells (start, end) such that the
+            street between them can only be driven from start to end.
+
+        >>> grid = RoadGrid(3, 3, blocked=[Location(1, 1)])
+        >>> grid.distance(Location(0, 1), Location(2, 1))
+        4
+        >>> grid = RoadGrid(1, 3, one_way=[(Location(0, 0), Location(0, 1))])
+        >>> grid.distance(Location(0, 0), Location(0, 2))
+        2
+        >>> grid.distance(Location(0, 2), Location(0, 0))
+        Traceback (most recent call last):
+        ...
+        ValueError: No route from (0,2) to (0,0)
+        """
+        self.rows = rows
+        self.cols = cols
+        closed = {self._index(location) for location in blocked}
+        forbidden = {(self._index(end), self._index(start))
+                     for start, end in one_way}
+        self._neighbours = []
+        for row in range(rows):
+            for col in range(cols):
+                cell = row * cols + col
+                steps = []
+                if cell not in closed:
+                    for next_row, next_col in ((row - 1, col), (row + 1, col),
+                                               (row, col - 1), (row, col + 1)):
+                        if 0 <= next_row < rows and 0 <= next_col < cols:
+                            step = next_row * cols + next_col
+                            if step not in closed and \
+                                    (cell, step) not in forbidden:
+                                steps.append(step)
+                self._neighbours.append(steps)
+
+        size = rows * cols
+        self._sources = OrderedDict()
+        self._source_limit = source_limit
+        self._matrix = None
+        if size * size <= matrix_limit:
+            self._matrix = array('i')
+            for source in range(size):
+                self._matrix.extend(self._search(source))
+
+    def distance(self, origin: Location, destination: Location) -> int:
+        """Return the length of the shortest route from <origin> to
+        <destination>.
+
+        Raise a ValueError if either location is off the grid, or there is
+        no route between them.
+        """
+        source = self._index(origin)
+        target = self._index(destination)
+        if self._matrix is not None:
+            result = self._matrix[source * self.rows * self.cols + target]
+        else:
+            result = self._distances_from(source)[target]
+        if result == UNREACHABLE:
+            raise ValueError(f"No route from {origin} to {destination}")
+        return result
+
+    def _index(self, location: Location) -> int:
+        """Return the index of the cell at <location>.
+
+        """
+        row, col = location.row, location.col
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            raise ValueError(f"{location} is off the grid")
+        return row * self.cols + col
+
+    def _distances_from(self, source: int) -> array:
+        """Return the distances from the cell <source> to every cell,
+        searching for them if they are not already kept.
+
+        """
+        distances = self._sources.get(source)
+        if distances is None:
+            distances = self._search(source)
+            self._sources[source] = distances
+            if len(self._sources) > self._source_limit:
+                self._sources.popitem(last=False)
+        else:
+            self._sources.move_to_end(source)
+        return distances
+
+    def _search(self, source: int) -> array:
+        """Return the length of the shortest route from the cell <source> to
+        every cell, or UNREACHABLE if there is none.
+
+        """
+        distances = array('i', [UNREACHABLE]) * (self.rows * self.cols)
+        distances[source] = 0
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            step_distance = distances[cell] + 1
+            for step in self._neighbours[cell]:
+                if distances[step] == UNREACHABLE:
+                    distances[step] = step_distance
+                    queue.append(step)
+        return distances
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={'extra-imports': ['array', 'collections', 'typing',
+                                  'location']})
@@ -1,8 +1,11 @@
 """Drivers for the simulation"""
 
-from typing import Optional
-from location import Location, manhattan_distance
+from __future__ import annotations
+import math
+from typing import Callable, Optional
+from location import Location
 from passenger import Passenger
+from travel_time import TravelTimes, DirectTravelTimes
 
 
 class Driver:
@@ -12,30 +15,94 @@ class Driver:
     id: A unique identifier for the driver.
     location: The current location of the driver.
     is_idle: True if the driver is idle and False otherwise.
+    speed: The driver's speed.
 
     === Private Attributes === _speed: The drivers speed. _destination: The
     destination of the driver. None if the driver has no destination and is
     idle. _passenger: The current passenger for the driver, or None if the
-    driver is not currently driving a passenger.
+    driver is not currently driving a passenger. _is_idle: Backs the is_idle
+    attribute. _location: Backs the location attribute. _listener: Called with
+    the driver whenever its location or idle status changes, or None.
+    _travel_times: The travel-time model of this driver, or None to use
+    Driver.travel_times.
     """
 
+    travel_times: TravelTimes = DirectTravelTimes()
+    #     The travel-time model shared by every driver without one of its
+    #     own. Replace it, for example with a TravelTimeCache, to change how
+    #     travel times are computed or cached.
+
+    __slots__ = ('id', '_speed', '_destination', '_passenger', '_is_idle',
+                 '_location', '_listener', '_travel_times')
     id: str
-    location: Location
-    is_idle: bool
     _speed: int
     _destination: Optional[Location]
     _passenger: Optional[Passenger]
+    _is_idle: bool
+    _location: Location
+    _listener: Optional[Callable[[Driver], None]]
+    _travel_times: Optional[TravelTimes]
 
     def __init__(self, identifier: str, location: Location, speed: int) -> None:
         """Initialize a Driver.
 
         """
         self.id = str(identifier)
-        self.location = location
-        self.is_idle = True
+        self._listener = None
+        self._location = location
+        self._is_idle = True
         self._speed = speed
         self._destination = None
         self._passenger = None
+        self._travel_times = None
+
+    @property
+    def location(self) -> Location:
+        """The current location of the driver.
+
+        """
+        return self._location
+
+    @location.setter
+    def location(self, location: Location) -> None:
+        self._location = location
+        if self._listener is not None:
+            self._listener(self)
+
+    @property
+    def is_idle(self) -> bool:
+        """True if the driver is idle and False otherwise.
+
+        """
+        return self._is_idle
+
+    @is_idle.setter
+    def is_idle(self, is_idle: bool) -> None:
+        self._is_idle = is_idle
+        if self._listener is not None:
+            self._listener(self)
+
+    @property
+    def speed(self) -> int:
+        """The driver's speed.
+
+        """
+        return self._speed
+
+    def watch(self, listener: Optional[Callable[[Driver], None]]) -> None:
+        """Call <listener> with this driver whenever its location or idle
+        status changes, replacing any earlier listener. If <listener> is None,
+        stop calling any listener.
+
+        """
+        self._listener = listener
+
+    def use_travel_times(self, travel_times: Optional[TravelTimes]) -> None:
+        """Compute this driver's travel times with <travel_times>, or with
+        Driver.travel_times if it is None.
+
+        """
+        self._travel_times = travel_times
 
     def __str__(self) -> str:
         """Return a string representation.
@@ -56,8 +123,30 @@ class Driver:
         rounded to the nearest integer.
 
         """
-        return round(
-            manhattan_distance(self.location, destination) / self._speed)
+        travel_times = self._travel_times
+        if travel_times is None:
+            travel_times = Driver.travel_times
+        return travel_times.get(self._location, destination, self._speed)
+
+    def get_reach_time(self, destination: Location) -> float:
+        """Return the time it will take to arrive at the destination, like
+        get_travel_time, or math.inf if there is no route to it.
+
+        >>> from distance import RoadGrid
+        >>> from travel_time import DirectTravelTimes
+        >>> driver = Driver('Ann', Location(0, 0), 1)
+        >>> driver.use_travel_times(DirectTravelTimes(
+        ...     RoadGrid(2, 2, blocked=[Location(1, 1)])))
+        >>> driver.get_reach_time(Location(1, 0))
+        1
+        >>> driver.get_reach_time(Location(1, 1))
+        inf
+        """
+        try:
+            return self.get_travel_time(destination)
+        except ValueError:
+            # The distance model has no route to the destination.
+            return math.inf
 
     def start_drive(self, location: Location) -> int:
         """Start driving to the location.
@@ -74,9 +163,9 @@ class Driver:
         Precondition: self.destination is not None.
 
         """
-        self.is_idle = True
         self.location = self._destination
         self._destination = None
+        self.is_idle = True
 
     def start_trip(self, passenger: Passenger) -> int:
         """Start a ride and return the time the ride will take.
@@ -93,10 +182,23 @@ class Driver:
         Precondition: The driver has a passenger.
         Precondition: self.destination is not None.
 
+        The driver keeps its travel-time model for its next trips:
+
+        >>> from distance import RoadGrid
+        >>> roads = RoadGrid(5, 3, blocked=[Location(row, 1)
+        ...                                 for row in range(4)])
+        >>> driver = Driver('Ann', Location(0, 0), 1)
+        >>> driver.use_travel_times(DirectTravelTimes(roads))
+        >>> driver.start_trip(Passenger('Bo', 30, Location(0, 0),
+        ...                             Location(0, 2)))
+        10
+        >>> driver.end_trip()
+        >>> driver.start_drive(Location(0, 0))
+        10
         """
-        self.is_idle = True
         self.location = self._destination
         self._destination = None
+        self.is_idle = True
         self._passenger = None
 
 
@@ -104,4 +206,5 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(
-        config={'extra-imports': ['location', 'passenger']})
+        config={'extra-imports': ['math', 'typing', 'location', 'passenger',
+                                  'travel_time']})
@@ -0,0 +1,243 @@
+"""A NumPy-backed table of drivers for the simulation
+
+NumPy is optional. Creating a DriverTable without NumPy installed raises an
+ImportError; everything else in the simulation works without it.
+
+=== Constants ===
+NP: The numpy module, or None if NumPy is not installed.
+"""
+
+import math
+from types import ModuleType
+from typing import Dict, List, Optional
+from driver import Driver
+from location import Location
+from travel_time import TravelTimes
+
+
+def _import_numpy() -> Optional[ModuleType]:
+    """Return the numpy module, or None if NumPy is not installed.
+
+    """
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover
+        return None
+    return numpy
+
+
+NP = _import_numpy()
+
+
+class DriverTable:
+    """The registered drivers, held as contiguous arrays of their rows,
+    columns, speeds and idle flags.
+
+    Drivers are stored in the order they were first registered, so a lower
+    index means an earlier first registration. A driver removed and then
+    registered again keeps its index.
+
+    === Attributes ===
+    examined: The number of idle drivers whose travel times fastest() and
+        fastest_many() have computed, over every search so far.
+
+    === Private Attributes ===
+    _drivers:
+        Every driver ever registered, in order of first registration.
+    _index:
+        A dictionary whose key is driver.id, and value is the driver's
+        index in _drivers. Indexes are kept after a driver is removed.
+    _rows, _cols, _speeds:
+        Arrays whose first len(_drivers) values are the row, column and speed
+        of each registered driver.
+    _idle:
+        An array whose first len(_drivers) values are True iff that driver is
+        idle.
+    _idle_count:
+        The number of registered drivers that are idle.
+    _travel_times:
+        The travel-time model of the registered drivers, or None if they
+        use Driver.travel_times.
+    """
+
+    examined: int
+
+    _drivers: List[Driver]
+    _index: Dict[str, int]
+    _rows: 'NP.ndarray'
+    _cols: 'NP.ndarray'
+    _speeds: 'NP.ndarray'
+    _idle: 'NP.ndarray'
+    _idle_count: int
+    _travel_times: Optional[TravelTimes]
+
+    def __init__(self, capacity: int = 1024,
+                 travel_times: Optional[TravelTimes] = None) -> None:
+        """Initialize an empty DriverTable with room for <capacity> drivers
+        before its arrays need to grow, for drivers whose travel times come
+        from <travel_times>, or from Driver.travel_times if it is None.
+
+        """
+        if NP is None:
+            raise ImportError("DriverTable requires NumPy")
+        self.examined = 0
+        self._drivers = []
+        self._index = {}
+        self._rows = NP.zeros(capacity, dtype=NP.int64)
+        self._cols = NP.zeros(capacity, dtype=NP.int64)
+        self._speeds = NP.ones(capacity, dtype=NP.int64)
+        self._idle = NP.zeros(capacity, dtype=bool)
+        self._idle_count = 0
+        self._travel_times = travel_times
+
+    def __len__(self) -> int:
+        """Return the number of drivers ever registered.
+
+        """
+        return len(self._drivers)
+
+    def is_empty(self) -> bool:
+        """Return True iff no registered driver is idle.
+
+        """
+        return self._idle_count == 0
+
+    def idle_count(self) -> int:
+        """Return the number of registered drivers that are idle.
+
+        """
+        return self._idle_count
+
+    def register(self, driver: Driver) -> None:
+        """Add <driver> to this table: at the end, or back at its old index
+        if a driver with the same id was registered and removed before.
+
+        Precondition: <driver> is not already in this table.
+        """
+        index = self._index.get(driver.id)
+        if index is None:
+            if len(self._drivers) == len(self._rows):
+                self._grow()
+            index = self._index[driver.id] = len(self._drivers)
+            self._drivers.append(driver)
+        else:
+            self._drivers[index] = driver
+        self._speeds[index] = driver.speed
+        self.update(driver)
+
+    def update(self, driver: Driver) -> None:
+        """Copy the location and idle status of <driver> into this table.
+
+        Precondition: <driver> is in this table.
+        """
+        index = self._index[driver.id]
+        is_idle = driver.is_idle
+        if is_idle:
+            self._rows[index] = driver.location.row
+            self._cols[index] = driver.location.col
+        if is_idle != self._idle[index]:
+            self._idle[index] = is_idle
+            self._idle_count += 1 if is_idle else -1
+
+    def remove(self, driver: Driver) -> None:
+        """Remove <driver> from this table. Its row is kept, but it is never
+        idle again.
+
+        Precondition: <driver> is in this table.
+        """
+        index = self._index[driver.id]
+        if self._idle[index]:
+            self._idle[index] = False
+            self._idle_count -= 1
+
+    def fastest(self, destination: Location) -> Optional[Driver]:
+        """Return the idle driver with the shortest travel time to
+        <destination>, or None if no idle driver has a route to it.
+
+        Ties are broken in favour of the driver registered first, and the
+        travel time is rounded exactly as Driver.get_travel_time rounds it.
+        Drivers with no route to <destination> are skipped.
+        """
+        if self._idle_count == 0:
+            return None
+        self.examined += self._idle_count
+        if self._by_model():
+            # Only Manhattan distances can be computed from the arrays.
+            return self._fastest_by_model(destination)
+        size = len(self._drivers)
+        candidates = NP.flatnonzero(self._idle[:size])
+        distance = NP.abs(self._rows[candidates] - destination.row) + \
+            NP.abs(self._cols[candidates] - destination.col)
+        # NP.rint rounds halves to even, just like round().
+        times = NP.rint(distance / self._speeds[candidates])
+        return self._drivers[int(candidates[NP.argmin(times)])]
+
+    def fastest_many(self, destination: Location, count: int) -> List[Driver]:
+        """Return up to <count> idle drivers with the shortest travel times to
+        <destination>, fastest first.
+
+        Ties are broken in favour of the driver registered first. Drivers
+        with no route to <destination> are left out.
+        """
+        if self._idle_count == 0:
+            return []
+        self.examined += self._idle_count
+        size = len(self._drivers)
+        candidates = NP.flatnonzero(self._idle[:size])
+        if self._by_model():
+            times = NP.array([self._drivers[int(index)].get_reach_time(
+                destination) for index in candidates])
+            reachable = NP.isfinite(times)
+            candidates, times = candidates[reachable], times[reachable]
+        else:
+            distance = NP.abs(self._rows[candidates] - destination.row) + \
+                NP.abs(self._cols[candidates] - destination.col)
+            times = NP.rint(distance / self._speeds[candidates])
+        order = NP.argsort(times, kind='stable')[:count]
+        return [self._drivers[int(candidates[index])] for index in order]
+
+    def _by_model(self) -> bool:
+        """Return True iff travel times come from a distance model, rather
+        than from Manhattan distances that can be computed from the arrays.
+
+        """
+        travel_times = self._travel_times
+        if travel_times is None:
+            travel_times = Driver.travel_times
+        return travel_times.distance_model is not None
+
+    def _fastest_by_model(self, destination: Location) -> Optional[Driver]:
+        """Return the idle driver with the shortest travel time to
+        <destination>, asking each idle driver for its travel time, or None
+        if none of them has a route to it.
+
+        """
+        size = len(self._drivers)
+        fastest_driver = None
+        fastest_time = math.inf
+        for index in NP.flatnonzero(self._idle[:size]):
+            driver = self._drivers[int(index)]
+            time = driver.get_reach_time(destination)
+            if time < fastest_time:
+                fastest_driver, fastest_time = driver, time
+        return fastest_driver
+
+    def _grow(self) -> None:
+        """Double the capacity of this table's arrays.
+
+        """
+        capacity = max(2 * len(self._rows), 1)
+        for name in ('_rows', '_cols', '_speeds', '_idle'):
+            old = getattr(self, name)
+            new = NP.ones(capacity, dtype=old.dtype) if name == '_speeds' \
+                else NP.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={'extra-imports': ['math', 'types', 'typing', 'driver',
+                                  'location', 'numpy', 'travel_time']})
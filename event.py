@@ -2,15 +2,24 @@
 
 This file should contain all of the classes necessary to model the different
 kinds of events in the simulation.
+
+=== Constants ===
+EVENT_CLASSES: The event classes, indexed by their KIND.
+HANDLERS: The handle function of each event class, indexed by its KIND.
 """
 from __future__ import annotations
-from typing import List
+import heapq
+from typing import Callable, ClassVar, Iterable, Iterator, List, Tuple
 from passenger import Passenger, WAITING, CANCELLED, SATISFIED
 from dispatcher import Dispatcher
 from driver import Driver
 from location import deserialize_location
 from monitor import Monitor, PASSENGER, DRIVER, REQUEST, CANCEL, PICKUP, DROPOFF
 
+Schedule = Callable[[int, int, object], None]
+#     A function that schedules the event with the given timestamp, KIND and
+#     actor.
+
 
 class Event:
     """An event.
@@ -18,7 +27,14 @@ class Event:
     Events have an ordering that is based on the event timestamp: Events with
     older timestamps are less than those with newer timestamps.
 
-    This class is abstract; subclasses must implement do().
+    This class is abstract; subclasses must implement record() and handle().
+
+    An event can also be described by a record of its timestamp, its KIND,
+    and its actor, which holds the passenger, driver or both that it involves.
+    Records are cheaper to store and compare than Events, so a simulation
+    keeps its pending events as records and does each one by calling the
+    handler for its kind, in HANDLERS, directly on the record. do() does an
+    Event the same way.
 
     You may, if you wish, change the API of this class to add
     extra public methods or attributes. Make sure that anything
@@ -29,9 +45,13 @@ class Event:
 
     === Attributes ===
     timestamp: A timestamp for this event.
+    KIND: The kind of this event, which is its class's index in
+        EVENT_CLASSES and HANDLERS.
     """
 
+    __slots__ = ('timestamp',)
     timestamp: int
+    KIND: ClassVar[int]
 
     def __init__(self, timestamp: int) -> None:
         """Initialize an Event with a given timestamp.
@@ -147,6 +167,48 @@ class Event:
         Note: the "business logic" of what actually happens should not be
         handled in any Event classes.
 
+        >>> from location import Location
+        >>> dispatcher, monitor = Dispatcher(), Monitor()
+        >>> ann = Driver('Ann', Location(0, 0), 1)
+        >>> DriverRequest(0, ann).do(dispatcher, monitor)
+        []
+        >>> bo = Passenger('Bo', 9, Location(0, 3), Location(1, 3))
+        >>> [str(event) for event in PassengerRequest(2, bo).do(dispatcher,
+        ...                                                       monitor)]
+        ['5 -- Driver: Ann: Picks up a passenger Passenger: Bo ']
+        """
+        events = []
+
+        def schedule(timestamp: int, kind: int, actor: object) -> None:
+            """Add the event described by the record to <events>.
+
+            """
+            events.append(EVENT_CLASSES[kind].from_record(timestamp, actor))
+
+        timestamp, _, actor = self.record()
+        self.handle(timestamp, actor, dispatcher, monitor, schedule)
+        return events
+
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record of its timestamp, its KIND and its
+        actor, which is everything needed to do it.
+
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the event of this class at <timestamp> with <actor>.
+
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
+    @staticmethod
+    def handle(timestamp: int, actor: object, dispatcher: Dispatcher,
+               monitor: Monitor, schedule: Schedule) -> None:
+        """Do the event of this class at <timestamp> with <actor>, and pass
+        the record of each event it spawns to <schedule>.
+
         """
         raise NotImplementedError("Implemented in a subclass")
 
@@ -154,10 +216,14 @@ class Event:
 class PassengerRequest(Event):
     """A passenger requests a driver.
 
+    Its actor is the passenger.
+
     === Attributes ===
     passenger: The passenger.
     """
 
+    __slots__ = ('passenger',)
+    KIND = 0
     passenger: Passenger
 
     def __init__(self, timestamp: int, passenger: Passenger) -> None:
@@ -167,27 +233,49 @@ class PassengerRequest(Event):
         super().__init__(timestamp)
         self.passenger = passenger
 
-    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record.
+
+        """
+        return self.timestamp, self.KIND, self.passenger
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the PassengerRequest at <timestamp> of the passenger
+        <actor>.
+
+        """
+        return cls(timestamp, actor)
+
+    @staticmethod
+    def handle(timestamp: int, actor: Passenger, dispatcher: Dispatcher,
+               monitor: Monitor, schedule: Schedule) -> None:
         """Assign the passenger to a driver or add the passenger to a waiting
         list. If the passenger is assigned to a driver, the driver starts
         driving to the passenger.
 
-        Return a Cancellation event. If the passenger is assigned to a driver,
-        also return a Pickup event.
+        Schedule a Cancellation event. If the passenger is assigned to a
+        driver, also schedule a Pickup event; in that case the Cancellation is
+        left out when the Pickup happens no later than it, since the passenger
+        will already be satisfied by the time it comes due. If the dispatcher
+        needs a new batch, also schedule a BatchDispatch event.
 
         """
-        monitor.notify(self.timestamp, PASSENGER, REQUEST,
-                       self.passenger.id, self.passenger.origin)
+        monitor.notify(timestamp, PASSENGER, REQUEST, actor.id, actor.origin)
 
-        events = []
-        driver = dispatcher.request_driver(self.passenger)
+        pickup_time = None
+        driver = dispatcher.request_driver(actor)
         if driver is not None:
-            travel_time = driver.start_drive(self.passenger.origin)
-            events.append(Pickup(self.timestamp + travel_time,
-                                 self.passenger, driver))
-        events.append(Cancellation(self.timestamp + self.passenger.patience,
-                                   self.passenger))
-        return events
+            travel_time = driver.start_drive(actor.origin)
+            pickup_time = timestamp + travel_time
+            schedule(pickup_time, Pickup.KIND, (actor, driver))
+        cancel_time = timestamp + actor.patience
+        # The Pickup is scheduled ahead of the Cancellation, so it wins ties.
+        if pickup_time is None or cancel_time < pickup_time:
+            schedule(cancel_time, Cancellation.KIND, actor)
+        batch_time = dispatcher.schedule_batch(timestamp)
+        if batch_time is not None:
+            schedule(batch_time, BatchDispatch.KIND, None)
 
     def __str__(self) -> str:
         """Return a string representation of this event.
@@ -199,10 +287,14 @@ class PassengerRequest(Event):
 class DriverRequest(Event):
     """A driver requests a passenger.
 
+    Its actor is the driver.
+
     === Attributes ===
     driver: The driver.
     """
 
+    __slots__ = ('driver',)
+    KIND = 1
     driver: Driver
 
     def __init__(self, timestamp: int, driver: Driver) -> None:
@@ -212,28 +304,43 @@ class DriverRequest(Event):
         super().__init__(timestamp)
         self.driver = driver
 
-    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record.
+
+        """
+        return self.timestamp, self.KIND, self.driver
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the DriverRequest at <timestamp> of the driver <actor>.
+
+        """
+        return cls(timestamp, actor)
+
+    @staticmethod
+    def handle(timestamp: int, actor: Driver, dispatcher: Dispatcher,
+               monitor: Monitor, schedule: Schedule) -> None:
         """Register the driver, if this is the first request, and
         assign a passenger to the driver, if one is available.
 
-        If a passenger is available, return a Pickup event.
+        If a passenger is available, schedule a Pickup event. If the
+        dispatcher needs a new batch, schedule a BatchDispatch event.
 
         """
         # Notify the monitor about the request.
-        monitor.notify(self.timestamp, DRIVER, REQUEST,
-                       self.driver.id, self.driver.location)
+        monitor.notify(timestamp, DRIVER, REQUEST, actor.id, actor.location)
 
         # Request a passenger from the dispatcher.
         # If there is one available, the driver starts driving towards the
-        # passenger, and the method returns a Pickup event for when the driver
+        # passenger, and a Pickup event is scheduled for when the driver
         # arrives at the passengers location.
-        events = []
-        passenger = dispatcher.request_passenger(self.driver)
+        passenger = dispatcher.request_passenger(actor)
         if passenger is not None:
-            travel_time = self.driver.start_drive(passenger.origin)
-            events.append(Pickup(self.timestamp + travel_time,
-                                 passenger, self.driver))
-        return events
+            travel_time = actor.start_drive(passenger.origin)
+            schedule(timestamp + travel_time, Pickup.KIND, (passenger, actor))
+        batch_time = dispatcher.schedule_batch(timestamp)
+        if batch_time is not None:
+            schedule(batch_time, BatchDispatch.KIND, None)
 
     def __str__(self) -> str:
         """Return a string representation of this event.
@@ -245,9 +352,13 @@ class DriverRequest(Event):
 class Cancellation(Event):
     """A passenger cancels a ride.
 
+    Its actor is the passenger.
+
     === Attributes ===
     passenger: The passenger.
     """
+    __slots__ = ('passenger',)
+    KIND = 2
     passenger: Passenger
 
     def __init__(self, timestamp: int, passenger: Passenger) -> None:
@@ -257,20 +368,36 @@ class Cancellation(Event):
         super().__init__(timestamp)
         self.passenger = passenger
 
-    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record.
+
+        """
+        return self.timestamp, self.KIND, self.passenger
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the Cancellation at <timestamp> of the passenger <actor>.
+
+        >>> event = Cancellation.from_record(4, 'Bo')
+        >>> event.timestamp, event.passenger
+        (4, 'Bo')
+        """
+        return cls(timestamp, actor)
+
+    @staticmethod
+    def handle(timestamp: int, actor: Passenger, dispatcher: Dispatcher,
+               monitor: Monitor, schedule: Schedule) -> None:
         """Changes a waiting passenger to a cancelled passenger and does not
         schedule future events.
 
         If the passenger is already picked up, then they are satisfied and
         can't be canceled.
         """
-        events = []
-        if self.passenger.status == WAITING:
-            monitor.notify(self.timestamp, PASSENGER, CANCEL,
-                           self.passenger.id, self.passenger.origin)
-            dispatcher.cancel_ride(self.passenger)
-            self.passenger.status = CANCELLED
-        return events
+        if actor.status == WAITING:
+            monitor.notify(timestamp, PASSENGER, CANCEL, actor.id,
+                           actor.origin)
+            dispatcher.cancel_ride(actor)
+            actor.status = CANCELLED
 
     def __str__(self) -> str:
         """Return a string representation of this event.
@@ -282,10 +409,14 @@ class Cancellation(Event):
 class Pickup(Event):
     """A driver picks up a passenger.
 
+    Its actor is the (passenger, driver) pair.
+
     === Attributes ===
     passenger: The passenger.
     driver: The driver.
     """
+    __slots__ = ('passenger', 'driver')
+    KIND = 3
     passenger: Passenger
     driver: Driver
 
@@ -299,33 +430,44 @@ class Pickup(Event):
         self.passenger = passenger
         self.driver = driver
 
-    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record.
+
+        """
+        return self.timestamp, self.KIND, (self.passenger, self.driver)
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the Pickup at <timestamp> of the pair <actor>.
+
+        """
+        return cls(timestamp, actor[0], actor[1])
+
+    @staticmethod
+    def handle(timestamp: int, actor: Tuple[Passenger, Driver],
+               dispatcher: Dispatcher, monitor: Monitor,
+               schedule: Schedule) -> None:
         """Sets the driver's location to the passenger's location.
 
         If the passenger is waiting, the driver begins giving them a trip and
         the driver's destination becomes the passenger's destination.
 
-        Return a DropOff event. If the passenger is cancelled, return a
+        Schedule a DropOff event. If the passenger is cancelled, schedule a
         DriverRequest event and the driver has no destination at the moment.
         """
-        self.driver.end_drive()
-        monitor.notify(self.timestamp, DRIVER, PICKUP,
-                       self.driver.id, self.driver.location)
-        events = []
-        if self.passenger.status == WAITING:
+        passenger, driver = actor
+        driver.end_drive()
+        monitor.notify(timestamp, DRIVER, PICKUP, driver.id, driver.location)
+        if passenger.status == WAITING:
 
-            monitor.notify(self.timestamp, PASSENGER, PICKUP,
-                           self.passenger.id,
-                           self.passenger.origin)
+            monitor.notify(timestamp, PASSENGER, PICKUP, passenger.id,
+                           passenger.origin)
 
-            travel_time = self.driver.start_trip(
-                self.passenger)
-            self.passenger.status = SATISFIED
-            events.append(Dropoff(self.timestamp + travel_time, self.driver,
-                                  self.passenger))
+            travel_time = driver.start_trip(passenger)
+            passenger.status = SATISFIED
+            schedule(timestamp + travel_time, Dropoff.KIND, actor)
         else:
-            events.append(DriverRequest(self.timestamp, self.driver))
-        return events
+            schedule(timestamp, DriverRequest.KIND, driver)
 
     def __str__(self) -> str:
         """Return a string representation of this event.
@@ -338,10 +480,14 @@ class Pickup(Event):
 class Dropoff(Event):
     """A driver drops off a passenger.
 
+    Its actor is the (passenger, driver) pair.
+
     === Attributes ===
     passenger: The passenger.
     driver: The driver.
     """
+    __slots__ = ('passenger', 'driver')
+    KIND = 4
     passenger: Passenger
     driver: Driver
 
@@ -353,18 +499,33 @@ class Dropoff(Event):
         self.driver = driver
         self.passenger = passenger
 
-    def do(self, dispatcher: Dispatcher, monitor: Monitor) -> List[Event]:
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record.
+
+        """
+        return self.timestamp, self.KIND, (self.passenger, self.driver)
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the Dropoff at <timestamp> of the pair <actor>.
+
+        """
+        return cls(timestamp, actor[1], actor[0])
+
+    @staticmethod
+    def handle(timestamp: int, actor: Tuple[Passenger, Driver],
+               dispatcher: Dispatcher, monitor: Monitor,
+               schedule: Schedule) -> None:
         """Sets the driver's location to the passenger's destination.
 
-        Return a DriverRequest event and the driver has no destination at
+        Schedule a DriverRequest event and the driver has no destination at
         the moment.
         """
-        monitor.notify(self.timestamp, DRIVER, DROPOFF,
-                       self.driver.id, self.passenger.destination)
-        events = []
-        self.driver.end_trip()
-        events.append(DriverRequest(self.timestamp, self.driver))
-        return events
+        passenger, driver = actor
+        monitor.notify(timestamp, DRIVER, DROPOFF, driver.id,
+                       passenger.destination)
+        driver.end_trip()
+        schedule(timestamp, DriverRequest.KIND, driver)
 
     def __str__(self) -> str:
         """Return a string representation of this event.
@@ -374,6 +535,57 @@ class Dropoff(Event):
                f"{self.passenger}"
 
 
+class BatchDispatch(Event):
+    """The dispatcher matches a batch of waiting passengers with idle drivers.
+
+    It has no actor, so its actor is None.
+    """
+    __slots__ = ()
+    KIND = 5
+
+    def record(self) -> Tuple[int, int, object]:
+        """Return this event as a record.
+
+        """
+        return self.timestamp, self.KIND, None
+
+    @classmethod
+    def from_record(cls, timestamp: int, actor: object) -> Event:
+        """Return the BatchDispatch at <timestamp>.
+
+        """
+        return cls(timestamp)
+
+    @staticmethod
+    def handle(timestamp: int, actor: None, dispatcher: Dispatcher,
+               monitor: Monitor, schedule: Schedule) -> None:
+        """Match the waiting passengers with idle drivers. Each matched driver
+        starts driving to their passenger.
+
+        Schedule a Pickup event for each match. If passengers are still
+        waiting while drivers are still idle, such as when none of a
+        passenger's candidate drivers was left for them, schedule another
+        BatchDispatch.
+        """
+        for passenger, driver in dispatcher.dispatch_batch():
+            travel_time = driver.start_drive(passenger.origin)
+            schedule(timestamp + travel_time, Pickup.KIND, (passenger, driver))
+        batch_time = dispatcher.schedule_batch(timestamp)
+        if batch_time is not None:
+            schedule(batch_time, BatchDispatch.KIND, None)
+
+    def __str__(self) -> str:
+        """Return a string representation of this event.
+
+        """
+        return f"{self.timestamp} -- Dispatch a batch"
+
+
+EVENT_CLASSES = [PassengerRequest, DriverRequest, Cancellation, Pickup,
+                 Dropoff, BatchDispatch]
+HANDLERS = [event_class.handle for event_class in EVENT_CLASSES]
+
+
 def create_event_list(filename: str) -> List[Event]:
     """Return a list of Events based on raw list of events in <filename>.
 
@@ -382,7 +594,19 @@ def create_event_list(filename: str) -> List[Event]:
 
     filename: The name of a file that contains the list of events.
     """
-    events = []
+    return list(iter_events(filename))
+
+
+def iter_events(filename: str) -> Iterator[Event]:
+    """Yield the Events in <filename> one at a time, in file order.
+
+    Only one line of the file is held in memory at a time.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    filename: The name of a file that contains the list of events.
+    """
     with open(filename, "r") as file:
         for line in file:
             line = line.strip()
@@ -406,16 +630,57 @@ def create_event_list(filename: str) -> List[Event]:
                 # Create a DriverRequest event.
                 driver = Driver(tokens[2], deserialize_location(tokens[3]),
                                 int(tokens[4]))
-                events.append(DriverRequest(timestamp, driver))
+                yield DriverRequest(timestamp, driver)
 
             elif event_type == "PassengerRequest":
                 # Create a PassengerRequest event.
                 passenger = Passenger(tokens[2], int(tokens[5]),
                                       deserialize_location(tokens[3]),
                                       deserialize_location(tokens[4]))
-                events.append(PassengerRequest(timestamp, passenger))
+                yield PassengerRequest(timestamp, passenger)
+
+
+def reorder_events(events: Iterable[Event], window: int) -> Iterator[Event]:
+    """Yield <events> sorted by timestamp, holding back at most <window> of
+    them at once.
 
-    return events
+    Events with equal timestamps are yielded in the order they appear in
+    <events>. An event that is more than <window> places out of order cannot
+    be sorted this way, and a ValueError is raised when it is reached.
+
+    Precondition: window >= 0
+
+    >>> events = [Event(2), Event(1), Event(3), Event(3)]
+    >>> [e.timestamp for e in reorder_events(events, 1)]
+    [1, 2, 3, 3]
+    >>> [e.timestamp for e in reorder_events(events, 0)]
+    ... # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: Event at time 1 arrived after time 2; increase the reorder ...
+    """
+    buffer = []
+    count = 0
+    released = None
+    events = iter(events)
+    for event in events:
+        heapq.heappush(buffer, (event.timestamp, count, event))
+        count += 1
+        if len(buffer) > window:
+            break
+    while buffer:
+        timestamp, _, earliest = heapq.heappop(buffer)
+        if released is not None and timestamp < released:
+            raise ValueError(f"Event at time {timestamp} arrived after "
+                             f"time {released}; increase the reorder "
+                             f"window beyond {window}")
+        released = timestamp
+        yield earliest
+        # Refill the buffer with the next event, if there is one.
+        upcoming = next(events, None)
+        if upcoming is not None:
+            heapq.heappush(buffer, (upcoming.timestamp, count, upcoming))
+            count += 1
 
 
 if __name__ == '__main__':
@@ -423,6 +688,6 @@ if __name__ == '__main__':
 
     python_ta.check_all(
         config={
-            'allowed-io': ['create_event_list'],
-            'extra-imports': ['passenger', 'dispatcher', 'driver',
-                              'location', 'monitor']})
+            'allowed-io': ['iter_events'],
+            'extra-imports': ['heapq', 'typing', 'passenger', 'dispatcher',
+                              'driver', 'location', 'monitor']})
@@ -0,0 +1,133 @@
+"""A fast bulk parser for event files
+
+parse_events reads the same format as event.create_event_list and produces
+the same events, but reads the file in large chunks, optionally through a
+memory map, and interns the identifier strings that repeat from line to
+line. Locations are shared through location.make_location, as they are by
+create_event_list. A malformed line raises an EventFormatError that
+names the file and line number.
+"""
+
+import mmap
+import os
+import sys
+from typing import BinaryIO, Iterator, List, Union
+from driver import Driver
+from event import Event, DriverRequest, PassengerRequest
+from location import deserialize_location
+from passenger import Passenger
+
+CHUNK_SIZE = 1 << 20
+
+
+class EventFormatError(ValueError):
+    """A line of an event file is malformed.
+
+    === Attributes ===
+    filename: The name of the event file.
+    line_number: The number of the malformed line, counting from 1.
+    line: The malformed line.
+    """
+
+    filename: str
+    line_number: int
+    line: str
+
+    def __init__(self, filename: str, line_number: int, line: str,
+                 reason: str) -> None:
+        """Initialize an EventFormatError.
+
+        """
+        super().__init__(f"{filename}, line {line_number}: {reason}: "
+                         f"{line.strip()!r}")
+        self.filename = filename
+        self.line_number = line_number
+        self.line = line
+
+
+def load_events(filename: str, use_mmap: bool = False) -> List[Event]:
+    """Return a list of Events based on raw list of events in <filename>.
+
+    This returns the same events as event.create_event_list.
+
+    filename: The name of a file that contains the list of events.
+    use_mmap: If True, read the file through a memory map.
+    """
+    return list(parse_events(filename, use_mmap))
+
+
+def parse_events(filename: str, use_mmap: bool = False,
+                 chunk_size: int = CHUNK_SIZE) -> Iterator[Event]:
+    """Yield the Events in <filename> one at a time, in file order.
+
+    filename: The name of a file that contains the list of events.
+    use_mmap: If True, read the file through a memory map.
+    chunk_size: The number of bytes read from the file at a time.
+    """
+    line_number = 0
+    for line in _read_lines(filename, use_mmap, chunk_size):
+        line_number += 1
+        tokens = line.split()
+        if not tokens or tokens[0].startswith("#"):
+            # Skip lines that are blank or start with #.
+            continue
+        try:
+            timestamp = int(tokens[0])
+            event_type = tokens[1]
+            if event_type == "DriverRequest":
+                driver = Driver(sys.intern(tokens[2]),
+                                deserialize_location(tokens[3]),
+                                int(tokens[4]))
+                yield DriverRequest(timestamp, driver)
+            elif event_type == "PassengerRequest":
+                passenger = Passenger(sys.intern(tokens[2]), int(tokens[5]),
+                                      deserialize_location(tokens[3]),
+                                      deserialize_location(tokens[4]))
+                yield PassengerRequest(timestamp, passenger)
+        except IndexError:
+            raise EventFormatError(filename, line_number, line,
+                                   "missing fields") from None
+        except ValueError as error:
+            raise EventFormatError(filename, line_number, line,
+                                   str(error)) from None
+
+
+def _read_lines(filename: str, use_mmap: bool,
+                chunk_size: int) -> Iterator[str]:
+    """Yield every line of <filename>, without its newline, reading
+    <chunk_size> bytes at a time.
+
+    """
+    with open(filename, "rb") as file:
+        source: Union[mmap.mmap, BinaryIO]
+        if use_mmap and os.fstat(file.fileno()).st_size > 0:
+            source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            source = file
+        try:
+            tail = b""
+            chunk = source.read(chunk_size)
+            while chunk:
+                block = tail + chunk
+                end = block.rfind(b"\n") + 1
+                tail = block[end:]
+                if end:
+                    lines = block[:end].decode().split("\n")
+                    lines.pop()
+                    yield from lines
+                chunk = source.read(chunk_size)
+            if tail:
+                yield tail.decode()
+        finally:
+            if source is not file:
+                source.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={
+            'allowed-io': ['_read_lines'],
+            'extra-imports': ['mmap', 'os', 'sys', 'typing', 'driver',
+                              'event', 'location', 'passenger']})
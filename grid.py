@@ -0,0 +1,283 @@
+"""A spatial index of objects on the simulation grid"""
+
+import bisect
+import math
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from location import Location, manhattan_distance
+
+
+class Grid:
+    """A uniform grid of buckets that holds keyed objects by location.
+
+    The grid is split into square cells of side <cell_size>. Each object is
+    stored in the bucket of the cell containing its location, together with
+    a rank that is used to break ties between equally near objects: the
+    object with the *lower* rank wins.
+
+    nearest() searches outward from a location one ring of cells at a time,
+    where a ring holds every cell at the same Manhattan cell distance from
+    the starting cell, and stops as soon as no unsearched cell can hold a
+    better object.
+
+    === Attributes ===
+    cell_size: The side length of each cell.
+    examined: The number of objects whose cost nearest() and nearest_many()
+        have computed, over every search so far.
+    """
+
+    cell_size: int
+    examined: int
+
+    # === Private Attributes ===
+    _cells: Dict[Tuple[int, int], Dict[str, Tuple[int, Location, Any]]]
+    #     A dictionary whose key is a cell, and value is another dictionary.
+    #     The key of the second dictionary is an object's key and its value is
+    #     a (rank, location, object) tuple.
+    _where: Dict[str, Tuple[int, int]]
+    #     A dictionary whose key is an object's key, and value is the cell
+    #     that object is stored in.
+    _bounds: Optional[Tuple[int, int, int, int]]
+    #     The smallest and largest cell row and column that have ever held
+    #     an object, or None if the grid has never held an object.
+
+    def __init__(self, cell_size: int = 8) -> None:
+        """Initialize an empty Grid.
+
+        Precondition: cell_size >= 1
+        """
+        self.cell_size = cell_size
+        self.examined = 0
+        self._cells = {}
+        self._where = {}
+        self._bounds = None
+
+    def __len__(self) -> int:
+        """Return the number of objects in this Grid.
+
+        >>> grid = Grid()
+        >>> grid.insert('a', Location(1, 2), 0, 'A')
+        >>> len(grid)
+        1
+        """
+        return len(self._where)
+
+    def __contains__(self, key: str) -> bool:
+        """Return True iff an object with <key> is in this Grid.
+
+        """
+        return key in self._where
+
+    def is_empty(self) -> bool:
+        """Return True iff this Grid holds no objects.
+
+        """
+        return not self._where
+
+    def insert(self, key: str, location: Location, rank: int,
+               item: Any) -> None:
+        """Store <item> under <key> at <location>, replacing any object
+        already stored under <key>.
+
+        """
+        cell = (location.row // self.cell_size, location.col // self.cell_size)
+        old = self._where.get(key)
+        if old is not None and old != cell:
+            self._discard(key, old)
+        self._cells.setdefault(cell, {})[key] = (rank, location, item)
+        self._where[key] = cell
+
+        if self._bounds is None:
+            self._bounds = (cell[0], cell[0], cell[1], cell[1])
+        else:
+            low_row, high_row, low_col, high_col = self._bounds
+            self._bounds = (min(low_row, cell[0]), max(high_row, cell[0]),
+                            min(low_col, cell[1]), max(high_col, cell[1]))
+
+    def delete(self, key: str) -> None:
+        """Remove the object stored under <key>, if there is one.
+
+        """
+        cell = self._where.get(key)
+        if cell is not None:
+            self._discard(key, cell)
+            del self._where[key]
+
+    def _discard(self, key: str, cell: Tuple[int, int]) -> None:
+        """Remove <key> from the bucket of <cell>.
+
+        """
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def nearest(self, origin: Location,
+                cost: Optional[Callable[[Any, Location], int]] = None,
+                bound: Optional[Callable[[int], int]] = None) -> Optional[Any]:
+        """Return the object with the lowest cost from <origin>, or None if
+        this Grid holds no object with a finite cost. Ties are broken by the
+        lower rank.
+
+        cost: Return the cost of reaching an object stored at a location, or
+            math.inf if it cannot be reached. Defaults to the Manhattan
+            distance between the location and <origin>.
+        bound: Return a lower bound on the cost of any object whose location
+            is at least a given Manhattan distance from <origin>. It must not
+            decrease as the distance grows. Defaults to the distance itself.
+
+        >>> grid = Grid(cell_size=2)
+        >>> grid.insert('far', Location(9, 9), 0, 'far')
+        >>> grid.insert('near', Location(1, 2), 2, 'near')
+        >>> grid.insert('tied', Location(2, 1), 1, 'tied')
+        >>> grid.nearest(Location(1, 1))
+        'tied'
+        >>> grid.nearest(Location(8, 8))
+        'far'
+        >>> grid.examined
+        3
+        >>> grid.nearest(Location(1, 1), lambda item, _: float('inf')) is None
+        True
+        """
+        if cost is None:
+            cost = _item_distance(origin)
+        if bound is None:
+            bound = _identity
+
+        # Any key with a finite cost is lower than this one.
+        best = None
+        best_key = (math.inf,)
+        examined = 0
+        for distance, bucket in self._buckets_around(origin):
+            if bound(distance) > best_key[0]:
+                break
+            examined += len(bucket)
+            for rank, location, item in bucket.values():
+                key = (cost(item, location), rank)
+                if key < best_key:
+                    best, best_key = item, key
+        self.examined += examined
+        return best
+
+    def nearest_many(self, origin: Location, count: int,
+                     cost: Optional[Callable[[Any, Location], int]] = None,
+                     bound: Optional[Callable[[int], int]] = None
+                     ) -> List[Any]:
+        """Return up to <count> objects with the lowest cost from <origin>,
+        lowest cost first, leaving out any whose cost is math.inf. Ties are
+        broken by the lower rank.
+
+        cost and bound are as for nearest().
+
+        >>> grid = Grid(cell_size=2)
+        >>> for rank, (row, col) in enumerate([(9, 9), (1, 2), (2, 1)]):
+        ...     grid.insert(str(rank), Location(row, col), rank, (row, col))
+        >>> grid.nearest_many(Location(1, 1), 2)
+        [(1, 2), (2, 1)]
+        >>> grid.nearest_many(Location(1, 1), 5)
+        [(1, 2), (2, 1), (9, 9)]
+        >>> tied = Grid()
+        >>> for name in ['a', 'b', 'c']:
+        ...     tied.insert(name, Location(1, 1), 0, {'id': name})
+        >>> tied.nearest_many(Location(1, 1), 2)
+        [{'id': 'a'}, {'id': 'b'}]
+        """
+        if cost is None:
+            cost = _item_distance(origin)
+        if bound is None:
+            bound = _identity
+
+        # Each entry is (cost, rank, order examined, object), so objects are
+        # never compared, even if two share a rank.
+        best = []
+        examined = 0
+        for distance, bucket in self._buckets_around(origin):
+            if len(best) == count and bound(distance) > best[-1][0]:
+                break
+            for rank, location, item in bucket.values():
+                key = (cost(item, location), rank, examined)
+                examined += 1
+                if key[0] == math.inf:
+                    continue
+                if len(best) < count or key < best[-1][:3]:
+                    bisect.insort(best, key + (item,))
+                    del best[count:]
+        self.examined += examined
+        return [entry[3] for entry in best]
+
+    def items(self) -> List[Any]:
+        """Return every object in this Grid, lowest rank first.
+
+        """
+        entries = [entry for bucket in self._cells.values()
+                   for entry in bucket.values()]
+        entries.sort(key=lambda entry: entry[0])
+        return [item for _, _, item in entries]
+
+    def _buckets_around(self, origin: Location) \
+            -> Iterator[Tuple[int, Dict[str, Tuple[int, Location, Any]]]]:
+        """Yield every non-empty bucket, one ring of cells around <origin> at
+        a time, nearest ring first, along with the smallest Manhattan
+        distance from <origin> to any point in that bucket's ring.
+
+        """
+        if self._bounds is None:
+            return
+        size = self.cell_size
+        row = origin.row // size
+        col = origin.col // size
+        low_row, high_row, low_col, high_col = self._bounds
+        last_ring = max(abs(row - low_row), abs(row - high_row)) + \
+            max(abs(col - low_col), abs(col - high_col))
+
+        ring = 0
+        while ring <= last_ring and self._where:
+            # Every point in a cell of this ring is at least this far from
+            # <origin>.
+            distance = _ring_distance(ring, size)
+            for row_offset in range(-ring, ring + 1):
+                col_offset = ring - abs(row_offset)
+                bucket = self._cells.get((row + row_offset, col + col_offset))
+                if bucket is not None:
+                    yield distance, bucket
+                if col_offset != 0:
+                    bucket = self._cells.get((row + row_offset,
+                                              col - col_offset))
+                    if bucket is not None:
+                        yield distance, bucket
+            ring += 1
+
+
+def _ring_distance(ring: int, cell_size: int) -> int:
+    """Return the smallest Manhattan distance between a point and any point in
+    a cell <ring> cells away from the point's own cell.
+
+    >>> _ring_distance(0, 4), _ring_distance(1, 4), _ring_distance(3, 4)
+    (0, 1, 6)
+    """
+    if ring < 2:
+        return ring
+    return (ring - 2) * cell_size + 2
+
+
+def _identity(distance: int) -> int:
+    """Return <distance> unchanged.
+
+    """
+    return distance
+
+
+def _item_distance(origin: Location) -> Callable[[Any, Location], int]:
+    """Return a cost function giving the Manhattan distance from <origin>.
+
+    """
+    def cost(_: Any, location: Location) -> int:
+        return manhattan_distance(origin, location)
+    return cost
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={
+            'extra-imports': ['bisect', 'math', 'typing', 'location']})
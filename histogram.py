@@ -0,0 +1,152 @@
+"""Mergeable histograms of whole numbers, for percentiles
+
+A Histogram counts non-negative whole numbers in log-linear buckets, like an
+HDR histogram. Numbers below 2 ** precision each have a bucket of their own.
+Above that, every power of two is split into 2 ** (precision - 1) buckets of
+equal width, so a bucket is never wider than 2 ** -(precision - 1) times the
+numbers in it.
+
+A percentile is reported as the middle of the bucket holding the exact
+nearest-rank percentile, so it is exact below 2 ** precision, and otherwise
+within 2 ** -precision times the exact percentile of it. With the default
+precision of 7, that is under 0.8%.
+
+Memory is bounded by the number of buckets up to the largest number counted,
+which is under 2 ** (precision - 1) for each bit of that number.
+
+Merging two histograms of the same precision adds up their counts, which
+gives exactly the histogram of all the numbers counted by either, so
+histograms built in parallel, such as one per shard or process, can be
+combined without losing anything.
+
+=== Constants ===
+DEFAULT_PRECISION: The default precision.
+"""
+
+from __future__ import annotations
+from array import array
+
+DEFAULT_PRECISION = 7
+
+
+class Histogram:
+    """A histogram of non-negative whole numbers.
+
+    === Attributes ===
+    precision: The number of bits of each number that its bucket keeps.
+    count: The number of numbers counted.
+    """
+    precision: int
+    count: int
+
+    # === Private Attributes ===
+    _counts: array
+    #     The count of each bucket, by index, up to the last bucket that
+    #     holds any number.
+
+    def __init__(self, precision: int = DEFAULT_PRECISION) -> None:
+        """Initialize an empty Histogram.
+
+        Precondition: precision >= 1
+        """
+        self.precision = precision
+        self.count = 0
+        self._counts = array('q')
+
+    def __len__(self) -> int:
+        """Return the number of numbers counted.
+
+        """
+        return self.count
+
+    def add(self, value: int, count: int = 1) -> None:
+        """Count <value>, <count> times.
+
+        Precondition: value >= 0 and count >= 0
+        """
+        index = _index(value, self.precision)
+        counts = self._counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += count
+        self.count += count
+
+    def merge(self, other: Histogram) -> None:
+        """Add every number counted by <other> to this histogram.
+
+        Precondition: other.precision == self.precision
+
+        >>> first, second, both = Histogram(), Histogram(), Histogram()
+        >>> for value in range(0, 1000, 7):
+        ...     first.add(value)
+        ...     both.add(value)
+        >>> for value in range(3, 5000, 11):
+        ...     second.add(value)
+        ...     both.add(value)
+        >>> first.merge(second)
+        >>> first.count == both.count and first._counts == both._counts
+        True
+        """
+        counts = self._counts
+        if len(other._counts) > len(counts):
+            counts.extend([0] * (len(other._counts) - len(counts)))
+        for index, count in enumerate(other._counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+
+    def percentile(self, percentile: float) -> int:
+        """Return the nearest-rank <percentile> of the numbers counted, to
+        within the precision of this histogram, or 0 if none have been.
+
+        >>> histogram = Histogram()
+        >>> for value in range(1, 101):
+        ...     histogram.add(value)
+        >>> histogram.percentile(95), histogram.percentile(100)
+        (95, 100)
+        >>> histogram.add(100000)
+        >>> histogram.percentile(100)
+        99840
+        """
+        if self.count == 0:
+            return 0
+        # The smallest number with at least this many numbers up to it.
+        rank = max(-(-percentile * self.count // 100), 1)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return _value(index, self.precision)
+        return _value(len(self._counts) - 1, self.precision)
+
+
+def _index(value: int, precision: int) -> int:
+    """Return the index of the bucket holding <value>.
+
+    >>> [_index(value, 3) for value in [0, 7, 8, 9, 10, 16, 20]]
+    [0, 7, 8, 8, 9, 12, 13]
+    """
+    shift = value.bit_length() - precision
+    if shift <= 0:
+        return value
+    # The top <precision> bits of <value>, which start with a 1.
+    return (shift << (precision - 1)) + (value >> shift)
+
+
+def _value(index: int, precision: int) -> int:
+    """Return the middle of the bucket with <index>.
+
+    >>> [_value(index, 3) for index in [0, 7, 8, 9, 12, 13]]
+    [0, 7, 9, 11, 18, 22]
+    """
+    shift = (index >> (precision - 1)) - 1
+    if shift <= 0:
+        return index
+    low = (index - (shift << (precision - 1))) << shift
+    return low + (1 << (shift - 1))
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={'extra-imports': ['array']})
@@ -3,15 +3,23 @@
 from __future__ import annotations
 
 
+CACHE_LIMIT = 1 << 16
+
+
 class Location:
     """A two-dimensional location.
 
+    Locations are immutable and hashable, so one Location can be shared by
+    everything at the same grid point. Use make_location to get a shared
+    Location.
+
     === Attributes ===
     row:
         A value representing the horizontal index
     col:
         A value representing the vertical index
     """
+    __slots__ = ('row', 'col')
     row: int
     col: int
 
@@ -19,8 +27,42 @@ class Location:
         """Initialize a location.
 
         """
-        self.row = row
-        self.col = column
+        object.__setattr__(self, 'row', row)
+        object.__setattr__(self, 'col', column)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise an AttributeError, as Locations are immutable.
+
+        >>> Location(1, 2).row = 3
+        Traceback (most recent call last):
+        ...
+        AttributeError: Location is immutable
+        """
+        raise AttributeError("Location is immutable")
+
+    def __hash__(self) -> int:
+        """Return a hash of this location.
+
+        >>> hash(Location(4, 2)) == hash(Location(4, 2))
+        True
+        """
+        return hash((self.row, self.col))
+
+    def __reduce__(self) -> tuple:
+        """Return how to pickle this location, which cannot be done by
+        setting its attributes.
+
+        >>> import pickle
+        >>> pickle.loads(pickle.dumps(Location(4, 2)))
+        Location(4, 2)
+        """
+        return make_location, (self.row, self.col)
+
+    def __repr__(self) -> str:
+        """Return a representation of this location.
+
+        """
+        return f"Location({self.row}, {self.col})"
 
     def __str__(self) -> str:
         """Return a string representation.
@@ -28,13 +70,45 @@ class Location:
         """
         return f"({self.row},{self.col})"
 
-    def __eq__(self, other: Location) -> bool:
+    def __eq__(self, other: object) -> bool:
         """Return True if self equals other, and false otherwise.
 
         """
+        if not isinstance(other, Location):
+            return NotImplemented
         return self.row == other.row and self.col == other.col
 
 
+class _SharedLocations:
+    """The Locations handed out by make_location.
+
+    === Attributes ===
+    by_point:
+        The shared Location for each (row, column) point seen so far
+    """
+    by_point: dict[tuple[int, int], Location] = {}
+
+
+def make_location(row: int, column: int) -> Location:
+    """Return a Location at <row> and <column>, shared with every other
+    caller asking for the same point.
+
+    Only the first CACHE_LIMIT distinct points are shared; after that, new
+    points get a Location of their own.
+
+    >>> make_location(4, 2) is make_location(4, 2)
+    True
+    """
+    key = (row, column)
+    shared = _SharedLocations.by_point
+    location = shared.get(key)
+    if location is None:
+        location = Location(row, column)
+        if len(shared) < CACHE_LIMIT:
+            shared[key] = location
+    return location
+
+
 def manhattan_distance(origin: Location, destination: Location) -> int:
     """Return the Manhattan distance between the origin and the destination.
 
@@ -42,13 +116,25 @@ def manhattan_distance(origin: Location, destination: Location) -> int:
     return abs(origin.row - destination.row) + abs(origin.col - destination.col)
 
 
+def forget_locations() -> None:
+    """Forget the Locations shared so far, so make_location makes new ones.
+
+    >>> first = make_location(4, 2)
+    >>> forget_locations()
+    >>> make_location(4, 2) is first
+    False
+    """
+    _SharedLocations.by_point.clear()
+
+
 def deserialize_location(location_str: str) -> Location:
     """Deserialize a location.
 
     location_str: A location in the format 'row,col'
     """
     string_location = location_str.split(",")
-    new_location = Location(int(string_location[0]), int(string_location[-1]))
+    new_location = make_location(int(string_location[0]),
+                                 int(string_location[-1]))
     return new_location
 
 
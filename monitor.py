@@ -16,9 +16,15 @@ PICKUP: A constant used for the pickup activity description.
 DROPOFF: A constant used for the dropoff activity description.
 """
 
-from typing import Dict, List
-from location import Location, \
+from __future__ import annotations
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from distance import DistanceModel
+from histogram import Histogram
+from location import Location, make_location, \
     manhattan_distance  # i added the comma and manhattan_distance part
+from timeseries import TimeSeries, REQUESTS, PICKUPS, CANCELLATIONS, \
+    DROPOFFS
 
 PASSENGER = "passenger"
 DRIVER = "driver"
@@ -28,6 +34,16 @@ CANCEL = "cancel"
 PICKUP = "pickup"
 DROPOFF = "dropoff"
 
+CATEGORIES = (PASSENGER, DRIVER)
+DESCRIPTIONS = (REQUEST, CANCEL, PICKUP, DROPOFF)
+
+_SERIES_COLUMNS = {(PASSENGER, REQUEST): REQUESTS,
+                   (PASSENGER, PICKUP): PICKUPS,
+                   (PASSENGER, CANCEL): CANCELLATIONS,
+                   (DRIVER, DROPOFF): DROPOFFS}
+#     The time series column counting each category and description of
+#     activity.
+
 
 class Activity:
     """An activity that occurs in the simulation.
@@ -39,6 +55,7 @@ class Activity:
     location: The location at which the activity occurred.
     """
 
+    __slots__ = ('time', 'description', 'id', 'location')
     time: int
     description: str
     id: str
@@ -55,34 +72,287 @@ class Activity:
         self.location = location
 
 
+class ActivityLog:
+    """A compact log of activities, grouped by the actor doing them.
+
+    Activities are stored column by column in arrays of machine integers:
+    the time, the index of the description in DESCRIPTIONS, the index of the
+    actor, and the row and column of the location. Each actor's activities
+    are chained together in the order they were added. Activity objects are
+    only built when they are looked up.
+
+    === Private Attributes ===
+    _times, _descriptions, _rows, _cols:
+        The time, description code, row and column of each activity.
+    _next:
+        The position of the actor's next activity after each activity, or -1
+        if it is the actor's latest activity.
+    _actors:
+        A dictionary whose key is a category, and value is another
+        dictionary. The key of the second dictionary is an identifier and its
+        value is the index of that actor.
+    _first, _last:
+        The position of each actor's first and latest activity, by actor
+        index.
+    """
+
+    _times: array
+    _descriptions: array
+    _rows: array
+    _cols: array
+    _next: array
+    _actors: Dict[str, Dict[str, int]]
+    _first: array
+    _last: array
+
+    def __init__(self) -> None:
+        """Initialize an empty ActivityLog.
+
+        """
+        self._times = array('q')
+        self._descriptions = array('B')
+        self._rows = array('i')
+        self._cols = array('i')
+        self._next = array('q')
+        self._actors = {category: {} for category in CATEGORIES}
+        self._first = array('q')
+        self._last = array('q')
+
+    def __len__(self) -> int:
+        """Return the number of activities in this log.
+
+        """
+        return len(self._times)
+
+    def add(self, category: str, activity: Activity) -> None:
+        """Add <activity> to the end of this log, for the actor in
+        <category> identified by activity.id.
+
+        """
+        position = len(self._times)
+        self._times.append(activity.time)
+        self._descriptions.append(DESCRIPTIONS.index(activity.description))
+        self._rows.append(activity.location.row)
+        self._cols.append(activity.location.col)
+        self._next.append(-1)
+
+        actors = self._actors[category]
+        actor = actors.get(activity.id)
+        if actor is None:
+            actors[activity.id] = len(self._first)
+            self._first.append(position)
+            self._last.append(position)
+        else:
+            self._next[self._last[actor]] = position
+            self._last[actor] = position
+
+    def activities(self, category: str, identifier: str) -> List[Activity]:
+        """Return the activities of the actor with <identifier> in
+        <category>, oldest first.
+
+        >>> log = ActivityLog()
+        >>> log.add(DRIVER, Activity(1, REQUEST, 'Ann', Location(1, 2)))
+        >>> log.add(PASSENGER, Activity(2, REQUEST, 'Bo', Location(3, 4)))
+        >>> log.add(DRIVER, Activity(5, PICKUP, 'Ann', Location(3, 4)))
+        >>> [(a.time, a.description, str(a.location))
+        ...  for a in log.activities(DRIVER, 'Ann')]
+        [(1, 'request', '(1,2)'), (5, 'pickup', '(3,4)')]
+        """
+        actor = self._actors[category].get(identifier)
+        if actor is None:
+            return []
+        activities = []
+        position = self._first[actor]
+        while position != -1:
+            activities.append(Activity(
+                self._times[position],
+                DESCRIPTIONS[self._descriptions[position]], identifier,
+                make_location(self._rows[position], self._cols[position])))
+            position = self._next[position]
+        return activities
+
+    def report(self, distance_model: Optional[DistanceModel] = None,
+               percentiles: Sequence[float] = ()) -> Dict[str, float]:
+        """Return the report a Monitor would give for the activities in this
+        log, including <percentiles>, read straight from its columns.
+
+        distance_model: The model of the distances driven, or None for
+            Manhattan distances.
+
+        >>> start, end = Location(0, 0), Location(3, 4)
+        >>> log = ActivityLog()
+        >>> log.add(DRIVER, Activity(0, REQUEST, 'Ann', end))
+        >>> log.add(PASSENGER, Activity(1, REQUEST, 'Bo', start))
+        >>> log.add(DRIVER, Activity(5, PICKUP, 'Ann', start))
+        >>> log.add(PASSENGER, Activity(5, PICKUP, 'Bo', start))
+        >>> log.add(DRIVER, Activity(12, DROPOFF, 'Ann', end))
+        >>> log.report() == report_activities(log.grouped())
+        True
+        """
+        times, codes, rows, cols = self._times, self._descriptions, \
+            self._rows, self._cols
+        following, first = self._next, self._first
+
+        waits = Histogram()
+        wait_time = 0
+        wait_count = 0
+        for actor in self._actors[PASSENGER].values():
+            # The first activity is REQUEST, and the second, if there is
+            # one, is PICKUP or CANCEL. The wait time is the difference.
+            request = first[actor]
+            end = following[request]
+            if end != -1:
+                wait = times[end] - times[request]
+                wait_time += wait
+                wait_count += 1
+                waits.add(wait)
+
+        pickup = DESCRIPTIONS.index(PICKUP)
+        dropoff = DESCRIPTIONS.index(DROPOFF)
+        pickup_distances = Histogram()
+        total_distance = 0
+        trip_distance = 0
+        for actor in self._actors[DRIVER].values():
+            start = first[actor]
+            end = following[start]
+            while end != -1:
+                if distance_model is None:
+                    distance = abs(rows[end] - rows[start]) + \
+                        abs(cols[end] - cols[start])
+                else:
+                    distance = distance_model.distance(
+                        make_location(rows[start], cols[start]),
+                        make_location(rows[end], cols[end]))
+                total_distance += distance
+                if codes[start] == pickup and codes[end] == dropoff:
+                    trip_distance += distance
+                elif codes[end] == pickup:
+                    pickup_distances.add(distance)
+                start, end = end, following[end]
+
+        report = _report(wait_time, wait_count, total_distance,
+                         trip_distance, len(self._actors[DRIVER]))
+        if percentiles:
+            report.update(_percentile_report(percentiles, waits,
+                                             pickup_distances))
+        return report
+
+    def grouped(self) -> Dict[str, Dict[str, List[Activity]]]:
+        """Return every activity in this log, as a dictionary whose key is a
+        category, and value is another dictionary. The key of the second
+        dictionary is an identifier and its value is a list of Activities,
+        oldest first.
+
+        """
+        return {category: {identifier: self.activities(category, identifier)
+                           for identifier in self._actors[category]}
+                for category in CATEGORIES}
+
+
 class Monitor:
     """A monitor keeps a record of activities that it is notified about.
     When required, it generates a report of the activities it has recorded.
-    """
 
-    # === Private Attributes ===
-    _activities: Dict[str, Dict[str, List[Activity]]]
+    The report is kept up to date as each activity is notified, so only the
+    latest state of each driver and passenger is stored. The full log of
+    activities is only kept if the monitor is asked to record it. A monitor
+    may also count activities over time, in a TimeSeries.
 
-    #       A dictionary whose key is a category, and value is another
-    #       dictionary. The key of the second dictionary is an identifier
-    #       and its value is a list of Activities.
+    A monitor may also report percentiles of passenger wait times and of
+    the distances drivers drive to pick passengers up, which are kept in
+    Histograms, so they take little memory and can be merged.
+    """
 
-    def __init__(self) -> None:
+    # === Private Attributes ===
+    _activities: Optional[ActivityLog]
+    #       The log of every activity, or None if activities are not being
+    #       recorded.
+    _drivers: Dict[str, Optional[Tuple[Location, str]]]
+    #       A dictionary whose key is a driver identifier, and value is the
+    #       location and description of that driver's latest activity, or
+    #       None if the driver has been handed off.
+    _passengers: Dict[str, Optional[int]]
+    #       A dictionary whose key is a passenger identifier, and value is
+    #       the time of that passenger's request, or None once the passenger
+    #       has been picked up or has cancelled.
+    _wait_time: int
+    #       The total wait time of passengers that have been picked up or
+    #       have cancelled.
+    _wait_count: int
+    #       The number of passengers that have been picked up or have
+    #       cancelled.
+    _total_distance: int
+    #       The total distance driven by all drivers.
+    _trip_distance: int
+    #       The total distance driven by all drivers between a pickup and the
+    #       dropoff that follows it.
+    _distance_model: Optional[DistanceModel]
+    #       The model of the distances driven, or None for Manhattan
+    #       distances.
+    _distance: Callable[[Location, Location], int]
+    #       Return the distance driven between two locations.
+    _series: Optional[TimeSeries]
+    #       The time series activities are counted in, or None if they are
+    #       not.
+    _percentiles: Tuple[float, ...]
+    #       The percentiles reported.
+    _waits: Optional[Histogram]
+    #       The wait times of passengers that have been picked up or have
+    #       cancelled, or None if no percentiles are reported.
+    _pickup_distances: Optional[Histogram]
+    #       The distance driven by a driver to each pickup, from their
+    #       previous activity, or None if no percentiles are reported.
+
+    def __init__(self, record_activities: bool = False,
+                 distance_model: Optional[DistanceModel] = None,
+                 series: Optional[TimeSeries] = None,
+                 percentiles: Sequence[float] = ()) -> None:
         """Initialize a Monitor.
 
+        record_activities: If True, keep every Activity the monitor is
+            notified about, so they can be looked up with activities().
+        distance_model: The model of the distances driven, or None for
+            Manhattan distances.
+        series: If given, count every activity, and the wait time of every
+            passenger, in this time series, which must be notified in
+            timestamp order.
+        percentiles: The percentiles of passenger wait times and of pickup
+            distances that report() adds to the report. See the histogram
+            module for their precision.
+
+        >>> series = TimeSeries(window=10)
+        >>> monitor = Monitor(series=series)
+        >>> monitor.notify(2, PASSENGER, REQUEST, 'Bo', Location(1, 1))
+        >>> monitor.notify(6, PASSENGER, PICKUP, 'Bo', Location(1, 1))
+        >>> series.close()
+        >>> series.rows()[0]['pickups'], series.rows()[0]['wait_time']
+        (1, 4)
         """
-        self._activities = {
-            PASSENGER: {},
-            DRIVER: {}
-        }
-        """@type _activities: dict[str, dict[str, list[Activity]]]"""
+        self._distance_model = distance_model
+        self._distance = _distance_function(distance_model)
+        self._activities = None
+        if record_activities:
+            self._activities = ActivityLog()
+        self._drivers = {}
+        self._passengers = {}
+        self._wait_time = 0
+        self._wait_count = 0
+        self._total_distance = 0
+        self._trip_distance = 0
+        self._series = series
+        self._percentiles = tuple(percentiles)
+        self._waits = None
+        self._pickup_distances = None
+        if percentiles:
+            self._waits = Histogram()
+            self._pickup_distances = Histogram()
 
     def __str__(self) -> str:
         """Return a string representation.
 
         """
-        return f"Monitor ({len(self._activities[DRIVER])} drivers, " \
-               f"{len(self._activities[PASSENGER])} passengers)"
+        return f"Monitor ({len(self._drivers)} drivers, " \
+               f"{len(self._passengers)} passengers)"
 
     def notify(self, timestamp: int, category: str, description: str,
                identifier: str, location: Location) -> None:
@@ -95,66 +365,264 @@ class Monitor:
         identifier: The identifier for the actor.
         location: The location of the activity.
         """
-        if identifier not in self._activities[category]:
-            self._activities[category][identifier] = []
-
-        activity = Activity(timestamp, description, identifier, location)
-        self._activities[category][identifier].append(activity)
+        if self._activities is not None:
+            self._activities.add(category, Activity(timestamp, description,
+                                                    identifier, location))
+        if self._series is not None:
+            self._series.count(timestamp,
+                               _SERIES_COLUMNS.get((category, description)))
+
+        if category == DRIVER:
+            latest = self._drivers.get(identifier)
+            if latest is not None:
+                distance = self._distance(latest[0], location)
+                self._total_distance += distance
+                if latest[1] == PICKUP and description == DROPOFF:
+                    self._trip_distance += distance
+                elif description == PICKUP and \
+                        self._pickup_distances is not None:
+                    self._pickup_distances.add(distance)
+            self._drivers[identifier] = (location, description)
+        elif identifier not in self._passengers:
+            # The first activity is REQUEST.
+            self._passengers[identifier] = timestamp
+        else:
+            # The second activity is PICKUP or CANCEL. The wait time is the
+            # difference between the two.
+            request_time = self._passengers[identifier]
+            if request_time is not None:
+                self._wait_time += timestamp - request_time
+                self._wait_count += 1
+                self._passengers[identifier] = None
+                if self._series is not None:
+                    self._series.wait(timestamp - request_time)
+                if self._waits is not None:
+                    self._waits.add(timestamp - request_time)
+
+    def activities(self, category: str, identifier: str) -> List[Activity]:
+        """Return the recorded activities of the actor with <identifier> in
+        <category>, oldest first.
+
+        Raise a ValueError if this monitor was not created with
+        record_activities=True.
+
+        >>> monitor = Monitor(record_activities=True)
+        >>> monitor.notify(3, DRIVER, REQUEST, 'Ann', Location(1, 2))
+        >>> [activity.time for activity in monitor.activities(DRIVER, 'Ann')]
+        [3]
+        >>> Monitor().activities(DRIVER, 'Ann')
+        Traceback (most recent call last):
+        ...
+        ValueError: This monitor does not record activities
+        """
+        if self._activities is None:
+            raise ValueError("This monitor does not record activities")
+        return self._activities.activities(category, identifier)
+
+    def merge(self, other: Monitor) -> None:
+        """Add the activities <other> was notified about to this monitor's
+        report.
+
+        This is exact when the two monitors saw different activities, and
+        any driver notified to both was handed off, using hand_off, whenever
+        it moved from one to the other, as when a simulation is split into
+        regions. The percentiles are merged exactly, if both monitors report
+        them. Recorded activities and time series are not merged.
+
+        >>> first, second = Monitor(), Monitor()
+        >>> first.notify(0, DRIVER, REQUEST, 'Ann', Location(0, 0))
+        >>> first.notify(5, DRIVER, PICKUP, 'Ann', Location(0, 4))
+        >>> second.notify(9, DRIVER, REQUEST, 'Bo', Location(1, 1))
+        >>> first.merge(second)
+        >>> first.report()["average_driver_total_distance"]
+        2.0
+        """
+        self._wait_time += other._wait_time
+        self._wait_count += other._wait_count
+        self._total_distance += other._total_distance
+        self._trip_distance += other._trip_distance
+        self._drivers.update(other._drivers)
+        self._passengers.update(other._passengers)
+        for mine, theirs in ((self._waits, other._waits),
+                             (self._pickup_distances,
+                              other._pickup_distances)):
+            if mine is not None and theirs is not None:
+                mine.merge(theirs)
+
+    def hand_off(self, identifier: str) -> None:
+        """Forget where the driver with <identifier> is, as it is handed to
+        another monitor. The driver still counts toward this monitor's report,
+        but if it is handed back later, the distance it drove in between is
+        left to the other monitor.
+
+        Precondition: this monitor has been notified about the driver.
+
+        >>> monitor = Monitor()
+        >>> monitor.notify(0, DRIVER, REQUEST, 'Ann', Location(0, 0))
+        >>> monitor.hand_off('Ann')
+        >>> monitor.notify(5, DRIVER, REQUEST, 'Ann', Location(0, 4))
+        >>> monitor.report()["average_driver_total_distance"]
+        0.0
+        """
+        self._drivers[identifier] = None
 
     def report(self) -> Dict[str, float]:
         """Return a report of the activities that have occurred.
 
+        An average over no drivers or no passengers is reported as 0.0, and
+        so is a percentile of no wait times or pickup distances.
+
+        >>> Monitor().report()["average_passenger_wait_time"]
+        0.0
+        >>> monitor = Monitor(percentiles=[50, 99])
+        >>> origin = Location(0, 0)
+        >>> for wait in range(1, 101):
+        ...     monitor.notify(0, PASSENGER, REQUEST, str(wait), origin)
+        ...     monitor.notify(wait, PASSENGER, PICKUP, str(wait), origin)
+        >>> report = monitor.report()
+        >>> [report[f"p{p}_passenger_wait_time"] for p in (50, 99)]
+        [50.0, 99.0]
+        >>> report["p99_driver_pickup_distance"]
+        0.0
+        """
+        report = _report(self._wait_time, self._wait_count,
+                         self._total_distance, self._trip_distance,
+                         len(self._drivers))
+        if self._percentiles:
+            report.update(_percentile_report(self._percentiles, self._waits,
+                                             self._pickup_distances))
+        return report
+
+    def recorded_report(self) -> Dict[str, float]:
+        """Return a report recomputed from the recorded activities. It is
+        always equal to report().
+
+        Raise a ValueError if this monitor was not created with
+        record_activities=True.
+
+        >>> Monitor().recorded_report()
+        Traceback (most recent call last):
+        ...
+        ValueError: This monitor does not record activities
         """
-        return {"average_passenger_wait_time": self._average_wait_time(),
-                "average_driver_total_distance": self._average_total_distance(),
-                "average_driver_trip_distance": self._average_trip_distance()}
+        if self._activities is None:
+            raise ValueError("This monitor does not record activities")
+        return self._activities.report(self._distance_model,
+                                       self._percentiles)
+
+
+def report_activities(
+        activities: Dict[str, Dict[str, List[Activity]]],
+        distance_model: Optional[DistanceModel] = None,
+        percentiles: Sequence[float] = ()) -> Dict[str, float]:
+    """Return the report a Monitor would give for <activities>, in a single
+    pass over them, including <percentiles>.
+
+    activities: A dictionary whose key is a category, and value is another
+        dictionary. The key of the second dictionary is an identifier and its
+        value is the list of that actor's Activities, oldest first.
+    distance_model: The model of the distances driven, or None for Manhattan
+        distances.
+
+    >>> start, end = Location(0, 0), Location(3, 4)
+    >>> report_activities({
+    ...     PASSENGER: {'Bo': [Activity(1, REQUEST, 'Bo', start),
+    ...                        Activity(5, PICKUP, 'Bo', start)]},
+    ...     DRIVER: {'Ann': [Activity(0, REQUEST, 'Ann', end),
+    ...                      Activity(5, PICKUP, 'Ann', start),
+    ...                      Activity(12, DROPOFF, 'Ann', end)]}})
+    ... # doctest: +NORMALIZE_WHITESPACE
+    {'average_passenger_wait_time': 4.0,
+     'average_driver_total_distance': 14.0,
+     'average_driver_trip_distance': 7.0}
+    """
+    waits = Histogram()
+    pickup_distances = Histogram()
+    wait_time = 0
+    wait_count = 0
+    distance_between = _distance_function(distance_model)
+    total_distance = 0
+    trip_distance = 0
+    for category, actors in activities.items():
+        for actor_activities in actors.values():
+            if category == PASSENGER:
+                # A passenger that has less than two activities hasn't
+                # finished waiting (they haven't cancelled or been picked
+                # up). Otherwise the first activity is REQUEST, and the
+                # second is PICKUP or CANCEL. The wait time is the
+                # difference between the two.
+                if len(actor_activities) >= 2:
+                    wait = actor_activities[1].time - actor_activities[0].time
+                    wait_time += wait
+                    wait_count += 1
+                    waits.add(wait)
+                continue
+            for start, end in zip(actor_activities, actor_activities[1:]):
+                distance = distance_between(start.location, end.location)
+                total_distance += distance
+                if start.description == PICKUP and end.description == DROPOFF:
+                    trip_distance += distance
+                elif end.description == PICKUP:
+                    pickup_distances.add(distance)
+
+    report = _report(wait_time, wait_count, total_distance, trip_distance,
+                     len(activities[DRIVER]))
+    if percentiles:
+        report.update(_percentile_report(percentiles, waits,
+                                         pickup_distances))
+    return report
+
+
+def _distance_function(distance_model: Optional[DistanceModel]) \
+        -> Callable[[Location, Location], int]:
+    """Return the function giving distances under <distance_model>, which is
+    manhattan_distance if <distance_model> is None.
 
-    def _average_wait_time(self) -> float:
-        """Return the average wait time of passengers that have either been
-         picked up or have cancelled their trip.
+    """
+    if distance_model is None:
+        return manhattan_distance
+    return distance_model.distance
 
-        """
-        wait_time = 0
-        count = 0
-        for activities in self._activities[PASSENGER].values():
-            # A passenger that has less than two activities hasn't finished
-            # waiting (they haven't cancelled or been picked up).
-            if len(activities) >= 2:
-                # The first activity is REQUEST, and the second is PICKUP
-                # or CANCEL. The wait time is the difference between the two.
-                wait_time += activities[1].time - activities[0].time
-                count += 1
-        return wait_time / count
-
-    def _average_total_distance(self) -> float:
-        """Return the average distance drivers have driven.
 
-        """
-        total_distance = 0
-        driver_activity = self._activities[DRIVER]
-        for driver_id in driver_activity:
-            for index in range(len(driver_activity[driver_id]) - 1):
-                start_location = driver_activity[driver_id][index].location
-                end_location = driver_activity[driver_id][index + 1].location
-                total_distance += manhattan_distance(start_location,
-                                                     end_location)
-        return total_distance / len(driver_activity)
-
-    def _average_trip_distance(self) -> float:
-        """Return the average distance drivers have driven on trips.
+def _report(wait_time: int, wait_count: int, total_distance: int,
+            trip_distance: int, driver_count: int) -> Dict[str, float]:
+    """Return a report from the totals of a simulation's activities.
 
-        """
-        total_distance = 0
-        driver_activity = self._activities[DRIVER]
-        for driver_id in driver_activity:
-            for index in range(len(driver_activity[driver_id]) - 1):
-                start_activity = driver_activity[driver_id][index]
-                end_activity = driver_activity[driver_id][index + 1]
-                if start_activity.description == PICKUP and \
-                        end_activity.description == DROPOFF:
-                    total_distance += manhattan_distance(
-                        start_activity.location, end_activity.location)
-        return total_distance / len(driver_activity)
+    """
+    return {"average_passenger_wait_time": _average(wait_time, wait_count),
+            "average_driver_total_distance": _average(total_distance,
+                                                      driver_count),
+            "average_driver_trip_distance": _average(trip_distance,
+                                                     driver_count)}
+
+
+def _percentile_report(percentiles: Sequence[float], waits: Histogram,
+                       pickup_distances: Histogram) -> Dict[str, float]:
+    """Return the report of <percentiles> of the passenger wait times in
+    <waits> and of the distances in <pickup_distances>.
+
+    >>> waits, pickup_distances = Histogram(), Histogram()
+    >>> waits.add(7)
+    >>> _percentile_report([95], waits, pickup_distances)
+    {'p95_passenger_wait_time': 7.0, 'p95_driver_pickup_distance': 0.0}
+    """
+    report = {}
+    for percentile in percentiles:
+        name = f"p{percentile:g}"
+        report[f"{name}_passenger_wait_time"] = \
+            float(waits.percentile(percentile))
+        report[f"{name}_driver_pickup_distance"] = \
+            float(pickup_distances.percentile(percentile))
+    return report
+
+
+def _average(total: int, count: int) -> float:
+    """Return <total> / <count>, or 0.0 if <count> is 0.
+
+    """
+    if count == 0:
+        return 0.0
+    return total / count
 
 
 if __name__ == "__main__":
@@ -163,4 +631,5 @@ if __name__ == "__main__":
     python_ta.check_all(
         config={
             'max-args': 6,
-            'extra-imports': ['typing', 'location']})
+            'extra-imports': ['array', 'typing', 'distance', 'histogram',
+                              'location', 'timeseries']})
@@ -34,6 +34,7 @@ class Passenger:
     === Representation Invariants ===
     -  status: "waited" | "cancelled" | "satisfied"
     """
+    __slots__ = ('id', 'patience', 'origin', 'destination', 'status')
     id: str
     patience: int
     origin: Location
@@ -0,0 +1,313 @@
+"""Profiling the event loop of a simulation
+
+A Profiler given to a Simulation records, while the simulation runs:
+    - the number of events of each kind done, and how long each one took,
+      including the events it scheduled,
+    - how long adding events to, and removing them from, the event queue took,
+    - the number of pending events, over simulated time,
+    - the number of drivers or passengers the dispatcher examined in each
+      event that searched for one.
+Profiling is off unless a Profiler is given, and then costs nothing.
+
+With <sample_every> set to N, only every Nth event is timed, along with
+the queue operations and search it does, while every event is still
+counted. The profiled/N benchmarks in benchmark.py measure the overhead
+against the same simulation without a profiler.
+
+The results are summarized as a dictionary by summary(), and can be written
+as JSON, or as a Chrome trace file of the timed events and the queue depth,
+which chrome://tracing and Perfetto display on a timeline.
+
+Usage:
+    python tools.py profiler events.txt profile.json [--sample-every N]
+        [--chrome-trace FILE] [--scheduler heap|calendar]
+
+=== Constants ===
+PERCENTILES: The percentiles of every timing and search size that are
+    summarized.
+MAX_SPANS: The largest number of timed events kept for a Chrome trace.
+"""
+
+import argparse
+import json
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+PERCENTILES = [50, 90, 99]
+MAX_SPANS = 100000
+
+_Span = Tuple[str, int, int, int]
+#     A timed event: its kind, when it started and how long it took, in
+#     nanoseconds on the profiler's clock, and its timestamp.
+
+
+class Profiler:
+    """The measurements of a simulation's event loop.
+
+    Durations are kept in nanoseconds.
+
+    === Attributes ===
+    sample_every: Every how many events one is timed.
+    depth_interval: The least simulated time between two recorded queue
+        depths.
+    seconds: The wall time spent in the event loop.
+    counts: A dictionary whose key is the name of an event class, and value
+        is the number of events of that class done.
+    durations: A dictionary whose key is the name of an event class, and
+        value is the duration of each timed event of that class.
+    added: The number of events added to the event queue by events done.
+    adds: The duration of each timed addition to the event queue.
+    removes: The duration of each timed removal from the event queue.
+    depths: The (timestamp, number of pending events) after timed events,
+        at most one every depth_interval of simulated time.
+    search_sizes: The number of drivers or passengers examined by each timed
+        event that searched for any.
+    """
+    sample_every: int
+    depth_interval: int
+    seconds: float
+    counts: Dict[str, int]
+    durations: Dict[str, array]
+    added: int
+    adds: array
+    removes: array
+    depths: List[Tuple[int, int]]
+    search_sizes: array
+
+    # === Private Attributes ===
+    _spans: List[_Span]
+    #     The first MAX_SPANS timed events.
+    _depth_clock: array
+    #     When each depth in depths was recorded, on the profiler's clock.
+    _next_depth: Optional[int]
+    #     The earliest timestamp at which the next depth is recorded.
+    _origin: Optional[int]
+    #     The time the profiler's clock starts from, or None if nothing has
+    #     been recorded yet.
+
+    def __init__(self, sample_every: int = 1,
+                 depth_interval: int = 1) -> None:
+        """Initialize an empty Profiler.
+
+        Precondition: sample_every >= 1 and depth_interval >= 1
+        """
+        self.sample_every = sample_every
+        self.depth_interval = depth_interval
+        self.seconds = 0.0
+        self.counts = {}
+        self.durations = {}
+        self.added = 0
+        self.adds = array('q')
+        self.removes = array('q')
+        self.depths = []
+        self.search_sizes = array('q')
+        self._spans = []
+        self._depth_clock = array('q')
+        self._next_depth = None
+        self._origin = None
+
+    def clock(self) -> int:
+        """Return the time now, in nanoseconds on the profiler's clock.
+
+        """
+        now = time.perf_counter_ns()
+        if self._origin is None:
+            self._origin = now
+        return now - self._origin
+
+    def count(self, names: Sequence[str], counts: Sequence[int],
+              seconds: float) -> None:
+        """Add <counts> events of the classes named in <names>, done in
+        <seconds> of wall time.
+
+        """
+        for name, count in zip(names, counts):
+            if count:
+                self.counts[name] = self.counts.get(name, 0) + count
+        self.seconds += seconds
+
+    def record(self, name: str, timestamp: int, start: int, duration: int,
+               removal: int, examined: int, depth: int) -> None:
+        """Record a timed event of the class named <name>, at <timestamp>.
+
+        start, duration: When the event started, on the profiler's clock,
+            and how long it took.
+        removal: How long removing it from the event queue took.
+        examined: The number of drivers and passengers it examined.
+        depth: The number of events pending after it.
+        """
+        durations = self.durations.get(name)
+        if durations is None:
+            durations = self.durations[name] = array('q')
+        durations.append(duration)
+        self.removes.append(removal)
+        if examined:
+            self.search_sizes.append(examined)
+        if self._next_depth is None or timestamp >= self._next_depth:
+            self.depths.append((timestamp, depth))
+            self._depth_clock.append(start + duration)
+            self._next_depth = timestamp + self.depth_interval
+        if len(self._spans) < MAX_SPANS:
+            self._spans.append((name, start, duration, timestamp))
+
+    def counted(self, schedule: Callable[[int, int, object], None]) \
+            -> Callable[[int, int, object], None]:
+        """Return <schedule>, which adds an event to the event queue,
+        counting each call in added.
+
+        """
+        def counted_schedule(timestamp: int, kind: int,
+                             actor: object) -> None:
+            """Add the event, and count it.
+
+            """
+            schedule(timestamp, kind, actor)
+            self.added += 1
+        return counted_schedule
+
+    def timed(self, schedule: Callable[[int, int, object], None]) \
+            -> Callable[[int, int, object], None]:
+        """Return <schedule>, which adds an event to the event queue,
+        counting each call in added and timing it in adds.
+
+        """
+        adds = self.adds
+        clock = time.perf_counter_ns
+
+        def timed_schedule(timestamp: int, kind: int, actor: object) -> None:
+            """Add the event, and time it.
+
+            """
+            start = clock()
+            schedule(timestamp, kind, actor)
+            adds.append(clock() - start)
+            self.added += 1
+        return timed_schedule
+
+    def summary(self) -> Dict[str, object]:
+        """Return the measurements as a dictionary of plain values, with
+        durations in microseconds.
+
+        The total time of each kind of event, and of the queue operations,
+        is estimated from the timed ones.
+
+        >>> profiler = Profiler(sample_every=2)
+        >>> profiler.count(['Pickup', 'Dropoff'], [4, 0], 0.5)
+        >>> profiler.record('Pickup', 3, 0, 2000, 100, 0, 7)
+        >>> profiler.record('Pickup', 5, 3000, 4000, 300, 12, 6)
+        >>> summary = profiler.summary()
+        >>> summary['events']['Pickup']['count']
+        4
+        >>> summary['events']['Pickup']['total_us']
+        12.0
+        >>> summary['events']['Pickup']['p50_us']
+        2.0
+        >>> summary['search_sizes']['max']
+        12
+        >>> summary['queue_depth']
+        [[3, 7], [5, 6]]
+        """
+        events = {}
+        for name, count in sorted(self.counts.items()):
+            events[name] = _summarize(self.durations.get(name, []), count,
+                                      1000, '_us')
+        return {
+            'sample_every': self.sample_every,
+            'seconds': self.seconds,
+            'events': events,
+            'queue_add': _summarize(self.adds, self.added, 1000, '_us'),
+            'queue_remove': _summarize(self.removes,
+                                       sum(self.counts.values()), 1000,
+                                       '_us'),
+            'search_sizes': _summarize(self.search_sizes,
+                                       len(self.search_sizes), 1, ''),
+            'queue_depth': [list(depth) for depth in self.depths]}
+
+    def write_json(self, filename: str) -> None:
+        """Write summary() to the file named <filename>, as JSON.
+
+        """
+        with open(filename, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def write_chrome_trace(self, filename: str) -> None:
+        """Write the timed events and the queue depths to the file named
+        <filename>, in the Chrome trace event format.
+
+        """
+        trace = [{'name': name, 'cat': 'event', 'ph': 'X',
+                  'ts': start / 1000, 'dur': duration / 1000,
+                  'pid': 0, 'tid': 0, 'args': {'timestamp': timestamp}}
+                 for name, start, duration, timestamp in self._spans]
+        trace.extend({'name': 'queue depth', 'ph': 'C', 'ts': clock / 1000,
+                      'pid': 0, 'args': {'depth': depth}}
+                     for (_, depth), clock
+                     in zip(self.depths, self._depth_clock))
+        with open(filename, "w") as file:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ns'}, file)
+
+
+def _summarize(values: Sequence[int], count: int, scale: int,
+               unit: str) -> Dict[str, float]:
+    """Return the number of operations <count>, and the mean, percentiles
+    and maximum of the sampled <values> divided by <scale>, with their names
+    ending in <unit>. The total is estimated as <count> times the mean.
+
+    >>> _summarize([4, 1, 3, 2], 8, 1, '')['p90']
+    4
+    >>> _summarize([], 8, 1, '')
+    {'count': 8, 'sampled': 0}
+    """
+    summary = {'count': count, 'sampled': len(values)}
+    if not values:
+        return summary
+    ordered = sorted(values)
+    if scale != 1:
+        ordered = [value / scale for value in ordered]
+    mean = sum(ordered) / len(ordered)
+    summary['total' + unit] = mean * count
+    summary['mean' + unit] = mean
+    for percentile in PERCENTILES:
+        # The nearest-rank percentile.
+        rank = max(-(-percentile * len(ordered) // 100), 1)
+        summary[f'p{percentile}{unit}'] = ordered[rank - 1]
+    summary['max' + unit] = ordered[-1]
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Profile a simulation of an event file from the command line.
+
+    """
+    # Imported here, as the simulation imports this module.
+    from event import create_event_list
+    from simulation import Simulation
+
+    parser = argparse.ArgumentParser(
+        description="Profile a simulation of an event file.")
+    parser.add_argument("events")
+    parser.add_argument("output")
+    parser.add_argument("--sample-every", type=int, default=1)
+    parser.add_argument("--chrome-trace", default=None)
+    parser.add_argument("--scheduler", default="heap")
+    args = parser.parse_args(argv)
+
+    profiler = Profiler(sample_every=args.sample_every)
+    Simulation(scheduler=args.scheduler, profiler=profiler).run(
+        create_event_list(args.events))
+    profiler.write_json(args.output)
+    if args.chrome_trace is not None:
+        profiler.write_chrome_trace(args.chrome_trace)
+    for name, events in profiler.summary()['events'].items():
+        print(f"{name}: {events['count']} events, "
+              f"{events.get('mean_us', 0.0):.1f} us each")
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(
+        config={'allowed-io': ['write_json', 'write_chrome_trace', 'main'],
+                'extra-imports': ['argparse', 'array', 'json', 'time',
+                                  'typing', 'event', 'simulation']})
@@ -0,0 +1,386 @@
+"""Spatially sharded simulations
+
+A sharded simulation splits the grid into vertical bands of columns, and
+simulates each band, or shard, with its own dispatcher, monitor and event
+queue, optionally in a process of its own. Each passenger is simulated by the
+shard containing their origin, and each driver by the shard containing their
+location when they request a passenger.
+
+The shards advance in lock-step: in each step, every shard does its events
+with timestamps less than the end of the step, which is <step> past the
+earliest remaining event. A driver who drops a passenger off in another shard
+is handed off to that shard at the end of the step, and requests a passenger
+there at that time.
+
+With more than one shard, the report is an approximation: passengers are only
+matched with drivers in their own shard, and a handoff delays the driver's
+request by less than <step>. With a single shard, the report is exact.
+
+The per-shard monitors are merged at the end, using Monitor.merge, which
+merges the percentiles of wait times and pickup distances exactly.
+
+=== Constants ===
+DEFAULT_STEP: The default length of a step.
+"""
+
+from bisect import bisect_right
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from distance import DistanceModel
+from driver import Driver
+from event import Event, DriverRequest, create_event_list
+from location import Location
+from monitor import Monitor
+from simulation import Simulation
+
+DEFAULT_STEP = 10
+
+_Handoff = Tuple[int, Driver]
+#     A driver handed to the shard with the given index.
+
+
+class Shard(Simulation):
+    """The simulation of one band of columns in a sharded simulation.
+
+    === Attributes ===
+    index: The index of this shard's band.
+    """
+    index: int
+
+    # === Private Attributes ===
+    _boundaries: List[int]
+    #     The first column of every band after the first, in increasing order.
+    _handoffs: List[_Handoff]
+    #     The drivers handed to other shards since the last step.
+    _clock: int
+    #     The end of the last step.
+
+    def __init__(self, index: int, boundaries: List[int],
+                 distance_model: Optional[DistanceModel] = None,
+                 batch_window: Optional[int] = None,
+                 percentiles: Sequence[float] = ()) -> None:
+        """Initialize the shard of the band at <index>, with bands starting
+        at <boundaries>.
+
+        """
+        super().__init__(distance_model, batch_window,
+                         percentiles=percentiles)
+        self.index = index
+        self._boundaries = boundaries
+        self._handoffs = []
+        self._clock = 0
+
+    def load(self, initial_events: List[Event]) -> None:
+        """Add the <initial_events> of this shard to its event queue.
+
+        """
+        self._load(initial_events)
+
+    def advance(self, until: int, arrivals: List[Driver]) \
+            -> Tuple[List[_Handoff], Optional[int]]:
+        """Do every event before <until>, after the drivers in <arrivals>,
+        handed off from other shards in the last step, request passengers at
+        the end of that step.
+
+        Return the drivers handed to other shards, and the timestamp of the
+        next event of this shard, or None if there is none.
+        """
+        for driver in arrivals:
+            self._schedule(self._clock, DriverRequest.KIND, driver)
+        self._clock = until
+        self._do_events(until)
+        handoffs, self._handoffs = self._handoffs, []
+        if not self._events:
+            return handoffs, None
+        return handoffs, self._peek()[0]
+
+    def monitor(self) -> Monitor:
+        """Return the monitor of this shard.
+
+        """
+        return self._monitor
+
+    def _schedule(self, timestamp: int, kind: int, actor: object) -> None:
+        """Add the event with <timestamp>, <kind> and <actor> to the event
+        queue, unless it is the request of a driver outside this shard's
+        band, who is handed off instead.
+
+        """
+        if kind == DriverRequest.KIND:
+            owner = band(actor.location, self._boundaries)
+            if owner != self.index:
+                self._dispatcher.remove_driver(actor)
+                self._monitor.hand_off(actor.id)
+                self._handoffs.append((owner, actor))
+                return
+        super()._schedule(timestamp, kind, actor)
+
+
+class ShardedSimulation:
+    """A simulation split into bands of columns.
+
+    === Attributes ===
+    shards: The number of shards.
+    step: The length of each step.
+    processes: Whether each shard runs in a process of its own.
+    """
+    shards: int
+    step: int
+    processes: bool
+
+    # === Private Attributes ===
+    _distance_model: Optional[DistanceModel]
+    #     The distance model of every shard.
+    _batch_window: Optional[int]
+    #     The batch window of every shard.
+    _percentiles: Sequence[float]
+    #     The percentiles reported by every shard.
+
+    def __init__(self, shards: int = 2, step: int = DEFAULT_STEP,
+                 processes: bool = True,
+                 distance_model: Optional[DistanceModel] = None,
+                 batch_window: Optional[int] = None,
+                 percentiles: Sequence[float] = ()) -> None:
+        """Initialize a sharded simulation.
+
+        percentiles: The percentiles of passenger wait times and pickup
+            distances added to the report, as by Monitor.
+
+        Precondition: shards >= 1 and step >= 1.
+        """
+        self.shards = shards
+        self.step = step
+        self.processes = processes
+        self._distance_model = distance_model
+        self._batch_window = batch_window
+        self._percentiles = percentiles
+
+    def run(self, initial_events: List[Event]) -> Dict[str, float]:
+        """Run the simulation on <initial_events>, and return the merged
+        report of every shard.
+
+        >>> from event import PassengerRequest
+        >>> from passenger import Passenger
+        >>> def make_events() -> List[Event]:
+        ...     return [DriverRequest(0, Driver('Ann', Location(1, 1), 1)),
+        ...             DriverRequest(0, Driver('Bo', Location(1, 9), 1)),
+        ...             PassengerRequest(2, Passenger('Cy', 5, Location(2, 1),
+        ...                                           Location(1, 8))),
+        ...             PassengerRequest(40, Passenger('Di', 5, Location(3, 9),
+        ...                                            Location(3, 1)))]
+        >>> sharded = ShardedSimulation(shards=2, processes=False,
+        ...                             percentiles=[99])
+        >>> sharded.run(make_events()) == Simulation(
+        ...     percentiles=[99]).run(make_events())
+        True
+        """
+        boundaries = split_columns(initial_events, self.shards)
+        loads = [[] for _ in range(len(boundaries) + 1)]
+        for event in initial_events:
+            loads[band(_origin(event), boundaries)].append(event)
+        if self.processes:
+            runners = [_RemoteShard(partial(self._make, index, boundaries,
+                                            loads[index]))
+                       for index in range(len(loads))]
+        else:
+            runners = [_LocalShard(self._make(index, boundaries, loads[index]))
+                       for index in range(len(loads))]
+
+        arrivals = [[] for _ in runners]
+        upcoming = [min(e.timestamp for e in load) if load else None
+                    for load in loads]
+        try:
+            while any(t is not None for t in upcoming):
+                until = min(t for t in upcoming if t is not None) + self.step
+                for runner, arriving in zip(runners, arrivals):
+                    runner.start(until, arriving)
+                arrivals = [[] for _ in runners]
+                for i, runner in enumerate(runners):
+                    handoffs, upcoming[i] = runner.result()
+                    for owner, driver in handoffs:
+                        arrivals[owner].append(driver)
+                for i, arriving in enumerate(arrivals):
+                    if arriving:
+                        # Handed off drivers request passengers at <until>.
+                        upcoming[i] = until
+            monitors = [finished.finish() for finished in runners]
+        finally:
+            for runner in runners:
+                runner.close()
+        for other in monitors[1:]:
+            monitors[0].merge(other)
+        return monitors[0].report()
+
+    def _make(self, index: int, boundaries: List[int],
+              initial_events: List[Event]) -> Shard:
+        """Return the shard at <index>, loaded with <initial_events>.
+
+        """
+        shard = Shard(index, boundaries, self._distance_model,
+                      self._batch_window, self._percentiles)
+        shard.load(initial_events)
+        return shard
+
+
+class _LocalShard:
+    """A shard run in this process.
+
+    === Private Attributes ===
+    _shard: The shard.
+    _result: The result of the last step.
+    """
+    _shard: Shard
+    _result: Tuple[List[_Handoff], Optional[int]]
+
+    def __init__(self, shard: Shard) -> None:
+        """Initialize a runner for <shard>.
+
+        """
+        self._shard = shard
+        self._result = ([], None)
+
+    def start(self, until: int, arrivals: List[Driver]) -> None:
+        """Advance the shard to <until>, after <arrivals> arrive.
+
+        """
+        self._result = self._shard.advance(until, arrivals)
+
+    def result(self) -> Tuple[List[_Handoff], Optional[int]]:
+        """Return the result of the last step.
+
+        """
+        return self._result
+
+    def finish(self) -> Monitor:
+        """Return the monitor of the shard.
+
+        """
+        return self._shard.monitor()
+
+    def close(self) -> None:
+        """Release the shard.
+
+        """
+
+
+class _RemoteShard:
+    """A shard run in a process of its own.
+
+    === Private Attributes ===
+    _connection: The parent end of a pipe to the process.
+    _process: The process.
+    """
+    _connection: Connection
+    _process: Process
+
+    def __init__(self, make: Callable[[], Shard]) -> None:
+        """Start a process running the shard made by <make>.
+
+        """
+        self._connection, child = Pipe()
+        self._process = Process(target=_serve, args=(child, make),
+                                daemon=True)
+        self._process.start()
+        child.close()
+
+    def start(self, until: int, arrivals: List[Driver]) -> None:
+        """Start advancing the shard to <until>, after <arrivals> arrive.
+
+        """
+        self._connection.send((until, arrivals))
+
+    def result(self) -> Tuple[List[_Handoff], Optional[int]]:
+        """Wait for, and return, the result of the last step.
+
+        """
+        return self._connection.recv()
+
+    def finish(self) -> Monitor:
+        """Stop the process, and return the monitor of the shard.
+
+        """
+        self._connection.send(None)
+        return self._connection.recv()
+
+    def close(self) -> None:
+        """Close the pipe, and wait for the process to exit.
+
+        """
+        self._connection.close()
+        self._process.join()
+
+
+def _serve(connection: Connection, make: Callable[[], Shard]) -> None:
+    """Advance the shard made by <make> as asked over <connection>, until
+    asked to stop.
+
+    """
+    shard = make()
+    with connection:
+        message = connection.recv()
+        while message is not None:
+            connection.send(shard.advance(*message))
+            message = connection.recv()
+        connection.send(shard.monitor())
+
+
+def split_columns(initial_events: Sequence[Event],
+                  shards: int) -> List[int]:
+    """Return the first column of every band after the first, splitting the
+    locations in <initial_events> into at most <shards> bands of about the
+    same size.
+
+    >>> from event import PassengerRequest
+    >>> from passenger import Passenger
+    >>> events = [PassengerRequest(0, Passenger(str(col), 1, Location(0, col),
+    ...                                         Location(0, 0)))
+    ...           for col in [1, 1, 2, 3, 5, 8]]
+    >>> split_columns(events, 3)
+    [2, 5]
+    >>> split_columns(events, 1)
+    []
+    >>> split_columns([], 3)
+    []
+    """
+    columns = sorted(_origin(event).col for event in initial_events)
+    if not columns:
+        return []
+    boundaries = []
+    for i in range(1, shards):
+        column = columns[i * len(columns) // shards]
+        if column > (boundaries[-1] if boundaries else columns[0]):
+            boundaries.append(column)
+    return boundaries
+
+
+def band(location: Location, boundaries: List[int]) -> int:
+    """Return the index of the band containing <location>.
+
+    >>> band(Location(7, 4), [2, 5])
+    1
+    """
+    return bisect_right(boundaries, location.col)
+
+
+def _origin(event: Event) -> Location:
+    """Return where the initial <event> happens.
+
+    """
+    if isinstance(event, DriverRequest):
+        return event.driver.location
+    return event.passenger.origin
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(
+        config={'extra-imports': ['bisect', 'functools', 'multiprocessing',
+                                  'multiprocessing.connection', 'typing',
+                                  'distance', 'driver', 'event', 'location',
+                                  'monitor', 'simulation']})
+
+    events = create_event_list("events.txt")
+    print(ShardedSimulation().run(events))
@@ -1,10 +1,23 @@
 """Starting point for simulation"""
 
-from typing import List, Dict
-from container import PriorityQueue
+import itertools
+import time
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, \
+    Tuple, Union
+from container import CALENDAR, HEAP, CalendarQueue, PriorityQueue
 from dispatcher import Dispatcher
-from event import Event, create_event_list
+from distance import DistanceModel
+from event import Cancellation, Event, EVENT_CLASSES, HANDLERS, Pickup, \
+    create_event_list, reorder_events
 from monitor import Monitor
+from passenger import Passenger
+from profiler import Profiler
+from timeseries import TimeSeries
+from travel_time import DirectTravelTimes
+
+Record = Tuple[int, int, int, object]
+#     A pending event: its timestamp, sequence number, kind and actor.
 
 
 class Simulation:
@@ -26,47 +39,306 @@ class Simulation:
     """
 
     # === Private Attributes ===
-    _events: PriorityQueue
-    #     A sequence of events arranged in priority determined by the event
-    #     sorting order.
+    _events: Union[PriorityQueue, CalendarQueue]
+    #     The pending events, as (timestamp, sequence, kind, actor) records,
+    #     in a PriorityQueue or a CalendarQueue. See
+    #     Event.record for the last three fields. The sequence numbers break
+    #     ties in the order records were added, and initial events have
+    #     negative ones, so that they come before any event spawned during
+    #     the simulation at the same time.
+    _push: Callable[[Record], None]
+    #     Adds a record to _events.
+    _pop: Callable[[], Record]
+    #     Removes and returns the first record in _events.
+    _peek: Callable[[], Record]
+    #     Returns the first record in _events.
+    _initial_sequence: Iterator[int]
+    #     The sequence numbers of initial events.
+    _sequence: Iterator[int]
+    #     The sequence numbers of spawned events.
+    _upcoming: Iterator[Event]
+    #     The initial events not yet added to _events.
+    _pending: Dict[int, Record]
+    #     A dictionary whose key is the id of a passenger, and value is the
+    #     record of that passenger's Cancellation, while it is in _events.
+    _done: int
+    #     The number of events done.
     _dispatcher: Dispatcher
     #     The dispatcher associated with the simulation.
     _monitor: Monitor
-
     #     The monitor associated with the simulation.
+    _profiler: Optional[Profiler]
+    #     The profiler of the event loop, or None if it is not profiled.
+    _series: Optional[TimeSeries]
+    #     The time series the monitor counts activities in, or None.
 
-    def __init__(self) -> None:
+    def __init__(self, distance_model: Optional[DistanceModel] = None,
+                 batch_window: Optional[int] = None,
+                 scheduler: str = HEAP,
+                 profiler: Optional[Profiler] = None,
+                 series: Optional[TimeSeries] = None,
+                 percentiles: Sequence[float] = ()) -> None:
         """Initialize a Simulation.
 
+        distance_model: If given, both dispatching and the report use this
+            model of distances instead of Manhattan distances. Only the
+            drivers of this simulation use it, and Driver.travel_times is
+            left as it is. Drivers with no route to a passenger are not
+            dispatched to them.
+        batch_window: If given, passengers and drivers are matched in batches
+            dispatched this long after the first request of each batch.
+        scheduler: HEAP to keep pending events in a binary heap, or CALENDAR
+            to keep them in a CalendarQueue, which gives the same result.
+        profiler: If given, the event loop records its measurements in this
+            profiler as it runs. See the profiler module.
+        series: If given, the monitor counts activities in this time series,
+            with the number of idle drivers and waiting passengers taken from
+            the dispatcher, and it is closed when the simulation ends. See
+            the timeseries module.
+        percentiles: The percentiles of passenger wait times and pickup
+            distances added to the report, as by Monitor.
         """
-        self._events = PriorityQueue()
-        self._dispatcher = Dispatcher()
-        self._monitor = Monitor()
+        if scheduler == CALENDAR:
+            self._events = CalendarQueue(key=itemgetter(0),
+                                         order=itemgetter(1))
+        else:
+            self._events = PriorityQueue()
+        self._push = self._events.add
+        self._pop = self._events.remove
+        self._peek = self._events.peek
+        self._initial_sequence = itertools.count(-(1 << 62))
+        self._sequence = itertools.count()
+        self._upcoming = iter([])
+        self._pending = {}
+        self._done = 0
+        travel_times = None
+        if distance_model is not None:
+            travel_times = DirectTravelTimes(distance_model)
+        self._dispatcher = Dispatcher(batch_window=batch_window,
+                                      travel_times=travel_times)
+        self._monitor = Monitor(distance_model=distance_model,
+                                series=series, percentiles=percentiles)
+        self._profiler = profiler
+        self._series = series
+        if series is not None:
+            series.watch(self._dispatcher.counts)
 
-    def run(self, initial_events: List[Event]) -> Dict[str, float]:
+    def run(self, initial_events: Iterable[Event],
+            reorder_window: Optional[int] = None) -> Dict[str, float]:
         """Run the simulation on the list of events in <initial_events>.
 
         Return a dictionary containing statistics of the simulation,
         according to the specifications in the assignment handout.
 
         initial_events: An initial list of events.
+        reorder_window: If None, every initial event is loaded into the event
+            queue before the simulation starts. Otherwise <initial_events> is
+            read lazily, one event at a time as simulated time reaches it, and
+            may be out of timestamp order by at most this many events. This
+            gives the same result while keeping only the events within the
+            current horizon in memory.
+
+        Either scheduler gives the same result, even when an initial event
+        read lazily ties with a spawned event:
+
+        >>> from driver import Driver
+        >>> from event import DriverRequest, PassengerRequest
+        >>> from location import Location
+        >>> from passenger import Passenger
+        >>> def make_events() -> Iterator[Event]:
+        ...     yield DriverRequest(1, Driver('Ann', Location(0, 1), 1))
+        ...     yield PassengerRequest(2, Passenger('Bo', 5, Location(0, 1),
+        ...                                         Location(0, 0)))
+        ...     yield DriverRequest(3, Driver('Cy', Location(0, 3), 1))
+        ...     yield PassengerRequest(3, Passenger('Di', 4, Location(0, 1),
+        ...                                         Location(0, 0)))
+        ...     yield PassengerRequest(6, Passenger('Ed', 4, Location(0, 0),
+        ...                                         Location(0, 3)))
+        >>> calendar = Simulation(scheduler=CALENDAR)
+        >>> calendar.run(make_events(), reorder_window=0) == \\
+        ...     Simulation().run(list(make_events()))
+        True
         """
+        if reorder_window is None:
+            # Add all initial events to the event queue.
+            self._load(initial_events)
+        else:
+            self._upcoming = reorder_events(initial_events, reorder_window)
+            self._load_next()
 
-        # Add all initial events to the event queue.
-        for event in initial_events:
-            self._events.add(event)
         # Until there are no more events, remove an event
-        # from the event queue and do it. Add any returned
-        # events to the event queue.
+        # from the event queue and do it, adding any events
+        # it spawns to the event queue.
+        self._do_events()
+        if self._series is not None:
+            self._series.close()
+        return self._monitor.report()
 
-        while not self._events.is_empty():
-            current_event = self._events.remove()
-            new_event = current_event.do(self._dispatcher, self._monitor)
+    def _load(self, events: Iterable[Event]) -> None:
+        """Add the initial <events> to the event queue.
 
-            if not new_event == []:
-                for e in new_event:
-                    self._events.add(e)
-        return self._monitor.report()
+        """
+        self._events.add_many(
+            (timestamp, next(self._initial_sequence), kind, actor)
+            for timestamp, kind, actor in (event.record() for event in events))
+
+    def _load_next(self) -> None:
+        """Add the next initial event not yet read, if there is one, to the
+        event queue.
+
+        The initial events are read in timestamp order, and come before any
+        spawned event at the same time, so only one of them needs to be in
+        the event queue at once.
+        """
+        event = next(self._upcoming, None)
+        if event is not None:
+            timestamp, kind, actor = event.record()
+            self._push((timestamp, next(self._initial_sequence), kind,
+                        actor))
+
+    def _do_events(self, until: Optional[int] = None) -> None:
+        """Do the pending events in order, until there are none left or, if
+        <until> is given, the next one is at <until> or later.
+
+        Each event is done by the handler for its kind, straight from its
+        record. Once a passenger is picked up, their Cancellation can never
+        change anything, so its record is skipped when it comes up.
+
+        >>> from driver import Driver
+        >>> from event import DriverRequest, PassengerRequest
+        >>> from location import Location
+        >>> from passenger import Passenger
+        >>> profiler = Profiler()
+        >>> _ = Simulation(profiler=profiler).run([
+        ...     PassengerRequest(0, Passenger('Bo', 5, Location(1, 2),
+        ...                                   Location(1, 4))),
+        ...     DriverRequest(1, Driver('Ann', Location(1, 1), 1))])
+        >>> sorted(profiler.counts)
+        ['DriverRequest', 'Dropoff', 'PassengerRequest', 'Pickup']
+        """
+        profiler = self._profiler
+        if profiler is not None:
+            self._do_profiled_events(profiler, until)
+            return
+        events, take, settle, peek = \
+            self._events, self._take, self._settle, self._peek
+        handlers, schedule = HANDLERS, self._schedule
+        dispatcher, monitor = self._dispatcher, self._monitor
+        done = 0
+        while events:
+            if until is not None and peek()[0] >= until:
+                break
+            timestamp, _, kind, actor = take()
+            handlers[kind](timestamp, actor, dispatcher, monitor, schedule)
+            settle(kind, actor)
+            done += 1
+        self._done += done
+
+    def _do_profiled_events(self, profiler: Profiler,
+                            until: Optional[int] = None) -> None:
+        """Do the pending events like _do_events, recording them in
+        <profiler>.
+
+        Every event is counted, but only every sample_every-th one is timed.
+
+        >>> from driver import Driver
+        >>> from event import DriverRequest, PassengerRequest
+        >>> from location import Location
+        >>> from passenger import Passenger
+        >>> from typing import List
+        >>> def make_events() -> List[Event]:
+        ...     return [DriverRequest(0, Driver('Ann', Location(1, 1), 1)),
+        ...             PassengerRequest(1, Passenger('Bo', 5, Location(1, 2),
+        ...                                           Location(1, 4)))]
+        >>> profiler = Profiler(sample_every=2)
+        >>> simulation = Simulation(profiler=profiler)
+        >>> simulation.run(make_events()) == Simulation().run(make_events())
+        True
+        >>> profiler.counts['DriverRequest'], profiler.counts['Pickup']
+        (2, 1)
+        >>> sum(len(durations) for durations in profiler.durations.values())
+        3
+        >>> profiler.added, len(profiler.adds)
+        (3, 1)
+        """
+        events, take, settle, peek = \
+            self._events, self._take, self._settle, self._peek
+        handlers = HANDLERS
+        schedule = profiler.counted(self._schedule)
+        timed_schedule = profiler.timed(self._schedule)
+        dispatcher, monitor = self._dispatcher, self._monitor
+        names = [event_class.__name__ for event_class in EVENT_CLASSES]
+        counts = [0] * len(handlers)
+        every, clock = profiler.sample_every, profiler.clock
+        done = self._done
+        start = time.perf_counter()
+        while events:
+            if until is not None and peek()[0] >= until:
+                break
+            if done % every:
+                timestamp, _, kind, actor = take()
+                handlers[kind](timestamp, actor, dispatcher, monitor,
+                               schedule)
+            else:
+                removing = clock()
+                timestamp, _, kind, actor = take()
+                removal = clock() - removing
+                examined = dispatcher.examined()
+                handling = clock()
+                handlers[kind](timestamp, actor, dispatcher, monitor,
+                               timed_schedule)
+                profiler.record(names[kind], timestamp, handling,
+                                clock() - handling, removal,
+                                dispatcher.examined() - examined,
+                                len(events))
+            settle(kind, actor)
+            counts[kind] += 1
+            done += 1
+        profiler.count(names, counts, time.perf_counter() - start)
+        self._done = done
+
+    def _take(self) -> Record:
+        """Remove the first record from the event queue and return it.
+
+        If it is the record of an initial event, the next initial event not
+        yet read is added in its place.
+        """
+        record = self._pop()
+        if record[1] < 0:
+            self._load_next()
+        return record
+
+    def _settle(self, kind: int, actor: object) -> None:
+        """Keep track of pending Cancellations, once the event with <kind>
+        and <actor> is done.
+
+        """
+        if kind == Pickup.KIND:
+            self._retire(actor[0])
+        elif kind == Cancellation.KIND:
+            self._pending.pop(id(actor), None)
+
+    def _schedule(self, timestamp: int, kind: int, actor: object) -> None:
+        """Add the event with <timestamp>, <kind> and <actor> to the event
+        queue.
+
+        """
+        record = (timestamp, next(self._sequence), kind, actor)
+        self._push(record)
+        if kind == Cancellation.KIND:
+            self._pending[id(actor)] = record
+
+    def _retire(self, passenger: Passenger) -> None:
+        """Skip the pending Cancellation of <passenger>, who has just been
+        picked up, if there is one.
+
+        The record is found by the passenger's identity, so passengers who
+        share an id are kept apart, and discarded from the event queue, which
+        leaves it as a tombstone and compacts itself once there are many.
+        """
+        record = self._pending.pop(id(passenger), None)
+        if record is not None:
+            self._events.discard(record)
 
 
 if __name__ == "__main__":
@@ -74,8 +346,10 @@ if __name__ == "__main__":
 
     python_ta.check_all(
         config={
-            'extra-imports': ['typing', 'container', 'dispatcher', 'event',
-                              'monitor']})
+            'extra-imports': ['itertools', 'time', 'operator', 'typing',
+                              'container', 'dispatcher', 'distance', 'driver',
+                              'event', 'monitor', 'passenger', 'profiler',
+                              'timeseries', 'travel_time']})
 
     events = create_event_list("events.txt")
     sim = Simulation()
@@ -0,0 +1,266 @@
+"""Parameter sweeps over many simulations
+
+A sweep runs Simulation over every combination of traces, fleet sizes,
+passenger patience values, batch windows and seeds, spread across a pool of
+processes. Each result is appended to a JSONL file as soon as its run
+finishes, one JSON object per line, so an interrupted sweep can be resumed
+by running it again with the same results file: runs already in the file are
+skipped. A run that fails is reported, but not written to the file, so it is
+tried again when the sweep is resumed.
+
+Each trace is read once, before the pool starts, and handed to every worker
+process as it starts.
+
+Each job is a dictionary with the keys:
+    trace: The name of an event file, or of a trace file made by trace_file.
+    drivers: The number of drivers to keep, chosen at random using the seed,
+        or None to keep every driver.
+    patience: The patience given to every passenger, or None to keep the
+        patience in the trace.
+    batch_window: The batch window of the dispatcher, or None.
+    seed: The seed for the random choice of drivers.
+
+Usage:
+    python tools.py sweep results.jsonl TRACE [TRACE ...] [--drivers N ...]
+        [--patience P ...] [--batch-window W ...] [--seeds S ...]
+        [--workers K]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from event import Event, DriverRequest, PassengerRequest
+from driver import Driver
+from location import Location
+from passenger import Passenger
+from simulation import Simulation
+
+_Record = Tuple[int, bool, str, Location, Optional[Location], int]
+#     A request in a trace: its timestamp, whether it is a driver request,
+#     the id, the origin, the destination (None for drivers), and the speed
+#     of a driver or the patience of a passenger.
+
+_WORKER_RECORDS: Dict[str, List[_Record]] = {}
+#     The requests of each trace, by name, handed to this process when it
+#     started as a worker of a sweep. Empty in any other process.
+
+
+def make_jobs(traces: Iterable[str],
+              fleet_sizes: Iterable[Optional[int]] = (None,),
+              patiences: Iterable[Optional[int]] = (None,),
+              batch_windows: Iterable[Optional[int]] = (None,),
+              seeds: Iterable[int] = (0,)) -> List[dict]:
+    """Return a job for every combination of the given parameters.
+
+    >>> len(make_jobs(['a.txt', 'b.txt'], [10, 20], seeds=[1, 2, 3]))
+    12
+    """
+    return [{"trace": trace, "drivers": drivers, "patience": patience,
+             "batch_window": batch_window, "seed": seed}
+            for trace, drivers, patience, batch_window, seed
+            in itertools.product(traces, fleet_sizes, patiences,
+                                 batch_windows, seeds)]
+
+
+def job_key(job: dict) -> str:
+    """Return a string that identifies <job> in a results file.
+
+    >>> job_key({'trace': 'a.txt', 'seed': 1, 'drivers': None})
+    '{"drivers": null, "seed": 1, "trace": "a.txt"}'
+    """
+    return json.dumps(job, sort_keys=True)
+
+
+def run_job(job: dict) -> dict:
+    """Run the simulation described by <job>, and return <job> together with
+    its report, the number of events it started from and the seconds it took.
+
+    The trace is read unless it was handed to this process as a worker.
+    """
+    records = _WORKER_RECORDS.get(job["trace"])
+    if records is None:
+        records = _read_records(job["trace"])
+
+    start = time.perf_counter()
+    events = _build_events(records, job.get("drivers"), job.get("patience"),
+                           job.get("seed", 0))
+    report = Simulation(batch_window=job.get("batch_window")).run(events)
+    return {"job": job, "report": report, "events": len(events),
+            "seconds": time.perf_counter() - start}
+
+
+def run_sweep(jobs: Iterable[dict], results_filename: str,
+              workers: Optional[int] = None) -> List[dict]:
+    """Run every job in <jobs> that is not already in <results_filename>,
+    with <workers> processes, and append each result to <results_filename>
+    as it finishes.
+
+    Return the result of every job run, in the order they finished. The
+    result of a job that failed, because its trace could not be read or its
+    simulation raised an error, holds the job, its key and the error,
+    instead of a report, and is not written to <results_filename>.
+
+    workers: The number of processes, or None for one per CPU.
+    """
+    done = _finished_keys(results_filename)
+    pending = [job for job in jobs if job_key(job) not in done]
+    if not pending:
+        return []
+
+    finished = []
+    records = {}
+    for trace in sorted({job["trace"] for job in pending}):
+        try:
+            records[trace] = _read_records(trace)
+        except (OSError, ValueError) as error:
+            finished.extend(_failure(job, error) for job in pending
+                            if job["trace"] == trace)
+    runnable = [job for job in pending if job["trace"] in records]
+    if not runnable:
+        return finished
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(records,)) as pool, \
+            open(results_filename, "a") as results:
+        futures = {pool.submit(run_job, job): job for job in runnable}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                # Any error in one simulation, or a worker that died running
+                # it, only fails that job.
+                finished.append(_failure(futures[future], error))
+                continue
+            result["key"] = job_key(result["job"])
+            results.write(json.dumps(result) + "\n")
+            results.flush()
+            finished.append(result)
+    return finished
+
+
+def _start_worker(records: Dict[str, List[_Record]]) -> None:
+    """Keep the requests of each trace in <records> for the jobs this worker
+    process runs.
+
+    """
+    _WORKER_RECORDS.update(records)
+
+
+def _failure(job: dict, error: Exception) -> dict:
+    """Return the result of <job>, which failed with <error>.
+
+    >>> _failure({'trace': 'a.txt'}, ValueError('bad line'))['error']
+    "ValueError('bad line')"
+    """
+    return {"job": job, "key": job_key(job), "error": repr(error)}
+
+
+def _finished_keys(results_filename: str) -> Set[str]:
+    """Return the keys of the jobs whose results are in <results_filename>.
+
+    A line cut short by an interrupted sweep is ignored.
+    """
+    keys = set()
+    if not os.path.exists(results_filename):
+        return keys
+    with open(results_filename) as results:
+        for line in results:
+            try:
+                keys.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+                continue
+    return keys
+
+
+def _read_records(trace: str) -> List[_Record]:
+    """Return the requests in the event or trace file <trace>.
+
+    """
+    with open(trace, "rb") as file:
+        is_binary = file.read(8) == b"RSTRACE1"
+    # Imported here, as only one of the two readers is needed.
+    if is_binary:
+        from trace_file import load_trace
+        events = load_trace(trace)
+    else:
+        from event_parser import parse_events
+        events = parse_events(trace)
+
+    records = []
+    for event in events:
+        if isinstance(event, DriverRequest):
+            driver = event.driver
+            records.append((event.timestamp, True, driver.id, driver.location,
+                            None, driver.speed))
+        elif isinstance(event, PassengerRequest):
+            passenger = event.passenger
+            records.append((event.timestamp, False, passenger.id,
+                            passenger.origin, passenger.destination,
+                            passenger.patience))
+    return records
+
+
+def _build_events(records: List[_Record], drivers: Optional[int],
+                  patience: Optional[int], seed: int) -> List[Event]:
+    """Return new events for <records>, keeping <drivers> drivers chosen at
+    random with <seed>, and giving every passenger <patience>.
+
+    """
+    keep = None
+    driver_ids = [record[2] for record in records if record[1]]
+    if drivers is not None and drivers < len(driver_ids):
+        keep = set(random.Random(seed).sample(driver_ids, drivers))
+
+    events = []
+    for timestamp, is_driver, identifier, origin, destination, value \
+            in records:
+        if is_driver:
+            if keep is None or identifier in keep:
+                events.append(DriverRequest(
+                    timestamp, Driver(identifier, origin, value)))
+        else:
+            events.append(PassengerRequest(timestamp, Passenger(
+                identifier, value if patience is None else patience,
+                origin, destination)))
+    return events
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a sweep from the command line.
+
+    """
+    parser = argparse.ArgumentParser(description="Run a parameter sweep.")
+    parser.add_argument("results")
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--drivers", nargs="+", type=int, default=[None])
+    parser.add_argument("--patience", nargs="+", type=int, default=[None])
+    parser.add_argument("--batch-window", nargs="+", type=int, default=[None])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    jobs = make_jobs(args.traces, args.drivers, args.patience,
+                     args.batch_window, args.seeds)
+    finished = run_sweep(jobs, args.results, args.workers)
+    failures = [result for result in finished if "error" in result]
+    for failure in failures:
+        print(f"Failed {failure['key']}: {failure['error']}")
+    print(f"Ran {len(finished) - len(failures)} of {len(jobs)} jobs, "
+          f"{len(failures)} failed")
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={
+            'allowed-io': ['run_sweep', '_finished_keys', '_read_records',
+                           'main'],
+            'extra-imports': ['argparse', 'itertools', 'json', 'os', 'random',
+                              'time', 'concurrent.futures', 'typing',
+                              'event', 'driver', 'location', 'passenger',
+                              'simulation', 'trace_file', 'event_parser']})
@@ -0,0 +1,380 @@
+"""Windowed time-series of a simulation's activities
+
+A TimeSeries given to a Monitor splits simulated time into windows of equal
+length, and keeps one row for each window:
+    start: The time the window starts.
+    requests: The number of passenger requests.
+    pickups: The number of passengers picked up.
+    cancellations: The number of passengers who cancelled.
+    dropoffs: The number of passengers dropped off.
+    idle_drivers: The number of idle drivers at the end of the window.
+    waiting_passengers: The number of passengers waiting for a driver to be
+        assigned at the end of the window.
+    wait_time: The total wait time of passengers picked up or cancelled.
+    mean_wait: The mean wait time of passengers picked up or cancelled in
+        the last <rolling> windows, or 0.0 if there are none.
+The two counts at the end of a window are only known if the time series
+watches a function giving them, as a Simulation arranges; otherwise they are
+None.
+
+Only the latest <capacity> rows are kept in memory, in a ring buffer, so
+memory stays the same however long the simulation runs. If a file is given,
+rows are written to it as they fill up the ring, at least every <flush_every>
+windows, and all of them are written when the time series is closed. The
+file is only open while rows are written to it. A file holds every row in one
+of these formats:
+    CSV: A header line, then one line of comma-separated values per row.
+    JSONL: A JSON object per row, one per line.
+    PROMETHEUS: The Prometheus text format. Since Prometheus scrapes the
+        current value of each metric, the file only ever holds the latest
+        row, with the counts added up over every window so far, and is
+        replaced as a whole, so that it can be read by a textfile collector
+        at any time.
+
+=== Constants ===
+COLUMNS: The names of the columns of each row.
+REQUESTS, PICKUPS, CANCELLATIONS, DROPOFFS: The indices in COLUMNS of the
+    columns counting activities.
+CSV, JSONL, PROMETHEUS: The file formats.
+"""
+
+import csv
+import itertools
+import json
+import os
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+COLUMNS = ('start', 'requests', 'pickups', 'cancellations', 'dropoffs',
+           'idle_drivers', 'waiting_passengers', 'wait_time', 'mean_wait')
+REQUESTS = 1
+PICKUPS = 2
+CANCELLATIONS = 3
+DROPOFFS = 4
+
+CSV = "csv"
+JSONL = "jsonl"
+PROMETHEUS = "prometheus"
+
+_Row = Tuple[int, int, int, int, int, Optional[int], Optional[int], int,
+             float]
+#     The values of a row, in the order of COLUMNS.
+
+_EXTENSIONS = {'.csv': CSV, '.jsonl': JSONL, '.prom': PROMETHEUS}
+#     The format of files with each extension.
+
+
+class TimeSeries:
+    """Counts of a simulation's activities, in windows of simulated time.
+
+    === Attributes ===
+    window: The length of each window.
+    capacity: The number of rows kept in memory.
+    rolling: The number of windows mean_wait is taken over.
+    flush_every: The most windows that may end before rows are written to
+        the file.
+    """
+    window: int
+    capacity: int
+    rolling: int
+    flush_every: int
+
+    # === Private Attributes ===
+    _rows: Deque[_Row]
+    #     The ring buffer: the rows of the latest <capacity> windows that
+    #     have ended, oldest first.
+    _recent: Deque[Tuple[int, int]]
+    #     The wait_time, and the number of passengers picked up or
+    #     cancelled, of the latest <rolling> windows that have ended.
+    _ended: int
+    #     The number of windows that have ended.
+    _written: int
+    #     The number of windows that have been written to the file.
+    _start: Optional[int]
+    #     The start of the current window, or None if nothing has been
+    #     counted yet.
+    _end: int
+    #     The end of the current window.
+    _counts: List[int]
+    #     The values of the current window's row, from start to dropoffs.
+    _wait_time: int
+    #     The current window's wait_time.
+    _gauges: Optional[Callable[[], Tuple[int, int]]]
+    #     Return the number of idle drivers and of waiting passengers, or
+    #     None if they are not known.
+    _sink: Optional[Union['_CsvSink', '_JsonlSink', '_PrometheusSink']]
+    #     Where rows are written, or None if they are not.
+
+    def __init__(self, window: int = 60, capacity: int = 256,
+                 rolling: int = 5, flush_every: int = 16,
+                 filename: Optional[str] = None,
+                 file_format: Optional[str] = None) -> None:
+        """Initialize an empty TimeSeries.
+
+        filename: The file rows are written to, or None if they are not.
+        file_format: CSV, JSONL or PROMETHEUS. Defaults to the format given
+            by the extension of <filename>: .csv, .jsonl or .prom.
+
+        Precondition: 1 <= rolling <= capacity and
+            1 <= flush_every <= capacity
+        """
+        self.window = window
+        self.capacity = capacity
+        self.rolling = rolling
+        self.flush_every = flush_every
+        self._rows = deque(maxlen=capacity)
+        self._recent = deque(maxlen=rolling)
+        self._ended = 0
+        self._written = 0
+        self._start = None
+        self._end = 0
+        self._counts = [0] * 5
+        self._wait_time = 0
+        self._gauges = None
+        self._sink = None
+        if filename is not None:
+            self._sink = _open_sink(filename, file_format)
+
+    def watch(self, gauges: Callable[[], Tuple[int, int]]) -> None:
+        """Take the number of idle drivers and of waiting passengers at the
+        end of each window from <gauges>.
+
+        """
+        self._gauges = gauges
+
+    def count(self, timestamp: int, column: Optional[int]) -> None:
+        """Count an activity at <timestamp> in <column>, one of REQUESTS,
+        PICKUPS, CANCELLATIONS or DROPOFFS, or in no column if <column> is
+        None.
+
+        Precondition: <timestamp> is no earlier than that of any activity
+            counted before.
+        """
+        if timestamp >= self._end:
+            self._advance(timestamp)
+        if column is not None:
+            self._counts[column] += 1
+
+    def wait(self, wait_time: int) -> None:
+        """Add the <wait_time> of a passenger picked up or cancelled, in the
+        current window.
+
+        """
+        self._wait_time += wait_time
+
+    def rows(self) -> List[Dict[str, Union[int, float, None]]]:
+        """Return the rows kept in memory, oldest first, as dictionaries
+        whose keys are COLUMNS.
+
+        >>> series = TimeSeries(window=10, capacity=3, rolling=2)
+        >>> series.count(3, REQUESTS)
+        >>> series.count(15, PICKUPS)
+        >>> series.wait(12)
+        >>> series.count(41, DROPOFFS)
+        >>> [(row['start'], row['pickups'], row['mean_wait'])
+        ...  for row in series.rows()]
+        [(10, 1, 12.0), (20, 0, 12.0), (30, 0, 0.0)]
+        """
+        return [dict(zip(COLUMNS, row)) for row in self._rows]
+
+    def flush(self) -> None:
+        """Write the rows of the windows that have ended, but have not been
+        written yet, to the file.
+
+        """
+        if self._sink is not None and self._written < self._ended:
+            first = len(self._rows) - (self._ended - self._written)
+            self._sink.write(list(itertools.islice(self._rows, first, None)))
+        self._written = self._ended
+
+    def close(self) -> None:
+        """End the current window, write every row not written yet to the
+        file, and close it.
+
+        """
+        if self._start is not None:
+            self._end_window(self._start)
+            self._start = None
+        self.flush()
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _advance(self, timestamp: int) -> None:
+        """End windows until the current one holds <timestamp>.
+
+        """
+        if self._start is None:
+            self._start = timestamp - timestamp % self.window
+        else:
+            while self._end <= timestamp:
+                self._end_window(self._start)
+                self._start = self._end
+                self._end += self.window
+        self._end = self._start + self.window
+
+    def _end_window(self, start: int) -> None:
+        """Add the row of the current window, which starts at <start>, to
+        the ring buffer, writing rows to the file first if they would be
+        overwritten, or if flush_every windows have ended since they were
+        last written.
+
+        """
+        if self._ended - self._written >= self.flush_every:
+            self.flush()
+        idle, waiting = self._gauges() if self._gauges is not None \
+            else (None, None)
+        counts = self._counts
+        self._recent.append((self._wait_time,
+                             counts[PICKUPS] + counts[CANCELLATIONS]))
+        total = sum(wait_time for wait_time, _ in self._recent)
+        finished = sum(count for _, count in self._recent)
+        self._rows.append((start, counts[REQUESTS], counts[PICKUPS],
+                           counts[CANCELLATIONS], counts[DROPOFFS], idle,
+                           waiting, self._wait_time,
+                           total / finished if finished else 0.0))
+        self._ended += 1
+
+        self._counts = [0] * 5
+        self._wait_time = 0
+
+
+class _CsvSink:
+    """Writes rows to a CSV file.
+
+    === Private Attributes ===
+    _filename: The name of the file.
+    """
+    _filename: str
+
+    def __init__(self, filename: str) -> None:
+        """Replace the file named <filename> with one holding the header.
+
+        """
+        self._filename = filename
+        with open(filename, "w", newline="") as file:
+            csv.writer(file).writerow(COLUMNS)
+
+    def write(self, rows: List[_Row]) -> None:
+        """Add <rows> to the file.
+
+        """
+        with open(self._filename, "a", newline="") as file:
+            csv.writer(file).writerows(rows)
+
+    def close(self) -> None:
+        """Do nothing, as the file is not kept open.
+
+        """
+
+
+class _JsonlSink:
+    """Writes rows to a file of JSON objects, one per line.
+
+    === Private Attributes ===
+    _filename: The name of the file.
+    """
+    _filename: str
+
+    def __init__(self, filename: str) -> None:
+        """Replace the file named <filename> with an empty one.
+
+        """
+        self._filename = filename
+        with open(filename, "w"):
+            pass
+
+    def write(self, rows: List[_Row]) -> None:
+        """Add <rows> to the file.
+
+        """
+        with open(self._filename, "a") as file:
+            file.writelines(json.dumps(dict(zip(COLUMNS, row))) + "\n"
+                            for row in rows)
+
+    def close(self) -> None:
+        """Do nothing, as the file is not kept open.
+
+        """
+
+
+class _PrometheusSink:
+    """Keeps a file in the Prometheus text format up to date with the latest
+    row.
+
+    === Private Attributes ===
+    _filename: The name of the file.
+    _totals: The counts of every column from requests to dropoffs, and of
+        wait_time, added up over every row written.
+    """
+    _filename: str
+    _totals: Dict[str, int]
+
+    def __init__(self, filename: str) -> None:
+        """Initialize a sink replacing the file named <filename>.
+
+        """
+        self._filename = filename
+        self._totals = {name: 0 for name
+                        in COLUMNS[REQUESTS:DROPOFFS + 1] + ('wait_time',)}
+
+    def write(self, rows: List[_Row]) -> None:
+        """Replace the file with the latest of <rows>, and the totals up to
+        it.
+
+        """
+        for row in rows:
+            # The counts from requests to dropoffs, and wait_time.
+            for name, count in zip(self._totals, row[1:5] + row[7:8]):
+                self._totals[name] += count
+        latest = dict(zip(COLUMNS, rows[-1]))
+        lines = []
+        for name, total in self._totals.items():
+            lines.append(f"# TYPE simulation_{name}_total counter\n"
+                         f"simulation_{name}_total {total}\n")
+        for name in ('idle_drivers', 'waiting_passengers', 'mean_wait'):
+            if latest[name] is not None:
+                lines.append(f"# TYPE simulation_{name} gauge\n"
+                             f"simulation_{name} {latest[name]}\n")
+        lines.append(f"# TYPE simulation_time gauge\n"
+                     f"simulation_time {latest['start']}\n")
+        # Replacing the file at once means it is never read half written.
+        temporary = self._filename + ".tmp"
+        with open(temporary, "w") as file:
+            file.writelines(lines)
+        os.replace(temporary, self._filename)
+
+    def close(self) -> None:
+        """Do nothing, as the file is not kept open.
+
+        """
+
+
+def _open_sink(filename: str, file_format: Optional[str]) \
+        -> Union[_CsvSink, _JsonlSink, _PrometheusSink]:
+    """Return a sink writing to the file named <filename> in <file_format>,
+    or in the format given by its extension if <file_format> is None.
+
+    Raise a ValueError if there is no such format.
+    """
+    if file_format is None:
+        file_format = _EXTENSIONS.get(os.path.splitext(filename)[1])
+    if file_format == CSV:
+        return _CsvSink(filename)
+    if file_format == JSONL:
+        return _JsonlSink(filename)
+    if file_format == PROMETHEUS:
+        return _PrometheusSink(filename)
+    raise ValueError(f"Unknown time series format for {filename}: "
+                     f"{file_format}")
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(
+        config={'allowed-io': ['_CsvSink.__init__', '_CsvSink.write',
+                               '_JsonlSink.__init__', '_JsonlSink.write',
+                               '_PrometheusSink.write'],
+                'extra-imports': ['collections', 'csv', 'itertools', 'json',
+                                  'os', 'typing']})
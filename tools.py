@@ -0,0 +1,43 @@
+"""The command-line tools
+
+Every other module checks itself with python_ta when run as a script, so
+the tools are run through this module instead:
+    python tools.py benchmark ARGUMENTS...
+    python tools.py profiler ARGUMENTS...
+    python tools.py sweep ARGUMENTS...
+    python tools.py trace_generator ARGUMENTS...
+The arguments of each tool are described in its module.
+
+=== Constants ===
+TOOLS: A dictionary whose key is the name of a tool, and value is the
+    function running it with a list of command-line arguments.
+"""
+
+import argparse
+from typing import List, Optional
+import benchmark
+import profiler
+import sweep
+import trace_generator
+
+TOOLS = {
+    "benchmark": benchmark.main,
+    "profiler": profiler.main,
+    "sweep": sweep.main,
+    "trace_generator": trace_generator.main
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the tool named by the first of <argv>, with the rest of <argv>.
+
+    """
+    parser = argparse.ArgumentParser(description="Run a tool.")
+    parser.add_argument("tool", choices=sorted(TOOLS))
+    parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    TOOLS[args.tool](args.arguments)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""A binary columnar format for event traces
+
+A trace file holds the same events as an event text file, stored column by
+column so that it can be memory-mapped and read back without parsing:
+
+    header     MAGIC, then the number of events, the number of distinct
+               identifiers and the size of the identifier text, as three
+               unsigned 64-bit integers
+    columns    timestamp (int64), kind (uint8), identifier index (uint32),
+               origin row, origin column, destination row, destination column,
+               speed and patience (int32 each), every column padded to a
+               multiple of 8 bytes
+    strings    the identifier end offsets (uint64), then the identifiers as
+               UTF-8 text
+
+Driver requests store their location as the origin, and zeros for the columns
+they do not use. Events come back in the order they were written.
+
+Use convert_text to turn an event text file into a trace file, and
+write_text to turn events back into text.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, List
+from driver import Driver
+from event import Event, DriverRequest, PassengerRequest
+from location import Location, make_location
+from passenger import Passenger
+
+MAGIC = b"RSTRACE1"
+DRIVER_REQUEST = 0
+PASSENGER_REQUEST = 1
+
+_HEADER = struct.Struct("<8sQQQ")
+_COLUMNS = (("timestamp", "q"), ("kind", "B"), ("identifier", "I"),
+            ("origin_row", "i"), ("origin_col", "i"),
+            ("destination_row", "i"), ("destination_col", "i"),
+            ("speed", "i"), ("patience", "i"))
+
+
+def write_trace(events: Iterable[Event], filename: str) -> int:
+    """Write <events> to the trace file <filename> and return how many events
+    were written.
+
+    Only DriverRequest and PassengerRequest events can be written.
+    """
+    columns = {column: array(code) for column, code in _COLUMNS}
+    identifiers = {}
+    for event in events:
+        if isinstance(event, DriverRequest):
+            row = (DRIVER_REQUEST, event.driver.id, event.driver.location,
+                   Location(0, 0), event.driver.speed, 0)
+        elif isinstance(event, PassengerRequest):
+            passenger = event.passenger
+            row = (PASSENGER_REQUEST, passenger.id, passenger.origin,
+                   passenger.destination, 0, passenger.patience)
+        else:
+            raise ValueError(f"Cannot write {type(event).__name__} events "
+                             f"to a trace file")
+        kind, identifier, origin, destination, speed, patience = row
+        columns["timestamp"].append(event.timestamp)
+        columns["kind"].append(kind)
+        columns["identifier"].append(
+            identifiers.setdefault(identifier, len(identifiers)))
+        columns["origin_row"].append(origin.row)
+        columns["origin_col"].append(origin.col)
+        columns["destination_row"].append(destination.row)
+        columns["destination_col"].append(destination.col)
+        columns["speed"].append(speed)
+        columns["patience"].append(patience)
+
+    names = [text.encode() for text in identifiers]
+    offsets = array("Q")
+    total = 0
+    for name in names:
+        total += len(name)
+        offsets.append(total)
+
+    count = len(columns["timestamp"])
+    with open(filename, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, count, len(names), total))
+        for name, _ in _COLUMNS:
+            _write_column(file, columns[name])
+        _write_column(file, offsets)
+        file.write(b"".join(names))
+    return count
+
+
+def _write_column(file: object, column: array) -> None:
+    """Write <column> to <file> in little-endian order, padded to a multiple
+    of 8 bytes.
+
+    """
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    data = column.tobytes()
+    file.write(data)
+    file.write(bytes(-len(data) % 8))
+
+
+class Trace:
+    """The events in a memory-mapped trace file.
+
+    Events are built from the file's columns only as they are iterated over,
+    so opening a trace costs the same however many events it holds. A Trace
+    is a context manager, closed when its with block ends.
+
+    >>> import os, tempfile
+    >>> handle, filename = tempfile.mkstemp()
+    >>> os.close(handle)
+    >>> write_trace([DriverRequest(3, Driver('Ann', Location(1, 2), 1))],
+    ...             filename)
+    1
+    >>> with Trace(filename) as trace:
+    ...     [event.timestamp for event in trace]
+    [3]
+    >>> os.remove(filename)
+
+    === Private Attributes ===
+    _map: The memory map of the trace file.
+    _columns: A dictionary whose key is a column name, and value is a view
+        of that column in the memory map.
+    _identifiers: The identifiers in the trace, by index.
+    """
+
+    _map: mmap.mmap
+    _columns: dict
+    _identifiers: List[str]
+
+    def __init__(self, filename: str) -> None:
+        """Open the trace file <filename>.
+
+        """
+        if sys.byteorder != "little":
+            raise NotImplementedError("Trace files can only be memory-mapped "
+                                      "on little-endian machines")
+        # The memory map stays open once the file itself is closed.
+        with open(filename, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, name_count, total = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{filename} is not a trace file")
+
+        view = memoryview(self._map)
+        position = _HEADER.size
+        self._columns = {}
+        for name, code in _COLUMNS:
+            size = count * struct.calcsize(code)
+            self._columns[name] = view[position:position + size].cast(code)
+            position += size + -size % 8
+        view.release()
+        offsets = array("Q", self._map[position:position + 8 * name_count])
+        position += 8 * name_count
+        text = self._map[position:position + total]
+        self._identifiers = []
+        start = 0
+        for end in offsets:
+            self._identifiers.append(sys.intern(text[start:end].decode()))
+            start = end
+
+    def __len__(self) -> int:
+        """Return the number of events in this trace.
+
+        """
+        return len(self._columns["timestamp"])
+
+    def __iter__(self) -> Iterator[Event]:
+        """Yield the events in this trace, in the order they were written.
+
+        """
+        columns = self._columns
+        identifiers = self._identifiers
+        for index in range(len(self)):
+            identifier = identifiers[columns["identifier"][index]]
+            origin = make_location(columns["origin_row"][index],
+                                   columns["origin_col"][index])
+            if columns["kind"][index] == DRIVER_REQUEST:
+                driver = Driver(identifier, origin, columns["speed"][index])
+                yield DriverRequest(columns["timestamp"][index], driver)
+            else:
+                destination = make_location(
+                    columns["destination_row"][index],
+                    columns["destination_col"][index])
+                passenger = Passenger(identifier, columns["patience"][index],
+                                      origin, destination)
+                yield PassengerRequest(columns["timestamp"][index], passenger)
+
+    def __enter__(self) -> 'Trace':
+        """Return this trace, to be closed when the with block ends.
+
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this trace, as its with block has ended.
+
+        """
+        self.close()
+
+    def close(self) -> None:
+        """Close this trace. It can no longer be iterated over.
+
+        """
+        for column in getattr(self, "_columns", {}).values():
+            column.release()
+        self._columns = {}
+        self._map.close()
+
+
+def load_trace(filename: str) -> List[Event]:
+    """Return a list of the events in the trace file <filename>.
+
+    """
+    with Trace(filename) as trace:
+        return list(trace)
+
+
+def convert_text(text_filename: str, trace_filename: str) -> int:
+    """Convert the event text file <text_filename> into the trace file
+    <trace_filename>, and return how many events were written.
+
+    """
+    # Imported here as event_parser is only needed for conversion.
+    from event_parser import parse_events
+    return write_trace(parse_events(text_filename), trace_filename)
+
+
+def write_text(events: Iterable[Event], filename: str) -> None:
+    """Write <events> to <filename> in the event text format.
+
+    Reading the file back gives events equal to <events>.
+    """
+    with open(filename, "w") as file:
+        for event in events:
+            if isinstance(event, DriverRequest):
+                driver = event.driver
+                file.write(f"{event.timestamp} DriverRequest {driver.id} "
+                           f"{driver.location.row},{driver.location.col} "
+                           f"{driver.speed}\n")
+            elif isinstance(event, PassengerRequest):
+                passenger = event.passenger
+                file.write(f"{event.timestamp} PassengerRequest "
+                           f"{passenger.id} "
+                           f"{passenger.origin.row},{passenger.origin.col} "
+                           f"{passenger.destination.row},"
+                           f"{passenger.destination.col} "
+                           f"{passenger.patience}\n")
+            else:
+                raise ValueError(f"Cannot write {type(event).__name__} "
+                                 f"events as text")
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={
+            'allowed-io': ['write_trace', 'Trace.__init__', 'write_text'],
+            'extra-imports': ['array', 'mmap', 'struct', 'sys', 'typing',
+                              'driver', 'event', 'event_parser', 'location',
+                              'passenger']})
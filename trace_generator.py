@@ -0,0 +1,301 @@
+"""Synthetic event files for load and scaling benchmarks
+
+generate_lines yields the lines of an event file, in the format read by
+event.create_event_list, in timestamp order. The same arguments and seed
+always give the same lines. Lines are produced one at a time, so files of any
+length can be written in constant memory.
+
+Drivers request their first passenger at times spread evenly at random over
+the first <driver_window> time units. Passengers request rides as a Poisson
+process whose rate is <demand> times the time-of-day curve, which repeats
+every <day_length> time units. Each trip end is either drawn from one of the
+hotspots, with probability <hotspot_share>, or uniformly from the grid.
+
+Speeds and patience values are drawn from distributions given as strings:
+    fixed:N: Always N.
+    uniform:A:B: A whole number from A to B, inclusive.
+    exponential:MEAN: Exponentially distributed with mean MEAN.
+    lognormal:MEDIAN:SIGMA: Log-normally distributed with median MEDIAN and
+        shape SIGMA.
+The last two are rounded to a whole number, and speeds are at least 1.
+
+Usage:
+    python tools.py trace_generator events.txt [--seed S] [--rows R]
+        [--cols C] [--drivers N] [--speeds DIST] [--driver-window W]
+        [--duration T] [--demand D] [--day-length L]
+        [--hotspot ROW,COL,SPREAD,WEIGHT ...] [--hotspot-share F]
+        [--patience DIST]
+
+=== Constants ===
+DEFAULT_CURVE: The default time-of-day curve, with a morning and an evening
+    peak. It is a tuple of (fraction of the day, multiplier) points, from 0.0
+    to 1.0, between which the demand multiplier is interpolated linearly.
+BUFFER_LINES: The number of lines written to a file at once.
+"""
+
+import argparse
+import bisect
+import heapq
+import itertools
+import math
+import random
+from typing import (Callable, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple)
+
+DEFAULT_CURVE = ((0.0, 0.2), (0.25, 0.4), (0.33, 1.6), (0.42, 1.0),
+                 (0.67, 1.0), (0.75, 1.8), (0.88, 0.8), (1.0, 0.2))
+BUFFER_LINES = 10000
+
+_Hotspot = Tuple[int, int, float, float]
+#     A hotspot: its row, its column, the standard deviation of the distance
+#     of trip ends from it, and its weight relative to the other hotspots.
+
+
+def generate_lines(seed: int = 0, rows: int = 50, cols: int = 50,
+                   drivers: int = 100, speeds: str = "uniform:1:3",
+                   driver_window: int = 0, duration: int = 1000,
+                   demand: float = 1.0, day_length: Optional[int] = None,
+                   curve: Sequence[Tuple[float, float]] = DEFAULT_CURVE,
+                   hotspots: Sequence[_Hotspot] = (),
+                   hotspot_share: float = 0.0,
+                   patience: str = "uniform:5:40") -> Iterator[str]:
+    """Return an iterator over the lines of a synthetic event file, each
+    ending in a newline, in timestamp order.
+
+    seed: The seed of the random choices.
+    rows, cols: The size of the grid.
+    drivers: The number of drivers.
+    speeds: The distribution of driver speeds.
+    driver_window: The length of time over which drivers first appear.
+    duration: The length of time over which passengers request rides.
+    demand: The mean number of passenger requests per time unit, when the
+        time-of-day curve is 1.0.
+    day_length: The period of the time-of-day curve, or None for
+        <duration>.
+    curve: The time-of-day curve.
+    hotspots: The hotspots trip ends are drawn from.
+    hotspot_share: The probability that a trip end is drawn from a hotspot.
+    patience: The distribution of passenger patience.
+
+    >>> lines = list(generate_lines(seed=1, rows=5, cols=5, drivers=2,
+    ...                             duration=10, demand=0.5))
+    >>> lines[0]
+    '0 DriverRequest D0 0,1 2\\n'
+    >>> lines == list(generate_lines(seed=1, rows=5, cols=5, drivers=2,
+    ...                              duration=10, demand=0.5))
+    True
+    >>> times = [int(line.split()[0]) for line in lines]
+    >>> times == sorted(times) and times[-1] < 10
+    True
+    """
+    driver_random = random.Random(f"{seed}:drivers")
+    passenger_random = random.Random(f"{seed}:passengers")
+    return heapq.merge(
+        _driver_lines(driver_random, rows, cols, drivers,
+                      distribution(speeds, driver_random, 1), driver_window),
+        _passenger_lines(passenger_random, rows, cols, duration, demand,
+                         day_length or duration, curve, hotspots,
+                         hotspot_share,
+                         distribution(patience, passenger_random, 0)),
+        key=_timestamp)
+
+
+def write_trace(filename: str, lines: Iterable[str]) -> int:
+    """Write a synthetic event file named <filename> holding <lines>, as
+    given by generate_lines, and return the number of lines written.
+
+    """
+    count = 0
+    buffer = []
+    with open(filename, "w") as file:
+        file.write("# Generated by trace_generator.py\n")
+        for line in lines:
+            buffer.append(line)
+            if len(buffer) == BUFFER_LINES:
+                file.writelines(buffer)
+                count += len(buffer)
+                buffer.clear()
+        file.writelines(buffer)
+    return count + len(buffer)
+
+
+def distribution(spec: str, rng: random.Random,
+                 minimum: int) -> Callable[[], int]:
+    """Return a function drawing whole numbers of at least <minimum> from the
+    distribution described by <spec>, using <rng>.
+
+    Raise a ValueError if <spec> is not a distribution.
+
+    >>> draw = distribution("uniform:3:4", random.Random(0), 1)
+    >>> sorted({draw() for _ in range(100)})
+    [3, 4]
+    >>> distribution("fixed:7", random.Random(0), 1)()
+    7
+    >>> distribution("normal:7", random.Random(0), 1)
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown distribution 'normal:7'
+    """
+    name, *values = spec.split(":")
+    try:
+        numbers = [float(number) for number in values]
+    except ValueError:
+        raise ValueError(f"unknown distribution {spec!r}") from None
+    if name == "fixed" and len(numbers) == 1:
+        value = max(minimum, int(numbers[0]))
+        return lambda: value
+    if name == "uniform" and len(numbers) == 2:
+        low, high = max(minimum, int(numbers[0])), int(numbers[1])
+        return lambda: rng.randint(low, high)
+    if name == "exponential" and len(numbers) == 1:
+        rate = 1 / numbers[0]
+        return lambda: max(minimum, round(rng.expovariate(rate)))
+    if name == "lognormal" and len(numbers) == 2:
+        mu, sigma = math.log(numbers[0]), numbers[1]
+        return lambda: max(minimum, round(rng.lognormvariate(mu, sigma)))
+    raise ValueError(f"unknown distribution {spec!r}")
+
+
+def _driver_lines(rng: random.Random, rows: int, cols: int, drivers: int,
+                  speed: Callable[[], int], window: int) -> Iterator[str]:
+    """Yield the request lines of <drivers> drivers, at times spread
+    uniformly over <window>, in timestamp order.
+
+    """
+    # Each time is the smallest of the times still to come, which is drawn
+    # directly, so the times come out sorted without being stored.
+    fraction = 0.0
+    for i in range(drivers):
+        fraction = 1 - (1 - fraction) * rng.random() ** (1 / (drivers - i))
+        yield f"{int(fraction * window)} DriverRequest D{i} " \
+              f"{rng.randrange(rows)},{rng.randrange(cols)} {speed()}\n"
+    return None
+
+
+def _passenger_lines(rng: random.Random, rows: int, cols: int,
+                     duration: int, demand: float, day_length: int,
+                     curve: Sequence[Tuple[float, float]],
+                     hotspots: Sequence[_Hotspot], hotspot_share: float,
+                     patience: Callable[[], int]) -> Iterator[str]:
+    """Yield the request lines of passengers arriving over <duration>, in
+    timestamp order.
+
+    """
+    peak = demand * max(multiplier for _, multiplier in curve)
+    if peak <= 0:
+        return None
+    points = [fraction for fraction, _ in curve]
+    place = _place_function(rng, rows, cols, hotspots, hotspot_share)
+    # Arrivals are drawn at the peak rate, and each is kept with probability
+    # equal to the current rate over the peak rate.
+    now = rng.expovariate(peak)
+    count = 0
+    while now < duration:
+        rate = demand * _interpolate(curve, points,
+                                     (now % day_length) / day_length)
+        if rng.random() * peak < rate:
+            yield f"{int(now)} PassengerRequest P{count} {place()} " \
+                  f"{place()} {patience()}\n"
+            count += 1
+        now += rng.expovariate(peak)
+    return None
+
+
+def _place_function(rng: random.Random, rows: int, cols: int,
+                    hotspots: Sequence[_Hotspot],
+                    hotspot_share: float) -> Callable[[], str]:
+    """Return a function drawing serialized trip ends on the grid.
+
+    """
+    weights = list(itertools.accumulate(hotspot[3] for hotspot in hotspots))
+
+    def place() -> str:
+        """Return a random trip end.
+
+        """
+        if hotspots and rng.random() < hotspot_share:
+            row, col, spread, _ = hotspots[
+                bisect.bisect_right(weights, rng.random() * weights[-1])]
+            return f"{_clamp(round(rng.gauss(row, spread)), rows)}," \
+                   f"{_clamp(round(rng.gauss(col, spread)), cols)}"
+        return f"{rng.randrange(rows)},{rng.randrange(cols)}"
+    return place
+
+
+def _interpolate(curve: Sequence[Tuple[float, float]], points: List[float],
+                 fraction: float) -> float:
+    """Return the multiplier of <curve> at <fraction> of the day, where
+    <points> are the fractions of its points.
+
+    >>> _interpolate([(0.0, 1.0), (0.5, 3.0), (1.0, 1.0)],
+    ...              [0.0, 0.5, 1.0], 0.25)
+    2.0
+    """
+    i = bisect.bisect_right(points, fraction)
+    if i == 0:
+        return curve[0][1]
+    if i == len(curve):
+        return curve[-1][1]
+    (x0, y0), (x1, y1) = curve[i - 1], curve[i]
+    return y0 + (y1 - y0) * (fraction - x0) / (x1 - x0)
+
+
+def _clamp(value: int, size: int) -> int:
+    """Return <value> moved onto the range 0 to <size> - 1.
+
+    """
+    return min(max(value, 0), size - 1)
+
+
+def _timestamp(line: str) -> int:
+    """Return the timestamp of the event <line>.
+
+    """
+    return int(line[:line.index(" ")])
+
+
+def _hotspot(text: str) -> _Hotspot:
+    """Return the hotspot described by <text>, as ROW,COL,SPREAD,WEIGHT.
+
+    """
+    row, col, spread, weight = text.split(",")
+    return int(row), int(col), float(spread), float(weight)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Write a synthetic event file from the command line.
+
+    """
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic event file.")
+    parser.add_argument("filename")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--cols", type=int, default=50)
+    parser.add_argument("--drivers", type=int, default=100)
+    parser.add_argument("--speeds", default="uniform:1:3")
+    parser.add_argument("--driver-window", type=int, default=0)
+    parser.add_argument("--duration", type=int, default=1000)
+    parser.add_argument("--demand", type=float, default=1.0)
+    parser.add_argument("--day-length", type=int, default=None)
+    parser.add_argument("--hotspot", nargs="+", type=_hotspot, default=[])
+    parser.add_argument("--hotspot-share", type=float, default=0.0)
+    parser.add_argument("--patience", default="uniform:5:40")
+    args = parser.parse_args(argv)
+    count = write_trace(args.filename, generate_lines(
+        seed=args.seed, rows=args.rows, cols=args.cols,
+        drivers=args.drivers, speeds=args.speeds,
+        driver_window=args.driver_window, duration=args.duration,
+        demand=args.demand, day_length=args.day_length,
+        hotspots=args.hotspot, hotspot_share=args.hotspot_share,
+        patience=args.patience))
+    print(f"Wrote {count} events to {args.filename}")
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(
+        config={'allowed-io': ['write_trace', 'main'],
+                'extra-imports': ['argparse', 'bisect', 'heapq', 'itertools',
+                                  'math', 'random', 'typing']})
@@ -0,0 +1,259 @@
+"""Travel times for the simulation
+
+A travel-time model returns how long a driver at a given speed takes to get
+from one location to another, using the distances of a DistanceModel, or
+Manhattan distances if it is given none. Driver.get_travel_time asks the
+driver's own model, which a Dispatcher gives the drivers it registers, or
+else the model in Driver.travel_times. Either can be any TravelTimes:
+
+    DirectTravelTimes   computes every travel time as it is asked for
+    TravelTimeCache     remembers the most recently used travel times
+    TravelTimeTable     precomputes every travel time on a small grid
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from distance import DistanceModel, ManhattanDistance
+from location import Location, manhattan_distance
+
+_UNREACHABLE = -1
+#     The travel time a TravelTimeTable stores for a pair of points with no
+#     route between them.
+
+
+def travel_time(origin: Location, destination: Location, speed: int,
+                distance_model: Optional[DistanceModel] = None) -> int:
+    """Return the time it takes to get from <origin> to <destination> at
+    <speed>, rounded to the nearest integer.
+
+    distance_model: The model of distances to use, or None to use Manhattan
+        distances.
+
+    >>> travel_time(Location(0, 0), Location(3, 4), 2)
+    4
+    """
+    if distance_model is None:
+        return round(manhattan_distance(origin, destination) / speed)
+    return round(distance_model.distance(origin, destination) / speed)
+
+
+class TravelTimes:
+    """A model of travel times.
+
+    This is an abstract class.  Only child classes should be instantiated.
+
+    === Attributes ===
+    distance_model: The model of distances travel times are based on, or
+        None for Manhattan distances.
+    """
+
+    distance_model: Optional[DistanceModel]
+
+    def __init__(self, distance_model: Optional[DistanceModel] = None) -> None:
+        """Initialize a TravelTimes based on <distance_model>.
+
+        """
+        if isinstance(distance_model, ManhattanDistance):
+            # Manhattan distances are faster to compute directly.
+            distance_model = None
+        self.distance_model = distance_model
+
+    def get(self, origin: Location, destination: Location, speed: int) -> int:
+        """Return the time it takes to get from <origin> to <destination> at
+        <speed>.
+
+        """
+        raise NotImplementedError("Implemented in a subclass")
+
+
+class DirectTravelTimes(TravelTimes):
+    """Travel times computed afresh every time they are asked for.
+
+    """
+
+    def get(self, origin: Location, destination: Location, speed: int) -> int:
+        """Return the time it takes to get from <origin> to <destination> at
+        <speed>.
+
+        """
+        return travel_time(origin, destination, speed, self.distance_model)
+
+
+class TravelTimeCache(TravelTimes):
+    """Travel times that remember the <capacity> most recently used results.
+
+    === Attributes ===
+    capacity: The largest number of travel times kept at once.
+    hits: The number of travel times found in the cache.
+    misses: The number of travel times that had to be computed.
+    evictions: The number of travel times dropped to make room for others.
+
+    === Private Attributes ===
+    _times: An ordered dictionary whose key is an (origin, destination,
+        speed) tuple, and value is the travel time, least recently used
+        first.
+    """
+
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+    _times: 'OrderedDict[Tuple[Location, Location, int], int]'
+
+    def __init__(self, capacity: int = 1 << 16,
+                 distance_model: Optional[DistanceModel] = None) -> None:
+        """Initialize an empty TravelTimeCache.
+
+        Precondition: capacity >= 1
+        """
+        super().__init__(distance_model)
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._times = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of travel times in this cache.
+
+        """
+        return len(self._times)
+
+    def get(self, origin: Location, destination: Location, speed: int) -> int:
+        """Return the time it takes to get from <origin> to <destination> at
+        <speed>.
+
+        >>> cache = TravelTimeCache(capacity=1)
+        >>> cache.get(Location(0, 0), Location(3, 4), 2)
+        4
+        >>> cache.get(Location(0, 0), Location(3, 4), 2)
+        4
+        >>> cache.get(Location(1, 1), Location(1, 1), 2)
+        0
+        >>> cache.stats()
+        {'hits': 1, 'misses': 2, 'evictions': 1}
+        """
+        key = (origin, destination, speed)
+        time = self._times.get(key)
+        if time is not None:
+            self.hits += 1
+            self._times.move_to_end(key)
+            return time
+        self.misses += 1
+        time = travel_time(origin, destination, speed, self.distance_model)
+        self._times[key] = time
+        if len(self._times) > self.capacity:
+            self._times.popitem(last=False)
+            self.evictions += 1
+        return time
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss and eviction counts of this cache.
+
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+    def clear(self) -> None:
+        """Remove every travel time from this cache and reset its counts.
+
+        """
+        self._times.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+class TravelTimeTable(TravelTimes):
+    """Travel times precomputed for every pair of points on a small grid.
+
+    Points outside the grid, and speeds that were not precomputed, are
+    computed as they are asked for. Pairs of points with no route between
+    them are stored as such, and only raise a ValueError when asked for.
+
+    === Attributes ===
+    rows: The number of rows in the grid.
+    cols: The number of columns in the grid.
+
+    === Private Attributes ===
+    _tables: A dictionary whose key is a speed, and value is the list of
+        travel times at that speed, indexed by
+        (origin index * rows * cols + destination index), where a point's
+        index is row * cols + col, or _UNREACHABLE if there is no route.
+    """
+
+    rows: int
+    cols: int
+    _tables: Dict[int, List[int]]
+
+    def __init__(self, rows: int, cols: int, speeds: List[int],
+                 distance_model: Optional[DistanceModel] = None) -> None:
+        """Initialize a TravelTimeTable for the points (0, 0) up to
+        (rows - 1, cols - 1), at each speed in <speeds>.
+
+        >>> table = TravelTimeTable(4, 5, [2])
+        >>> table.get(Location(0, 0), Location(3, 4), 2)
+        4
+        >>> table.get(Location(0, 0), Location(9, 9), 2)
+        9
+        >>> from distance import RoadGrid
+        >>> roads = RoadGrid(3, 3, blocked=[Location(1, 1)])
+        >>> table = TravelTimeTable(3, 3, [1], roads)
+        >>> table.get(Location(0, 0), Location(2, 2), 1)
+        4
+        >>> table.get(Location(0, 0), Location(1, 1), 1)
+        Traceback (most recent call last):
+        ...
+        ValueError: No route from (0,0) to (1,1)
+        """
+        super().__init__(distance_model)
+        self.rows = rows
+        self.cols = cols
+        points = [Location(row, col) for row in range(rows)
+                  for col in range(cols)]
+        self._tables = {}
+        for speed in speeds:
+            self._tables[speed] = [
+                self._precompute(origin, destination, speed)
+                for origin in points for destination in points]
+
+    def get(self, origin: Location, destination: Location, speed: int) -> int:
+        """Return the time it takes to get from <origin> to <destination> at
+        <speed>.
+
+        """
+        table = self._tables.get(speed)
+        on_table = self._contains(origin) and self._contains(destination)
+        if table is None or not on_table:
+            return travel_time(origin, destination, speed,
+                               self.distance_model)
+        start = origin.row * self.cols + origin.col
+        end = destination.row * self.cols + destination.col
+        time = table[start * self.rows * self.cols + end]
+        if time == _UNREACHABLE:
+            raise ValueError(f"No route from {origin} to {destination}")
+        return time
+
+    def _precompute(self, origin: Location, destination: Location,
+                    speed: int) -> int:
+        """Return the time it takes to get from <origin> to <destination> at
+        <speed>, or _UNREACHABLE if there is no route.
+
+        """
+        try:
+            return travel_time(origin, destination, speed,
+                               self.distance_model)
+        except ValueError:
+            return _UNREACHABLE
+
+    def _contains(self, location: Location) -> bool:
+        """Return True iff <location> is on this table's grid.
+
+        """
+        return 0 <= location.row < self.rows and 0 <= location.col < self.cols
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(
+        config={'extra-imports': ['collections', 'typing', 'distance',
+                                  'location']})